@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -6,4 +7,101 @@ load_dotenv()
 AIRTABLE_TOKEN = os.getenv("AIRTABLE_TOKEN")
 AIRTABLE_BASE_ID = os.getenv("AIRTABLE_BASE_ID")
 HEADERS = {"Authorization": f"Bearer {AIRTABLE_TOKEN}", "Content-Type": "application/json"}
-BASE_URL = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}"
+# overridable so the benchmarks can point the backend at their local fake Airtable
+AIRTABLE_API_URL = os.getenv("AIRTABLE_API_URL", "https://api.airtable.com/v0")
+BASE_URL = f"{AIRTABLE_API_URL}/{AIRTABLE_BASE_ID}"
+
+# Shared Airtable connection pool
+AIRTABLE_MAX_CONNECTIONS = int(os.getenv("AIRTABLE_MAX_CONNECTIONS", "20"))
+AIRTABLE_MAX_KEEPALIVE = int(os.getenv("AIRTABLE_MAX_KEEPALIVE", "10"))
+AIRTABLE_KEEPALIVE_EXPIRY = float(os.getenv("AIRTABLE_KEEPALIVE_EXPIRY", "60"))
+AIRTABLE_TIMEOUT = float(os.getenv("AIRTABLE_TIMEOUT", "30"))
+AIRTABLE_CONNECT_TIMEOUT = float(os.getenv("AIRTABLE_CONNECT_TIMEOUT", "5"))
+AIRTABLE_HTTP2 = os.getenv("AIRTABLE_HTTP2", "true").lower() == "true"
+
+# Airtable allows 5 requests/second per base and locks the base for 30s after a breach
+AIRTABLE_RATE_LIMIT = int(os.getenv("AIRTABLE_RATE_LIMIT", "5"))
+AIRTABLE_RATE_WINDOW = float(os.getenv("AIRTABLE_RATE_WINDOW", "1"))
+AIRTABLE_LOCKOUT = float(os.getenv("AIRTABLE_LOCKOUT", "30"))
+AIRTABLE_MAX_RETRIES = int(os.getenv("AIRTABLE_MAX_RETRIES", "5"))
+AIRTABLE_RETRY_MAX_WAIT = float(os.getenv("AIRTABLE_RETRY_MAX_WAIT", "30"))
+
+# How long an expired cache entry may still be served while one background refresh runs
+CACHE_STALE_WINDOW = float(os.getenv("CACHE_STALE_WINDOW", "3600"))
+ITEMS_CACHE_MAX = int(os.getenv("ITEMS_CACHE_MAX", "500"))
+
+# Delta refreshes re-read records modified since the last fetch (minus an overlap for clock skew);
+# a full sweep on the slower interval reconciles deletes
+DELTA_OVERLAP = float(os.getenv("DELTA_OVERLAP", "60"))
+DELTA_FULL_SWEEP_INTERVAL = float(os.getenv("DELTA_FULL_SWEEP_INTERVAL", "3600"))
+
+# Optional JSON file describing zones, racks, cross aisles and depot for route planning
+WAREHOUSE_LAYOUT_FILE = os.getenv("WAREHOUSE_LAYOUT_FILE")
+
+# Wave picking: cart capacity (put-wall slots and total units per wave)
+WAVE_MAX_ORDERS = int(os.getenv("WAVE_MAX_ORDERS", "12"))
+WAVE_MAX_UNITS = int(os.getenv("WAVE_MAX_UNITS", "200"))
+
+# Daily report rollups are persisted here; past days are computed once and merged for weekly/monthly/range summaries
+ROLLUP_DB = os.getenv("ROLLUP_DB", "rollups.db")
+# Seconds between scans for late edits that invalidate stored days
+ROLLUP_CHECK_INTERVAL = float(os.getenv("ROLLUP_CHECK_INTERVAL", "60"))
+
+# DynamoDB read replica written by the SyncAirtableData lambda (RPA-<Table>)
+MIRROR_TABLE_PREFIX = os.getenv("MIRROR_TABLE_PREFIX", "RPA-")
+AWS_REGION = os.getenv("AWS_REGION", "ap-southeast-1")
+MIRROR_SCAN_SEGMENTS = int(os.getenv("MIRROR_SCAN_SEGMENTS", "4"))
+MIRROR_ENDPOINT_URL = os.getenv("MIRROR_ENDPOINT_URL")
+# Reconciliation hashes the Airtable side from a router cache when it was fetched within this many seconds
+RECONCILE_CACHE_MAX_AGE = float(os.getenv("RECONCILE_CACHE_MAX_AGE", "300"))
+
+# Where routers read each table from: airtable (default), dynamodb (the RPA-* mirror) or memory.
+# READ_BACKENDS="Orders=dynamodb,Stocks=dynamodb"; MIRROR_INDEXES='{"Orders": {"status": "status-index"}}'
+READ_BACKEND_DEFAULT = os.getenv("READ_BACKEND_DEFAULT", "airtable")
+READ_BACKENDS = dict(pair.split("=", 1) for pair in os.getenv("READ_BACKENDS", "").split(",") if "=" in pair)
+MIRROR_INDEXES = json.loads(os.getenv("MIRROR_INDEXES", "{}"))
+READ_BACKEND_FIXTURES = os.getenv("READ_BACKEND_FIXTURES")
+
+# Server-Sent Events: events buffered per browser tab before it is dropped as a slow consumer,
+# and seconds between keep-alive comments
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+
+# Upper bound on orders accepted by one POST /orders/bulk call
+BULK_ORDERS_MAX = int(os.getenv("BULK_ORDERS_MAX", "500"))
+
+# Idempotency-Key results are replayed for this many seconds; the store keeps at most this many keys
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+
+# Goods receipts for the same stock record arriving within this many seconds share one add_stock update
+RECEIPT_COALESCE_WINDOW = float(os.getenv("RECEIPT_COALESCE_WINDOW", "0.05"))
+
+# Opt-in request profiling (X-Profile: 1 or ?profile=1). Off unless PROFILING_ENABLED; with PROFILING_TOKEN
+# set, the header/query value must be that token. Sample interval in seconds and profiles kept in memory.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_BUFFER = int(os.getenv("PROFILE_BUFFER", "50"))
+
+# Cache warm-up at startup and background refresh. Startup waits at most WARMUP_TIMEOUT seconds for the
+# warm-up; the rest finishes in the background. Each cache refreshes every REFRESH_INTERVAL_DEFAULT seconds
+# (±REFRESH_JITTER) unless REFRESH_INTERVALS="orders=60,stocks=60" overrides it, and retries a failure after REFRESH_RETRY
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "60"))
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "true").lower() == "true"
+REFRESH_INTERVAL_DEFAULT = float(os.getenv("REFRESH_INTERVAL_DEFAULT", "300"))
+# the dashboard metrics re-read every Orders and AuditLogs row, so they refresh less often by default
+REFRESH_INTERVALS = {"metrics": 900.0, **{
+    name: float(seconds) for name, seconds in (pair.split("=", 1) for pair in os.getenv("REFRESH_INTERVALS", "").split(",") if "=" in pair)
+}}
+REFRESH_JITTER = float(os.getenv("REFRESH_JITTER", "0.1"))
+REFRESH_RETRY = float(os.getenv("REFRESH_RETRY", "30"))
+
+# Cache shared by every uvicorn worker on the host: a SQLite file (unset = each worker caches on its own).
+# One worker per key fetches or refreshes under a SHARED_CACHE_LEASE-second lease and the others adopt its
+# result; writes, merges and invalidations reach the other workers within SHARED_CACHE_POLL seconds
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+SHARED_CACHE_POLL = float(os.getenv("SHARED_CACHE_POLL", "0.5"))
+SHARED_CACHE_LEASE = float(os.getenv("SHARED_CACHE_LEASE", "60"))
+SHARED_CACHE_RETENTION = float(os.getenv("SHARED_CACHE_RETENTION", "86400"))
@@ -1,12 +1,42 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from routers import orders, stocks, picklists, transfers, reports, monitoring
-from config import AIRTABLE_BASE_ID, AIRTABLE_TOKEN, BASE_URL
+from config import AIRTABLE_BASE_ID, AIRTABLE_TOKEN, BASE_URL, READ_BACKEND_DEFAULT, READ_BACKENDS
+from services.airtable import AirtableClient
+from services.cache import apply_change, caches
+from services.sku_index import sku_index
+from services.events import events
+from services.idempotency import idempotency
+from services.metrics import MetricsMiddleware, cache_metrics, registry, scheduler_metrics, summary
+from services.profiling import ProfilingMiddleware, debug_access, sampler
+from services.refresher import refresher
+from services.shared_cache import shared
+import asyncio
 import os
 
-app = FastAPI(title="RPA Automation API", version="1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.airtable = AirtableClient()
+    # other workers' writes and refreshes, replayed into this worker's caches
+    follower = asyncio.create_task(shared.follow(apply_change)) if shared is not None else None
+    # serve once the caches are warm (or WARMUP_TIMEOUT passes), then keep them refreshed ahead of expiry
+    await refresher.startup(app.state.airtable)
+    yield
+    await refresher.stop()
+    if follower is not None:
+        follower.cancel()
+    await app.state.airtable.aclose()
+
+app = FastAPI(title="RPA Automation API", version="1.0", lifespan=lifespan)
 
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
+registry.collector(cache_metrics)
+registry.collector(lambda: scheduler_metrics(app.state.airtable.scheduler))
 
 app.include_router(orders.router)
 app.include_router(stocks.router)
@@ -27,6 +57,64 @@ def get_config():
     return {
         "base_id": AIRTABLE_BASE_ID, 
         "token_set": "Yes" if AIRTABLE_TOKEN != "your_token" else "No", 
-        "base_url": BASE_URL
+        "base_url": BASE_URL,
+        "read_backends": {"default": READ_BACKEND_DEFAULT, **READ_BACKENDS}
+    }
+
+@app.get("/api/metrics")
+def get_metrics_summary(request: Request, limit: int = Query(20, ge=1)):
+    return summary(request.app.state.airtable.scheduler, limit)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/scheduler")
+def get_scheduler_stats(request: Request):
+    return request.app.state.airtable.scheduler.snapshot()
+
+@app.get("/api/cache")
+def get_cache_stats():
+    return {
+        **{name: cache.snapshot() for name, cache in caches().items()},
+        "sku_index": sku_index.snapshot(),
+        "idempotency": idempotency.snapshot(),
+        "refresher": refresher.snapshot(),
+        "shared": shared.snapshot() if shared is not None else None,
+    }
+
+@app.get("/api/ready")
+def readiness():
+    # for load balancer readiness checks: 503 until the startup warm-up has finished
+    return JSONResponse(refresher.snapshot(), status_code=200 if refresher.ready else 503)
+
+@app.get("/api/events")
+def stream_events(tables: list[str] | None = Query(None, description="Only changes to these tables")):
+    return StreamingResponse(
+        events.stream(tables),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/events/stats")
+def get_event_stats():
+    return events.snapshot()
+
+@app.get("/api/debug/profiles", dependencies=[Depends(debug_access)])
+def list_profiles():
+    return [profile.summary() for profile in reversed(sampler.recent)]
+
+@app.get("/api/debug/profiles/{profile_id}", dependencies=[Depends(debug_access)])
+def get_profile(profile_id: str, top: int = Query(20, ge=1)):
+    profile = sampler.get(profile_id)
+    return {
+        **profile.summary(),
+        "interval_ms": sampler.interval * 1000,
+        "top_stacks": [{"stack": list(stack), "samples": n} for stack, n in profile.stacks.most_common(top)],
     }
 
+@app.get("/api/debug/profiles/{profile_id}/collapsed", response_class=PlainTextResponse,
+         dependencies=[Depends(debug_access)])
+def get_profile_collapsed(profile_id: str):
+    # feed to flamegraph.pl or paste into speedscope
+    return PlainTextResponse(sampler.get(profile_id).collapsed(sampler.interval))
@@ -11,6 +11,9 @@ class CreateOrderRequest(BaseModel):
     priority: str = "Normal"
     items: List[OrderItem]
 
+class BulkCreateOrdersRequest(BaseModel):
+    orders: List[CreateOrderRequest]
+
 class UpdateStatusRequest(BaseModel):
     status: str
     eta: str | None = None
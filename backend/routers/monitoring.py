@@ -1,88 +1,78 @@
-from fastapi import APIRouter, HTTPException, Query
-import httpx
+from fastapi import APIRouter, Depends, Query, Request
 import asyncio
-from datetime import datetime
-from config import BASE_URL, HEADERS
+from services.airtable import AirtableClient, get_airtable
+from services.scheduler import Priority
+from services.streaming import cached_list
+from services.listquery import ListQuery
+from services.cache import ALL, Cache
+from services.backends import reader
+from services.delta import DeltaSync
+from services.refresher import delta_refresh, refresher
 
 router = APIRouter(tags=["monitoring"])
 
 CACHE_TTL = 86400
-_cache = {
-    "exceptions":    {"data": None, "cached_at": None},
-    "audit_logs":    {"data": None, "cached_at": None},
-    "backorders":    {"data": None, "cached_at": None},
-    "notifications": {"data": None, "cached_at": None},
-    "metrics":       {"data": None, "cached_at": None},
+_caches = {
+    "exceptions":    Cache("exceptions", ttl=CACHE_TTL, table="Exceptions"),
+    "audit_logs":    Cache("audit_logs", ttl=CACHE_TTL, table="AuditLogs"),
+    "backorders":    Cache("backorders", ttl=CACHE_TTL, table="Backorders"),
+    "notifications": Cache("notifications", ttl=CACHE_TTL, table="Notifications"),
+    "metrics":       Cache("metrics", ttl=CACHE_TTL),
 }
 
-def _is_stale(key):
-    c = _cache[key]
-    return c["data"] is None or c["cached_at"] is None or (datetime.utcnow().timestamp() - c["cached_at"]) > CACHE_TTL
+SORT = [("created_at", "desc")]
+_TABLES = {"exceptions": "Exceptions", "audit_logs": "AuditLogs", "backorders": "Backorders", "notifications": "Notifications"}
 
-def _set(key, data):
-    _cache[key]["data"] = data
-    _cache[key]["cached_at"] = datetime.utcnow().timestamp()
-    return data
+def _pages(client, table):
+    return lambda: reader(client, table).iter_pages(table, sort=SORT, priority=Priority.REFRESH)
 
-SORT_PARAMS = "?sort[0][field]=created_at&sort[0][direction]=desc"
+async def _list(request, client, key, table, refresh, query):
+    return await cached_list(request, _caches[key], ALL, _pages(client, table), refresh, query)
+
+for _key, _table in _TABLES.items():
+    refresher.register(_key, _caches[_key], delta_refresh(
+        DeltaSync(_caches[_key], _table, SORT),
+        lambda client, key=_key, table=_table: _caches[key].get_list(ALL, _pages(client, table), refresh=True),
+    ))
 
 @router.get("/exceptions")
-async def list_exceptions(refresh: bool = Query(False)):
-    if not refresh and not _is_stale("exceptions"):
-        return _cache["exceptions"]["data"]
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/Exceptions{SORT_PARAMS}", headers=HEADERS)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        return _set("exceptions", resp.json())
+async def list_exceptions(request: Request, refresh: bool = Query(False), query: ListQuery = Depends(),
+                          client: AirtableClient = Depends(get_airtable)):
+    return await _list(request, client, "exceptions", "Exceptions", refresh, query)
 
 @router.get("/audit-logs")
-async def list_audit_logs(refresh: bool = Query(False)):
-    if not refresh and not _is_stale("audit_logs"):
-        return _cache["audit_logs"]["data"]
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/AuditLogs{SORT_PARAMS}", headers=HEADERS)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        return _set("audit_logs", resp.json())
+async def list_audit_logs(request: Request, refresh: bool = Query(False), query: ListQuery = Depends(),
+                          client: AirtableClient = Depends(get_airtable)):
+    return await _list(request, client, "audit_logs", "AuditLogs", refresh, query)
 
 @router.get("/backorders")
-async def list_backorders(refresh: bool = Query(False)):
-    if not refresh and not _is_stale("backorders"):
-        return _cache["backorders"]["data"]
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/Backorders{SORT_PARAMS}", headers=HEADERS)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        return _set("backorders", resp.json())
+async def list_backorders(request: Request, refresh: bool = Query(False), query: ListQuery = Depends(),
+                          client: AirtableClient = Depends(get_airtable)):
+    return await _list(request, client, "backorders", "Backorders", refresh, query)
 
 @router.get("/notifications")
-async def list_notifications(refresh: bool = Query(False)):
-    if not refresh and not _is_stale("notifications"):
-        return _cache["notifications"]["data"]
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/Notifications{SORT_PARAMS}", headers=HEADERS)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        return _set("notifications", resp.json())
+async def list_notifications(request: Request, refresh: bool = Query(False), query: ListQuery = Depends(),
+                             client: AirtableClient = Depends(get_airtable)):
+    return await _list(request, client, "notifications", "Notifications", refresh, query)
 
-@router.get("/metrics/dashboard")
-async def get_metrics(refresh: bool = Query(False)):
-    if not refresh and not _is_stale("metrics"):
-        return _cache["metrics"]["data"]
-    async with httpx.AsyncClient() as client:
-        orders_resp, logs_resp = await asyncio.gather(
-            client.get(f"{BASE_URL}/Orders", headers=HEADERS),
-            client.get(f"{BASE_URL}/AuditLogs", headers=HEADERS)
-        )
-    orders = orders_resp.json().get("records", [])
-    logs = logs_resp.json().get("records", [])
+async def _compute_metrics(client: AirtableClient):
+    orders, logs = await asyncio.gather(
+        reader(client, "Orders").list_all("Orders", fields=["status"], priority=Priority.REPORT),
+        reader(client, "AuditLogs").list_all("AuditLogs", fields=["status"], priority=Priority.REPORT)
+    )
     statuses = [r["fields"].get("status", "") for r in orders]
     total = len(orders)
     success = sum(1 for s in statuses if s in ("Reserved", "Completed", "Shipped"))
-    return _set("metrics", {
+    return {
         "total_orders": total,
         "total_audit_logs": len(logs),
         "success_rate": round(success / total * 100, 1) if total else 0,
         "orders_by_status": {s: statuses.count(s) for s in set(statuses)}
-    })
\ No newline at end of file
+    }
+
+@router.get("/metrics/dashboard")
+async def get_metrics(refresh: bool = Query(False), client: AirtableClient = Depends(get_airtable)):
+    return await _caches["metrics"].get_or_fetch(ALL, lambda: _compute_metrics(client), refresh)
+
+refresher.register("metrics", _caches["metrics"],
+                   lambda client: _caches["metrics"].get_or_fetch(ALL, lambda: _compute_metrics(client), refresh=True))
@@ -1,129 +1,216 @@
-from fastapi import APIRouter, HTTPException, Query
-import httpx
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, Response
+import asyncio
 from datetime import datetime
-from config import BASE_URL, HEADERS
-from models.schemas import CreateOrderRequest, UpdateStatusRequest
+from models.schemas import BulkCreateOrdersRequest, CreateOrderRequest, OrderItem, UpdateStatusRequest
+from services.airtable import AirtableClient, get_airtable, chunked, BATCH_SIZE
+from services.scheduler import Priority
+from services.streaming import cached_list
+from services.listquery import ListQuery
+from services.cache import ALL, Cache
+from services.delta import DeltaSync
+from config import BULK_ORDERS_MAX, ITEMS_CACHE_MAX
+from services.sku_index import sku_index
+from services.backends import reader
+from services.idempotency import idempotent
+from services.refresher import delta_refresh, refresher
+from routers.stocks import resolve_skus, refresh_stock_records, _fetch_stocks
+from routers.monitoring import _caches as _monitoring_caches
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
-_orders_cache = {"data": None, "cached_at": None}
 CACHE_TTL = 86400
+_orders_cache = Cache("orders", ttl=CACHE_TTL, table="Orders")
 
-SORT_PARAMS = "?sort[0][field]=created_at&sort[0][direction]=desc"
+SORT = [("created_at", "desc")]
 
-async def _fetch_orders():
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/Orders{SORT_PARAMS}", headers=HEADERS)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        _orders_cache["data"] = resp.json()
-        _orders_cache["cached_at"] = datetime.utcnow().timestamp()
-        return _orders_cache["data"]
+_orders_delta = DeltaSync(_orders_cache, "Orders", SORT)
+
+def _orders_pages(client: AirtableClient):
+    return lambda: reader(client, "Orders").iter_pages("Orders", sort=SORT, priority=Priority.REFRESH)
+
+async def _fetch_orders(client: AirtableClient, refresh: bool = False):
+    return await _orders_cache.get_list(ALL, _orders_pages(client), refresh)
+
+refresher.register("orders", _orders_cache, delta_refresh(_orders_delta, lambda client: _fetch_orders(client, refresh=True)))
+
+def _order_fields(order: CreateOrderRequest, now: str) -> dict:
+    return {
+        "customer_email": order.customer_email,
+        "customer_id": order.customer_id,
+        "priority": order.priority,
+        "status": "Pending",
+        "created_at": now,
+        "created_by": "System",
+        "updated_at": now,
+        "updated_by": "System"
+    }
+
+def _unknown_lines(order: CreateOrderRequest, stocks: dict) -> list[dict]:
+    return [
+        {"line": i + 1, "sku": item.sku, "qty": item.qty, "status": "unknown_sku"}
+        for i, item in enumerate(order.items) if item.sku not in stocks
+    ]
+
+async def _create_order_items(client: AirtableClient, rows: list[tuple[str, int, OrderItem]], stocks: dict, now: str) -> list[dict]:
+    # rows are (order id, line number, item), possibly spanning many orders; a failed batch only fails its own lines
+    batches = chunked([{
+        "order_id": [order_id],
+        "sku": [stocks[item.sku]["id"]],
+        "qty": item.qty,
+        "created_at": now,
+        "created_by": "System",
+        "updated_at": now,
+        "updated_by": "System"
+    } for order_id, _, item in rows])
+    results = await asyncio.gather(*(client.create_batch("Order_Items", batch) for batch in batches), return_exceptions=True)
+
+    lines = []
+    for b, result in enumerate(results):
+        for j in range(len(batches[b])):
+            _, number, item = rows[b * BATCH_SIZE + j]
+            line = {"line": number, "sku": item.sku, "qty": item.qty}
+            if isinstance(result, Exception):
+                line.update(status="failed", error=getattr(result, "detail", str(result)))
+            else:
+                line.update(status="created", item_id=result[j]["id"])
+            lines.append(line)
+    return lines
+
+def _after_create(created: list[dict], stock_ids: list[str], background_tasks: BackgroundTasks, client: AirtableClient):
+    _orders_cache.merge_records(created)
+    _monitoring_caches["metrics"].expire()
+    background_tasks.add_task(refresh_stock_records, client, list(dict.fromkeys(stock_ids)))
 
 @router.post("")
-async def create_order(order: CreateOrderRequest):
-    async with httpx.AsyncClient() as client:
-        now = datetime.utcnow().isoformat()
-        payload = {
-            "fields": {
-                "customer_email": order.customer_email, 
-                "customer_id": order.customer_id, 
-                "priority": order.priority, 
-                "status": "Pending", 
-                "created_at": now, 
-                "created_by": "System", 
-                "updated_at": now, 
-                "updated_by": "System"
-                }
-            }
-        resp = await client.post(f"{BASE_URL}/Orders", headers=HEADERS, json=payload)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        
-        order_id = resp.json()["id"]
-        
-        for item in order.items:
-            stocks = await client.get(f"{BASE_URL}/Stocks?filterByFormula={{sku}}='{item.sku}'", headers=HEADERS)
-            stock_data = stocks.json()
-            if stock_data["records"]:
-                stock_id = stock_data["records"][0]["id"]
-                item_payload = {
-                    "fields": {
-                        "order_id": [order_id], 
-                        "sku": [stock_id], 
-                        "qty": item.qty, 
-                        "created_at": now, 
-                        "created_by": "System", 
-                        "updated_at": now, 
-                        "updated_by": "System"
-                        }
-                    }
-                await client.post(f"{BASE_URL}/Order_Items", headers=HEADERS, json=item_payload)
-        
-        _orders_cache["data"] = None  # invalidate cache
-        return {
-            "automation": "Order Successfully Created",
-            "order_id": order_id, 
-        }
+async def create_order(order: CreateOrderRequest, background_tasks: BackgroundTasks, response: Response,
+                       idempotency_key: str | None = Header(None), client: AirtableClient = Depends(get_airtable)):
+    return await idempotent(response, "orders", idempotency_key, order.model_dump(),
+                            lambda: _create_order(order, background_tasks, client))
+
+async def _create_order(order: CreateOrderRequest, background_tasks: BackgroundTasks, client: AirtableClient):
+    if not order.items:
+        raise HTTPException(422, {"message": "Order has no items", "lines": []})
+    stocks = await resolve_skus(client, [item.sku for item in order.items])
+    unknown = _unknown_lines(order, stocks)
+    if unknown:
+        raise HTTPException(422, {"message": "Order contains unknown SKUs", "lines": unknown})
+
+    now = datetime.utcnow().isoformat()
+    created = await client.create("Orders", _order_fields(order, now))
+    order_id = created["id"]
+    lines = await _create_order_items(client, [(order_id, i + 1, item) for i, item in enumerate(order.items)], stocks, now)
+
+    _after_create([created], [stocks[item.sku]["id"] for item in order.items], background_tasks, client)
+    failed = sum(1 for line in lines if line["status"] == "failed")
+    return {
+        "automation": "Order Successfully Created" if not failed else "Order Created With Failed Items",
+        "order_id": order_id,
+        "failed_items": failed,
+        "lines": lines,
+    }
+
+@router.post("/bulk")
+async def create_orders_bulk(req: BulkCreateOrdersRequest, background_tasks: BackgroundTasks, response: Response,
+                             idempotency_key: str | None = Header(None), client: AirtableClient = Depends(get_airtable)):
+    return await idempotent(response, "orders_bulk", idempotency_key, req.model_dump(),
+                            lambda: _create_orders_bulk(req, background_tasks, client))
+
+async def _create_orders_bulk(req: BulkCreateOrdersRequest, background_tasks: BackgroundTasks, client: AirtableClient):
+    if len(req.orders) > BULK_ORDERS_MAX:
+        raise HTTPException(422, f"At most {BULK_ORDERS_MAX} orders per request")
+    # one SKU resolution pass for every line of every order
+    stocks = await resolve_skus(client, [item.sku for order in req.orders for item in order.items])
+    results = [{"index": i, "customer_id": order.customer_id} for i, order in enumerate(req.orders)]
+    valid = []
+    for i, order in enumerate(req.orders):
+        unknown = _unknown_lines(order, stocks)
+        if unknown:
+            results[i].update(status="rejected", error="Order contains unknown SKUs", lines=unknown)
+        elif not order.items:
+            results[i].update(status="rejected", error="Order has no items", lines=[])
+        else:
+            valid.append(i)
+
+    now = datetime.utcnow().isoformat()
+    batches = chunked(valid)
+    created_batches = await asyncio.gather(*(
+        client.create_batch("Orders", [_order_fields(req.orders[i], now) for i in batch]) for batch in batches
+    ), return_exceptions=True)
+
+    created, rows = [], []
+    for batch, result in zip(batches, created_batches):
+        for j, i in enumerate(batch):
+            if isinstance(result, Exception):
+                results[i].update(status="failed", error=getattr(result, "detail", str(result)), lines=[])
+                continue
+            created.append(result[j])
+            results[i]["order_id"] = result[j]["id"]
+            rows += [(result[j]["id"], n + 1, item) for n, item in enumerate(req.orders[i].items)]
+
+    # items of every created order go out together, ten to a batch
+    lines_by_order = {}
+    for (order_id, _, _), line in zip(rows, await _create_order_items(client, rows, stocks, now)):
+        lines_by_order.setdefault(order_id, []).append(line)
+    for result in results:
+        if "order_id" in result:
+            lines = lines_by_order[result["order_id"]]
+            failed = sum(1 for line in lines if line["status"] == "failed")
+            result.update(status="created" if not failed else "created_with_failed_items", failed_items=failed, lines=lines)
+
+    if created:
+        _after_create(created, [stocks[item.sku]["id"] for _, _, item in rows], background_tasks, client)
+    counts = {s: sum(1 for r in results if r["status"] == s) for s in ("created", "created_with_failed_items", "rejected", "failed")}
+    return {
+        "automation": "Orders Successfully Created" if counts["created"] == len(results) else "Orders Created With Failures",
+        "orders": len(results),
+        **counts,
+        "results": results,
+    }
 
 @router.get("")
-async def list_orders(refresh: bool = Query(False)):
-    now_ts = datetime.utcnow().timestamp()
-    cache_stale = (
-        _orders_cache["data"] is None or
-        _orders_cache["cached_at"] is None or
-        (now_ts - _orders_cache["cached_at"]) > CACHE_TTL
-    )
-    if refresh or cache_stale:
-        return await _fetch_orders()
-    return _orders_cache["data"]
-
-_items_cache: dict = {}
+async def list_orders(request: Request, refresh: bool = Query(False), query: ListQuery = Depends(),
+                      client: AirtableClient = Depends(get_airtable)):
+    if refresh and await _orders_delta.refresh(client) is not None:
+        refresh = False  # delta merged into the warm cache; no full refetch needed
+    return await cached_list(request, _orders_cache, ALL, _orders_pages(client), refresh, query)
+
 ITEMS_CACHE_TTL = 86400
+_items_cache = Cache("order_items", ttl=ITEMS_CACHE_TTL, max_entries=ITEMS_CACHE_MAX)
 
-@router.get("/{order_id}/items")
-async def get_order_items(order_id: str):
-    from routers.stocks import _stocks_cache, _fetch_stocks
-    now_ts = datetime.utcnow().timestamp()
-    cached = _items_cache.get(order_id)
-    if cached and (now_ts - cached["cached_at"]) < ITEMS_CACHE_TTL:
-        return cached["data"]
-
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"{BASE_URL}/Order_Items?filterByFormula=FIND('{order_id}',ARRAYJOIN({{order_id}}))&sort[0][field]=created_at&sort[0][direction]=desc",
-            headers=HEADERS
-        )
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        data = resp.json()
-
-    # resolve SKU record IDs to SKU strings using stocks cache
-    stocks_data = _stocks_cache["data"] or await _fetch_stocks()
-    sku_map = {r["id"]: r["fields"].get("sku", r["id"]) for r in stocks_data.get("records", [])}
-    for record in data.get("records", []):
+async def _fetch_order_items(client: AirtableClient, order_id: str):
+    items = await reader(client, "Order_Items").find("Order_Items", "order_id", [order_id])
+
+    # resolve SKU record IDs to SKU strings using the SKU index, on copies: a reader may hand out shared records
+    if not sku_index.ready:
+        await _fetch_stocks(client)
+
+    def resolved(record: dict) -> dict:
         raw = record["fields"].get("sku", [])
-        record["fields"]["sku"] = ", ".join(sku_map.get(rid, rid) for rid in (raw if isinstance(raw, list) else [raw]))
+        sku = ", ".join(sku_index.sku_for(rid) for rid in (raw if isinstance(raw, list) else [raw]))
+        return {**record, "fields": {**record["fields"], "sku": sku}}
 
-    _items_cache[order_id] = {"data": data, "cached_at": now_ts}
-    return data
+    return {"records": [resolved(r) for r in sorted(items, key=lambda r: r["fields"].get("created_at", ""), reverse=True)]}
+
+@router.get("/{order_id}/items")
+async def get_order_items(order_id: str, client: AirtableClient = Depends(get_airtable)):
+    return await _items_cache.get_or_fetch(order_id, lambda: _fetch_order_items(client, order_id))
 
 @router.patch("/{order_id}/status")
-async def update_order_status(order_id: str, req: UpdateStatusRequest):
-    async with httpx.AsyncClient() as client:
-        now = datetime.utcnow().isoformat()
-        fields = {
-            "status": req.status, 
-            "updated_at": now, 
-            "updated_by": "System"
-        }
-        if req.eta:
-            fields["eta"] = req.eta
-        resp = await client.patch(f"{BASE_URL}/Orders/{order_id}", headers=HEADERS, json={"fields": fields})
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        return {
-            "order_id": order_id, 
-            "status": req.status, 
-            "eta": req.eta
-        }
\ No newline at end of file
+async def update_order_status(order_id: str, req: UpdateStatusRequest, client: AirtableClient = Depends(get_airtable)):
+    now = datetime.utcnow().isoformat()
+    fields = {
+        "status": req.status,
+        "updated_at": now,
+        "updated_by": "System"
+    }
+    if req.eta:
+        fields["eta"] = req.eta
+    updated = await client.patch("Orders", order_id, fields)
+    _orders_cache.upsert_record(updated)
+    _items_cache.invalidate(order_id)
+    _monitoring_caches["metrics"].expire()
+    return {
+        "order_id": order_id,
+        "status": req.status,
+        "eta": req.eta
+    }
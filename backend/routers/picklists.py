@@ -1,90 +1,122 @@
-from fastapi import APIRouter, HTTPException, Query
-import httpx
-from datetime import datetime
-from config import BASE_URL, HEADERS
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from config import WAVE_MAX_ORDERS, WAVE_MAX_UNITS
 from models.schemas import UpdateStatusRequest
+from services.airtable import AirtableClient, get_airtable
+from services.scheduler import Priority
+from services.streaming import cached_list
+from services.listquery import ListQuery
+from services.cache import ALL, Cache
+from services.delta import DeltaSync
+from services.routing import plan_route
+from services.waves import plan_waves
+from services.backends import reader
+from services.refresher import delta_refresh, refresher
+from routers.stocks import resolve_stock_ids
 
 router = APIRouter(prefix="/picklists", tags=["picklists"])
 
-_picklists_cache = {"data": None, "cached_at": None}
 CACHE_TTL = 86400
+_picklists_cache = Cache("picklists", ttl=CACHE_TTL, table="Picklists")
 
-SORT_PARAMS = "?sort[0][field]=created_at&sort[0][direction]=desc"
+SORT = [("created_at", "desc")]
 
-async def _fetch_picklists():
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/Picklists{SORT_PARAMS}", headers=HEADERS)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        _picklists_cache["data"] = resp.json()
-        _picklists_cache["cached_at"] = datetime.utcnow().timestamp()
-        return _picklists_cache["data"]
+_picklists_delta = DeltaSync(_picklists_cache, "Picklists", SORT)
+
+def _picklists_pages(client: AirtableClient):
+    return lambda: reader(client, "Picklists").iter_pages("Picklists", sort=SORT, priority=Priority.REFRESH)
+
+async def _fetch_picklists(client: AirtableClient, refresh: bool = False):
+    return await _picklists_cache.get_list(ALL, _picklists_pages(client), refresh)
+
+refresher.register("picklists", _picklists_cache, delta_refresh(_picklists_delta, lambda client: _fetch_picklists(client, refresh=True)))
 
 @router.get("")
-async def list_picklists(refresh: bool = Query(False)):
-    now_ts = datetime.utcnow().timestamp()
-    cache_stale = (
-        _picklists_cache["data"] is None or
-        _picklists_cache["cached_at"] is None or
-        (now_ts - _picklists_cache["cached_at"]) > CACHE_TTL
-    )
-    if refresh or cache_stale:
-        return await _fetch_picklists()
-    return _picklists_cache["data"]
+async def list_picklists(request: Request, refresh: bool = Query(False), query: ListQuery = Depends(),
+                         client: AirtableClient = Depends(get_airtable)):
+    if refresh and await _picklists_delta.refresh(client) is not None:
+        refresh = False  # delta merged into the warm cache; no full refetch needed
+    return await cached_list(request, _picklists_cache, ALL, _picklists_pages(client), refresh, query)
 
 @router.patch("/{picklist_id}/status")
-async def update_picklist_status(picklist_id: str, req: UpdateStatusRequest):
-    async with httpx.AsyncClient() as client:
-        payload = {"fields": {"status": req.status}}
-        resp = await client.patch(f"{BASE_URL}/Picklists/{picklist_id}", headers=HEADERS, json=payload)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        return {
-            "picklist_id": picklist_id, 
-            "status": req.status
-        }
+async def update_picklist_status(picklist_id: str, req: UpdateStatusRequest, client: AirtableClient = Depends(get_airtable)):
+    picklist = await client.patch("Picklists", picklist_id, {"status": req.status})
+    _picklists_cache.upsert_record(picklist)
+    return {
+        "picklist_id": picklist_id,
+        "status": req.status
+    }
+
+async def _pick_stops(client: AirtableClient, order_ids: list[str]) -> list[dict]:
+    items = await reader(client, "Order_Items").find("Order_Items", "order_id", order_ids)
+    stocks = await resolve_stock_ids(client, [f["sku"][0] for f in (i["fields"] for i in items) if f.get("sku")])
+    stops = []
+    for item in items:
+        f = item["fields"]
+        sku_ids = f.get("sku", [])
+        stock = stocks.get(sku_ids[0]) if sku_ids else None
+        if not stock:
+            continue
+        stops.append({
+            "item_id": item["id"],
+            "order_id": (f.get("order_id") or [None])[0],
+            "sku": f.get("item_sku") or stock["sku"],
+            "qty": f.get("qty", 0),
+            "location": stock["location"] or "",
+            "rack": stock["rack"] or "",
+            "stop": f"{stock['location'] or ''}/{stock['rack'] or ''}"
+        })
+    return stops
+
+@router.get("/waves")
+async def plan_picking_waves(
+    since: str | None = Query(None, description="Only picklists created at or after this ISO time"),
+    until: str | None = Query(None, description="Only picklists created before this ISO time"),
+    max_orders: int = Query(WAVE_MAX_ORDERS, ge=1),
+    max_units: int = Query(WAVE_MAX_UNITS, ge=1),
+    refresh: bool = Query(False),
+    client: AirtableClient = Depends(get_airtable)
+):
+    data = await _fetch_picklists(client, refresh)
+    picklists = [
+        r for r in data["records"]
+        if r["fields"].get("status") == "Created" and r["fields"].get("order_id")
+        and (not since or r["fields"].get("created_at", "") >= since)
+        and (not until or r["fields"].get("created_at", "") < until)
+    ]
+    if not picklists:
+        raise HTTPException(404, "No open picklists to wave")
+
+    order_ids = list(dict.fromkeys(o for r in picklists for o in r["fields"]["order_id"]))
+    stops_by_order = {}
+    for stop in await _pick_stops(client, order_ids):
+        stops_by_order.setdefault(stop["order_id"], []).append(stop)
+
+    plan = plan_waves(picklists, stops_by_order, max_orders, max_units)
+    return {
+        "picklists": len(picklists),
+        "max_orders": max_orders,
+        "max_units": max_units,
+        **plan
+    }
 
 @router.get("/{picklist_id}/route")
-async def optimize_route(picklist_id: str):
-    async with httpx.AsyncClient() as client:
-        pl_resp = await client.get(f"{BASE_URL}/Picklists/{picklist_id}", headers=HEADERS)
-        if pl_resp.status_code != 200:
-            raise HTTPException(status_code=pl_resp.status_code, detail=pl_resp.text)
-        pl_fields = pl_resp.json().get("fields", {})
-        order_ids = pl_fields.get("order_id", [])
-        if not order_ids:
-            raise HTTPException(404, "No order linked to this picklist")
-
-        order_id = order_ids[0]
-        items_resp = await client.get(
-            f"{BASE_URL}/Order_Items?filterByFormula={{order_id}}='{order_id}'", headers=HEADERS
-        )
-        items = items_resp.json().get("records", [])
-        if not items:
-            raise HTTPException(404, "No order items found")
-
-        stops = []
-        for item in items:
-            f = item["fields"]
-            sku_ids = f.get("sku", [])
-            if not sku_ids:
-                continue
-            stock_resp = await client.get(f"{BASE_URL}/Stocks/{sku_ids[0]}", headers=HEADERS)
-            if stock_resp.status_code != 200:
-                continue
-            sf = stock_resp.json().get("fields", {})
-            stops.append({
-                "sku": f.get("item_sku") or f.get("lookup_sku", ""),
-                "qty": f.get("qty", 0),
-                "location": sf.get("location", ""),
-                "rack": sf.get("rack", ""),
-                "stop": f"{sf.get('location', '')}/{sf.get('rack', '')}"
-            })
-
-        stops.sort(key=lambda x: (x["location"], x["rack"]))
-        return {
-            "picklist_id": picklist_id,
-            "order_id": order_id,
-            "optimized_route": stops
-        }
+async def optimize_route(picklist_id: str, client: AirtableClient = Depends(get_airtable)):
+    picklist = await reader(client, "Picklists").get("Picklists", picklist_id)
+    pl_fields = picklist.get("fields", {})
+    order_ids = pl_fields.get("order_id", [])
+    if not order_ids:
+        raise HTTPException(404, "No order linked to this picklist")
+
+    stops = await _pick_stops(client, order_ids)
+    if not stops:
+        raise HTTPException(404, "No order items found")
 
+    plan = plan_route(stops)
+    return {
+        "picklist_id": picklist_id,
+        "order_id": order_ids[0],
+        "order_ids": order_ids,
+        "total_distance": plan["total_distance"],
+        "naive_distance": plan["naive_distance"],
+        "optimized_route": plan["route"]
+    }
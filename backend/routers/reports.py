@@ -1,134 +1,179 @@
-from fastapi import APIRouter, HTTPException, Query
-import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 import json
 import asyncio
-from datetime import datetime, timedelta
-from config import BASE_URL, HEADERS
+from datetime import date, datetime, timedelta
+from services.airtable import AirtableClient, get_airtable
+from services.scheduler import Priority
+from services.streaming import cached_list
+from services.listquery import ListQuery
+from services.cache import ALL, Cache
+from services.backends import reader
+from services.delta import DeltaSync
+from services.refresher import delta_refresh, refresher
+from services.aggregation import Below, Count, aggregate
+from services.rollups import METRICS, rollups
+from services.mirror import MIRROR_TABLES, mirror
+from services.reconcile import reconcile_table
+from config import RECONCILE_CACHE_MAX_AGE
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
-_reports_cache = {"data": None, "cached_at": None}
 CACHE_TTL = 86400
+_reports_cache = Cache("reports", ttl=CACHE_TTL, table="Reports")
 
-SORT_PARAMS = "?sort[0][field]=created_at&sort[0][direction]=desc"
+SORT = [("created_at", "desc")]
+LOW_STOCK_THRESHOLD = 10
 
-async def _fetch_reports():
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/Reports{SORT_PARAMS}", headers=HEADERS)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        _reports_cache["data"] = resp.json()
-        _reports_cache["cached_at"] = datetime.utcnow().timestamp()
-        return _reports_cache["data"]
+def _reports_pages(client: AirtableClient):
+    return lambda: reader(client, "Reports").iter_pages("Reports", sort=SORT, priority=Priority.REFRESH)
 
-async def _save_report(client, report_type, data):
+async def _fetch_reports(client: AirtableClient, refresh: bool = False):
+    return await _reports_cache.get_list(ALL, _reports_pages(client), refresh)
+
+refresher.register("reports", _reports_cache, delta_refresh(
+    DeltaSync(_reports_cache, "Reports", SORT), lambda client: _fetch_reports(client, refresh=True)
+))
+
+async def _save_report(client: AirtableClient, report_type, data) -> dict:
+    # the report is already computed; a failed save is reported alongside it rather than replacing it with an error
     now = datetime.utcnow().isoformat()
-    payload = {
-        "fields": {
-            "report_type": report_type, 
-            "report_data": json.dumps(data), 
-            "generated_by": "System", 
-            "status": "Generated", 
-            "created_at": now, 
-            "created_by": "System", 
-            "updated_at": now, 
+    try:
+        created = await client.create("Reports", {
+            "report_type": report_type,
+            "report_data": json.dumps(data),
+            "generated_by": "System",
+            "status": "Generated",
+            "created_at": now,
+            "created_by": "System",
+            "updated_at": now,
             "updated_by": "System"
-            }
-        }
-    resp = await client.post(f"{BASE_URL}/Reports", headers=HEADERS, json=payload)
-    return resp.json()["id"]
+        }, typecast=True)
+    except HTTPException as e:
+        return {"report_id": None, "save_error": e.detail}
+    _reports_cache.upsert_record(created)
+    return {"report_id": created["id"]}
 
 @router.get("/reconciliation")
-async def stock_reconciliation():
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/Stocks", headers=HEADERS)
-        stocks = resp.json()["records"]
-        report = [{
-            "sku": s["fields"]["sku"], 
-            "quantity": s["fields"].get("quantity", 0), 
-            "available": s["fields"].get("available", 0), 
-            "reserved": s["fields"].get("reserved", 0)
-        } for s in stocks]
-        
-        report_id = await _save_report(client, "Stock Reconciliation", report)
-        return {
-            "report_id": report_id, 
-            "report": report, 
-            "total_items": len(report)
-        }
+async def stock_reconciliation(client: AirtableClient = Depends(get_airtable)):
+    stocks = await reader(client, "Stocks").list_all("Stocks", priority=Priority.REPORT)
+    report = [{
+        "sku": s["fields"]["sku"],
+        "quantity": s["fields"].get("quantity", 0),
+        "available": s["fields"].get("available", 0),
+        "reserved": s["fields"].get("reserved", 0)
+    } for s in stocks]
+
+    saved = await _save_report(client, "Stock Reconciliation", report)
+    return {
+        **saved,
+        "report": report,
+        "total_items": len(report)
+    }
+
+def _created_since(days: int) -> str:
+    since = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    return f"IS_AFTER({{created_at}},'{since}')"
+
+@router.post("/reconciliation/mirror")
+async def mirror_reconciliation(
+    table: list[str] | None = Query(None, description="Tables to compare, defaults to every mirrored table"),
+    resync: bool = Query(False, description="Copy missing/mismatched records to DynamoDB and delete extras"),
+    max_age: float = Query(RECONCILE_CACHE_MAX_AGE, ge=0, description="Oldest cached Airtable list to hash, in seconds"),
+    client: AirtableClient = Depends(get_airtable)
+):
+    tables = table or list(MIRROR_TABLES)
+    unknown = [t for t in tables if t not in MIRROR_TABLES]
+    if unknown:
+        raise HTTPException(422, f"Not mirrored to DynamoDB: {', '.join(unknown)}")
+    results = await asyncio.gather(*(reconcile_table(client, mirror, t, max_age, resync) for t in tables))
+    summary = {r["table"]: {
+        "in_sync": r["in_sync"],
+        "missing": r["missing_count"],
+        "extra": r["extra_count"],
+        "mismatched": r["mismatched_count"],
+        "resynced": r["resynced"],
+    } for r in results}
+    # with resync the mirror has already been written; a failed save must not hide what changed
+    saved = await _save_report(client, "Mirror Reconciliation", summary)
+    return {**saved, "tables": results}
 
 @router.post("/daily")
-async def daily_summary():
-    async with httpx.AsyncClient() as client:
-        since = (datetime.utcnow() - timedelta(days=1)).isoformat()
-        orders_resp, picklists_resp, exceptions_resp, backorders_resp = await asyncio.gather(
-            client.get(f"{BASE_URL}/Orders?filterByFormula=IS_AFTER({{created_at}},'{since}')", headers=HEADERS),
-            client.get(f"{BASE_URL}/Picklists?filterByFormula=IS_AFTER({{created_at}},'{since}')", headers=HEADERS),
-            client.get(f"{BASE_URL}/Exceptions?filterByFormula=IS_AFTER({{created_at}},'{since}')", headers=HEADERS),
-            client.get(f"{BASE_URL}/Backorders?filterByFormula=IS_AFTER({{created_at}},'{since}')", headers=HEADERS),
-        )
-        orders = orders_resp.json().get("records", [])
-        picklists = picklists_resp.json().get("records", [])
-        exceptions = exceptions_resp.json().get("records", [])
-        backorders = backorders_resp.json().get("records", [])
-        statuses = [o["fields"].get("status", "") for o in orders]
-        priorities = [o["fields"].get("priority", "") for o in orders]
-        report = {
-            "date": datetime.utcnow().date().isoformat(),
-            "total_orders": len(orders),
-            "by_status": {s: statuses.count(s) for s in set(statuses)},
-            "by_priority": {p: priorities.count(p) for p in set(priorities)},
-            "picklists_generated": len(picklists),
-            "exceptions_raised": len(exceptions),
-            "backorders_created": len(backorders),
-        }
-        report_id = await _save_report(client, "Daily Summary", report)
-        return {"report_id": report_id, "report": report}
+async def daily_summary(client: AirtableClient = Depends(get_airtable)):
+    created_since = _created_since(days=1)
+    totals = await aggregate(client, {
+        table: (created_since, METRICS[table]()) for table in ("Orders", "Picklists", "Exceptions", "Backorders")
+    })
+    report = {"date": datetime.utcnow().date().isoformat(), **totals}
+    saved = await _save_report(client, "Daily Summary", report)
+    return {**saved, "report": report}
+
+async def _stock_levels(client: AirtableClient) -> dict:
+    return await aggregate(client, {
+        "Stocks": (None, [Count("total_skus"), Below("low_stock", "available", LOW_STOCK_THRESHOLD)]),
+    })
 
 @router.post("/weekly")
-async def weekly_summary():
-    async with httpx.AsyncClient() as client:
-        since = (datetime.utcnow() - timedelta(days=7)).isoformat()
-        orders_resp, stocks_resp, receipts_resp, exceptions_resp, backorders_resp = await asyncio.gather(
-            client.get(f"{BASE_URL}/Orders?filterByFormula=IS_AFTER({{created_at}},'{since}')", headers=HEADERS),
-            client.get(f"{BASE_URL}/Stocks", headers=HEADERS),
-            client.get(f"{BASE_URL}/Good_Receipts?filterByFormula=IS_AFTER({{created_at}},'{since}')", headers=HEADERS),
-            client.get(f"{BASE_URL}/Exceptions?filterByFormula=IS_AFTER({{created_at}},'{since}')", headers=HEADERS),
-            client.get(f"{BASE_URL}/Backorders?filterByFormula=IS_AFTER({{created_at}},'{since}')", headers=HEADERS),
-        )
-        orders = orders_resp.json().get("records", [])
-        stocks = stocks_resp.json().get("records", [])
-        receipts = receipts_resp.json().get("records", [])
-        exceptions = exceptions_resp.json().get("records", [])
-        backorders = backorders_resp.json().get("records", [])
-        statuses = [o["fields"].get("status", "") for o in orders]
-        priorities = [o["fields"].get("priority", "") for o in orders]
-        fulfilled = statuses.count("Fulfilled")
-        total_received = sum(r["fields"].get("quantity", 0) for r in receipts)
-        report = {
-            "week_ending": datetime.utcnow().date().isoformat(),
-            "total_orders": len(orders),
-            "by_status": {s: statuses.count(s) for s in set(statuses)},
-            "by_priority": {p: priorities.count(p) for p in set(priorities)},
-            "fulfillment_rate": round(fulfilled / len(orders) * 100, 1) if orders else 0,
-            "total_skus": len(stocks),
-            "low_stock": [s["fields"]["sku"] for s in stocks if s["fields"].get("available", 0) < 10],
-            "goods_receipts": len(receipts),
-            "total_stock_received": total_received,
-            "exceptions_raised": len(exceptions),
-            "backorders_created": len(backorders),
-        }
-        report_id = await _save_report(client, "Weekly Summary", report)
-        return {"report_id": report_id, "report": report}
+async def weekly_summary(recompute: bool = Query(False), client: AirtableClient = Depends(get_airtable)):
+    today = datetime.utcnow().date()
+    totals, stocks = await asyncio.gather(
+        rollups.summary(client, today - timedelta(days=6), today, recompute),
+        _stock_levels(client),
+    )
+    report = {
+        "week_ending": today.isoformat(),
+        "total_orders": totals["total_orders"],
+        "by_status": totals["by_status"],
+        "by_priority": totals["by_priority"],
+        "fulfillment_rate": totals["fulfillment_rate"],
+        "total_skus": stocks["total_skus"],
+        "low_stock": stocks["low_stock"],
+        "goods_receipts": totals["goods_receipts"],
+        "total_stock_received": totals["total_stock_received"],
+        "exceptions_raised": totals["exceptions_raised"],
+        "backorders_created": totals["backorders_created"],
+    }
+    saved = await _save_report(client, "Weekly Summary", report)
+    return {**saved, "report": report}
+
+@router.post("/monthly")
+async def monthly_summary(
+    month: str | None = Query(None, description="YYYY-MM, defaults to the current month"),
+    recompute: bool = Query(False),
+    client: AirtableClient = Depends(get_airtable)
+):
+    today = datetime.utcnow().date()
+    try:
+        first = date.fromisoformat(f"{month}-01") if month else today.replace(day=1)
+    except ValueError:
+        raise HTTPException(422, "month must be YYYY-MM")
+    last = min((first + timedelta(days=32)).replace(day=1) - timedelta(days=1), today)
+    if first > today:
+        raise HTTPException(422, "month is in the future")
+    totals, stocks = await asyncio.gather(rollups.summary(client, first, last, recompute), _stock_levels(client))
+    report = {"month": first.strftime("%Y-%m"), "through": last.isoformat(), **totals, **stocks}
+    saved = await _save_report(client, "Monthly Summary", report)
+    return {**saved, "report": report}
+
+@router.get("/summary")
+async def range_summary(
+    start: date = Query(...),
+    end: date = Query(...),
+    daily: bool = Query(False, description="Include the per-day buckets"),
+    recompute: bool = Query(False),
+    client: AirtableClient = Depends(get_airtable)
+):
+    if end < start:
+        raise HTTPException(422, "end must not be before start")
+    if daily:
+        buckets = await rollups.buckets(client, start, end, recompute)
+        return {"start": start.isoformat(), "end": end.isoformat(), **rollups.total(buckets), "days": buckets}
+    return {"start": start.isoformat(), "end": end.isoformat(), **await rollups.summary(client, start, end, recompute)}
+
+@router.get("/rollups")
+async def rollup_status():
+    return await rollups.store.call(rollups.store.snapshot)
 
 @router.get("")
-async def list_reports(refresh: bool = Query(False)):
-    now_ts = datetime.utcnow().timestamp()
-    cache_stale = (
-        _reports_cache["data"] is None or
-        _reports_cache["cached_at"] is None or
-        (now_ts - _reports_cache["cached_at"]) > CACHE_TTL
-    )
-    if refresh or cache_stale:
-        return await _fetch_reports()
-    return _reports_cache["data"]
+async def list_reports(request: Request, refresh: bool = Query(False), query: ListQuery = Depends(),
+                       client: AirtableClient = Depends(get_airtable)):
+    return await cached_list(request, _reports_cache, ALL, _reports_pages(client), refresh, query)
@@ -1,97 +1,148 @@
-from fastapi import APIRouter, HTTPException, Query
-import httpx
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+import asyncio
 from datetime import datetime
-from config import BASE_URL, HEADERS
+from services.airtable import AirtableClient, get_airtable, any_id, chunked
+from services.scheduler import Priority
+from services.streaming import cached_list, stream_pages, wants_ndjson
+from services.listquery import ListQuery
+from services.cache import ALL, Cache
+from services.delta import DeltaSync
+from services.sku_index import sku_index
+from services.backends import reader
+from services.idempotency import idempotent
+from services.coalesce import Coalescer
+from services.refresher import delta_refresh, refresher
+from services.shared_cache import shared
+from config import RECEIPT_COALESCE_WINDOW
 
 router = APIRouter(prefix="/stocks", tags=["stocks"])
 
-_stocks_cache = {"data": None, "cached_at": None}
 CACHE_TTL = 86400
+_stocks_cache = Cache("stocks", ttl=CACHE_TTL, on_records=sku_index.apply, table="Stocks")
 
-SORT_PARAMS = "?sort[0][field]=created_at&sort[0][direction]=desc"
+SORT = [("created_at", "desc")]
 
-async def _fetch_stocks():
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/Stocks{SORT_PARAMS}", headers=HEADERS)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        _stocks_cache["data"] = resp.json()
-        _stocks_cache["cached_at"] = datetime.utcnow().timestamp()
-        return _stocks_cache["data"]
+# keeps OR() formulas well under Airtable's URL length limit
+SKU_LOOKUP_CHUNK = 50
+
+_stocks_delta = DeltaSync(_stocks_cache, "Stocks", SORT)
+
+def _stocks_pages(client: AirtableClient):
+    return lambda: reader(client, "Stocks").iter_pages("Stocks", sort=SORT, priority=Priority.REFRESH)
+
+async def _fetch_stocks(client: AirtableClient, refresh: bool = False):
+    return await _stocks_cache.get_list(ALL, _stocks_pages(client), refresh)
+
+refresher.register("stocks", _stocks_cache, delta_refresh(_stocks_delta, lambda client: _fetch_stocks(client, refresh=True)))
+
+async def resolve_skus(client: AirtableClient, skus: list[str]) -> dict:
+    wanted = list(dict.fromkeys(skus))
+    found = {sku: sku_index.get(sku) for sku in wanted if sku_index.get(sku)}
+    # only SKUs the index has never seen go upstream
+    missing = [sku for sku in wanted if sku not in found]
+    if missing:
+        sku_index.upsert(await reader(client, "Stocks").find("Stocks", "sku", missing))
+    for sku in missing:
+        if sku_index.get(sku):
+            found[sku] = sku_index.get(sku)
+    return found
+
+async def resolve_stock_ids(client: AirtableClient, stock_ids: list[str]) -> dict:
+    wanted = list(dict.fromkeys(stock_ids))
+    missing = [rid for rid in wanted if rid not in sku_index.by_id]
+    if missing:
+        sku_index.upsert(await reader(client, "Stocks").get_many("Stocks", missing))
+    return {rid: sku_index.by_id[rid] for rid in wanted if rid in sku_index.by_id}
+
+async def refresh_stock_records(client: AirtableClient, stock_ids: list[str]):
+    # computed fields (reserved/available) change upstream, so re-read just the touched rows
+    results = await asyncio.gather(*(
+        client.list_all("Stocks", formula=any_id(batch), priority=Priority.REFRESH)
+        for batch in chunked(list(dict.fromkeys(stock_ids)), SKU_LOOKUP_CHUNK)
+    ))
+    for records in results:
+        for record in records:
+            _stocks_cache.upsert_record(record)
 
 @router.get("")
-async def list_stocks(refresh: bool = Query(False)):
-    now_ts = datetime.utcnow().timestamp()
-    cache_stale = (
-        _stocks_cache["data"] is None or
-        _stocks_cache["cached_at"] is None or
-        (now_ts - _stocks_cache["cached_at"]) > CACHE_TTL
-    )
-    if refresh or cache_stale:
-        return await _fetch_stocks()
-    return _stocks_cache["data"]
+async def list_stocks(request: Request, refresh: bool = Query(False), query: ListQuery = Depends(),
+                      client: AirtableClient = Depends(get_airtable)):
+    if refresh and await _stocks_delta.refresh(client) is not None:
+        refresh = False  # delta merged into the warm cache; no full refetch needed
+    return await cached_list(request, _stocks_cache, ALL, _stocks_pages(client), refresh, query)
+
+async def _apply_receipts(stock_id: str, items: list[tuple[AirtableClient, dict]]) -> list:
+    # one read-modify-write of add_stock for every receipt coalesced for this stock record; add_stock is
+    # read fresh here (the index is for lookups) and no other receipt for the record can interleave
+    client = items[0][0]
+    rows = [fields for _, fields in items]
+    stock_fields = (await client.get("Stocks", stock_id))["fields"]
+    batches = chunked(rows)
+    created = await asyncio.gather(*(client.create_batch("Good_Receipts", batch) for batch in batches), return_exceptions=True)
+
+    results, received = [], 0
+    for batch, result in zip(batches, created):
+        if isinstance(result, Exception):
+            results += [result] * len(batch)
+        else:
+            results += result
+            received += sum(fields["quantity"] for fields in batch)
+    if received:
+        stock = await client.patch("Stocks", stock_id, {
+            "add_stock": stock_fields.get("add_stock", 0) + received,
+            "updated_at": rows[-1]["updated_at"],
+            "updated_by": rows[-1]["updated_by"]
+        })
+        _stocks_cache.upsert_record(stock)
+        results = [r if isinstance(r, Exception) else (r, stock) for r in results]
+    return results
+
+# with several workers, a per-SKU lease keeps their read-modify-writes of add_stock from overlapping
+_receipts = Coalescer(
+    _apply_receipts, RECEIPT_COALESCE_WINDOW,
+    lock=(lambda stock_id: shared.lock(f"receipts:{stock_id}")) if shared is not None else None,
+)
 
 @router.post("/goods-receipt")
-async def receive_goods(sku: str, quantity: int, location: str, rack: str, received_by: str = "System"):
-    async with httpx.AsyncClient() as client:
-        stocks = await client.get(f"{BASE_URL}/Stocks?filterByFormula={{sku}}='{sku}'", headers=HEADERS)
-        stock_data = stocks.json()
-        if stock_data["records"]:
-            stock_record = stock_data["records"][0]
-            stock_id = stock_record["id"]
-            stock_fields = stock_record["fields"]
-            registered_location = stock_fields.get("location")
-            registered_rack = stock_fields.get("rack")
-            if registered_location and registered_location != location:
-                raise HTTPException(400, f"SKU '{sku}' is registered at {registered_location}, not {location}")
-            if registered_rack and registered_rack != rack:
-                raise HTTPException(400, f"SKU '{sku}' is registered at {registered_rack}, not {rack}")
-            now = datetime.utcnow().isoformat()
-            
-            receipt_payload = {
-                "fields": {
-                    "link_sku": [stock_id], 
-                    "quantity": quantity, 
-                    "location": location, 
-                    "rack": rack, 
-                    "received_by": received_by, 
-                    "status": "Completed", 
-                    "created_at": now, 
-                    "created_by": received_by, 
-                    "updated_at": now, 
-                    "updated_by": received_by
-                }
-            }
-            
-            receipt_resp = await client.post(f"{BASE_URL}/Good_Receipts", headers=HEADERS, json=receipt_payload)
-            
-            if receipt_resp.status_code != 200:
-                raise HTTPException(status_code=receipt_resp.status_code, detail=receipt_resp.text)
-            
-            current_add = stock_fields.get("add_stock", 0)
-            stock_payload = {
-                "fields": {
-                    "add_stock": current_add + quantity, 
-                    "updated_at": now, 
-                    "updated_by": received_by
-                }
-            }
-            
-            await client.patch(f"{BASE_URL}/Stocks/{stock_id}", headers=HEADERS, json=stock_payload)
-            
-            return {
-                "receipt_id": receipt_resp.json().get("id"), 
-                "status": "received", "sku": sku, 
-                "quantity": quantity, 
-                "location": location, 
-                "rack": rack
-            }
+async def receive_goods(sku: str, quantity: int, location: str, rack: str, response: Response, received_by: str = "System",
+                        idempotency_key: str | None = Header(None), client: AirtableClient = Depends(get_airtable)):
+    payload = {"sku": sku, "quantity": quantity, "location": location, "rack": rack, "received_by": received_by}
+    return await idempotent(response, "goods_receipt", idempotency_key, payload,
+                            lambda: _receive_goods(client, **payload))
+
+async def _receive_goods(client: AirtableClient, sku: str, quantity: int, location: str, rack: str, received_by: str):
+    entry = (await resolve_skus(client, [sku])).get(sku)
+    if entry:
+        stock_id = entry["id"]
+        registered_location = entry["location"]
+        registered_rack = entry["rack"]
+        if registered_location and registered_location != location:
+            raise HTTPException(400, f"SKU '{sku}' is registered at {registered_location}, not {location}")
+        if registered_rack and registered_rack != rack:
+            raise HTTPException(400, f"SKU '{sku}' is registered at {registered_rack}, not {rack}")
+        now = datetime.utcnow().isoformat()
+        receipt, _ = await _receipts.submit(stock_id, (client, {
+            "link_sku": [stock_id],
+            "quantity": quantity,
+            "location": location,
+            "rack": rack,
+            "received_by": received_by,
+            "status": "Completed",
+            "created_at": now,
+            "created_by": received_by,
+            "updated_at": now,
+            "updated_by": received_by
+        }))
+
+        return {
+            "receipt_id": receipt.get("id"),
+            "status": "received", "sku": sku,
+            "quantity": quantity,
+            "location": location,
+            "rack": rack
+        }
     raise HTTPException(404, "SKU not found")
 
 @router.get("/goods-receipts")
-async def list_goods_receipts():
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/Good_Receipts{SORT_PARAMS}", headers=HEADERS)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        return resp.json()
+async def list_goods_receipts(request: Request, client: AirtableClient = Depends(get_airtable)):
+    return await stream_pages(reader(client, "Good_Receipts").iter_pages("Good_Receipts", sort=SORT), wants_ndjson(request))
@@ -1,79 +1,73 @@
-from fastapi import APIRouter, HTTPException, Query
-import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from datetime import datetime
-from config import BASE_URL, HEADERS
+from services.airtable import AirtableClient, get_airtable
+from services.scheduler import Priority
+from services.streaming import cached_list
+from services.listquery import ListQuery
+from services.cache import ALL, Cache
+from services.backends import reader
+from services.delta import DeltaSync
+from services.refresher import delta_refresh, refresher
+from routers.stocks import _stocks_cache, resolve_skus
 
 router = APIRouter(prefix="/stock-transfers", tags=["transfers"])
 
-_transfers_cache = {"data": None, "cached_at": None}
 CACHE_TTL = 86400
+_transfers_cache = Cache("transfers", ttl=CACHE_TTL, table="Stock_Transfers")
 
-SORT_PARAMS = "?sort[0][field]=created_at&sort[0][direction]=desc"
+SORT = [("created_at", "desc")]
 
-async def _fetch_transfers():
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/Stock_Transfers{SORT_PARAMS}", headers=HEADERS)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        _transfers_cache["data"] = resp.json()
-        _transfers_cache["cached_at"] = datetime.utcnow().timestamp()
-        return _transfers_cache["data"]
+def _transfers_pages(client: AirtableClient):
+    return lambda: reader(client, "Stock_Transfers").iter_pages("Stock_Transfers", sort=SORT, priority=Priority.REFRESH)
+
+async def _fetch_transfers(client: AirtableClient, refresh: bool = False):
+    return await _transfers_cache.get_list(ALL, _transfers_pages(client), refresh)
+
+refresher.register("transfers", _transfers_cache, delta_refresh(
+    DeltaSync(_transfers_cache, "Stock_Transfers", SORT), lambda client: _fetch_transfers(client, refresh=True)
+))
 
 @router.post("")
-async def create_stock_transfer(from_location: str, to_location: str, from_rack: str, to_rack: str, sku: str, requested_by: str):
+async def create_stock_transfer(from_location: str, to_location: str, from_rack: str, to_rack: str, sku: str, requested_by: str,
+                                client: AirtableClient = Depends(get_airtable)):
     if from_location == to_location and from_rack == to_rack:
         raise HTTPException(400, "Source and destination location/rack cannot be the same")
-    async with httpx.AsyncClient() as client:
-        stocks = await client.get(f"{BASE_URL}/Stocks?filterByFormula={{sku}}='{sku}'", headers=HEADERS)
-        stock_data = stocks.json()
-        if not stock_data.get("records"):
-            raise HTTPException(404, f"SKU '{sku}' not found in inventory")
-        stock_fields = stock_data["records"][0]["fields"]
-        registered_location = stock_fields.get("location")
-        registered_rack = stock_fields.get("rack")
-        if registered_location and registered_location != from_location:
-            raise HTTPException(400, f"SKU '{sku}' is registered at {registered_location}, not {from_location}")
-        if registered_rack and registered_rack != from_rack:
-            raise HTTPException(400, f"SKU '{sku}' is registered at {registered_rack}, not {from_rack}")
-        stock_id = stock_data["records"][0]["id"]
-        now = datetime.utcnow().isoformat()
-        status = "Completed"
-        payload = {
-            "fields": {
-                "from_location": from_location, 
-                "to_location": to_location, 
-                "from_rack": from_rack, 
-                "to_rack": to_rack, 
-                "sku": sku, 
-                "status": status, 
-                "requested_by": requested_by, 
-                "created_at": now, 
-                "created_by": requested_by, 
-                "updated_at": now, 
-                "updated_by": requested_by
-            }
-        }
-        resp = await client.post(f"{BASE_URL}/Stock_Transfers", headers=HEADERS, json=payload)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        transfer_id = resp.json()["id"]
-        await client.patch(f"{BASE_URL}/Stocks/{stock_id}", headers=HEADERS, json={
-            "fields": {"location": to_location, "rack": to_rack, "updated_at": now, "updated_by": requested_by}
-        })
-        return {
-            "transfer_id": transfer_id,
-            "status": status,
-            "stock_updated": True
-        }
+    entry = (await resolve_skus(client, [sku])).get(sku)
+    if not entry:
+        raise HTTPException(404, f"SKU '{sku}' not found in inventory")
+    registered_location = entry["location"]
+    registered_rack = entry["rack"]
+    if registered_location and registered_location != from_location:
+        raise HTTPException(400, f"SKU '{sku}' is registered at {registered_location}, not {from_location}")
+    if registered_rack and registered_rack != from_rack:
+        raise HTTPException(400, f"SKU '{sku}' is registered at {registered_rack}, not {from_rack}")
+    stock_id = entry["id"]
+    now = datetime.utcnow().isoformat()
+    status = "Completed"
+    transfer = await client.create("Stock_Transfers", {
+        "from_location": from_location,
+        "to_location": to_location,
+        "from_rack": from_rack,
+        "to_rack": to_rack,
+        "sku": sku,
+        "status": status,
+        "requested_by": requested_by,
+        "created_at": now,
+        "created_by": requested_by,
+        "updated_at": now,
+        "updated_by": requested_by
+    })
+    transfer_id = transfer["id"]
+    _transfers_cache.upsert_record(transfer)
+    stock = await client.patch("Stocks", stock_id, {"location": to_location, "rack": to_rack, "updated_at": now, "updated_by": requested_by})
+    _stocks_cache.upsert_record(stock)
+    return {
+        "transfer_id": transfer_id,
+        "status": status,
+        "stock_updated": True
+    }
 
 @router.get("")
-async def list_stock_transfers(refresh: bool = Query(False)):
-    now_ts = datetime.utcnow().timestamp()
-    cache_stale = (
-        _transfers_cache["data"] is None or
-        _transfers_cache["cached_at"] is None or
-        (now_ts - _transfers_cache["cached_at"]) > CACHE_TTL
-    )
-    if refresh or cache_stale:
-        return await _fetch_transfers()
-    return _transfers_cache["data"]
+async def list_stock_transfers(request: Request, refresh: bool = Query(False), query: ListQuery = Depends(),
+                               client: AirtableClient = Depends(get_airtable)):
+    return await cached_list(request, _transfers_cache, ALL, _transfers_pages(client), refresh, query)
@@ -0,0 +1,124 @@
+import asyncio
+from collections import Counter
+from typing import Callable
+from services.airtable import AirtableClient
+from services.scheduler import Priority
+
+def _value(fields: dict, field: str):
+    # lookups and links come back as lists; report on their first value
+    value = fields.get(field)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value
+
+class Accumulator:
+    # one-pass reducer over record fields; subclasses list the fields they read so pages stay small
+    fields: tuple[str, ...] = ()
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def add(self, fields: dict) -> None:
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+class Count(Accumulator):
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.n = 0
+
+    def add(self, fields: dict) -> None:
+        self.n += 1
+
+    def result(self) -> int:
+        return self.n
+
+class CountBy(Accumulator):
+    def __init__(self, name: str, field: str, default: str = ""):
+        super().__init__(name)
+        self.field = field
+        self.fields = (field,)
+        self.default = default
+        self.counts = Counter()
+
+    def add(self, fields: dict) -> None:
+        self.counts[_value(fields, self.field) or self.default] += 1
+
+    def result(self) -> dict:
+        return dict(self.counts)
+
+class Sum(Accumulator):
+    def __init__(self, name: str, field: str):
+        super().__init__(name)
+        self.field = field
+        self.fields = (field,)
+        self.total = 0
+
+    def add(self, fields: dict) -> None:
+        self.total += _value(fields, self.field) or 0
+
+    def result(self):
+        return self.total
+
+class Below(Accumulator):
+    # keys of records whose field is under a threshold, e.g. low-stock SKUs
+    def __init__(self, name: str, field: str, threshold: float, key: str = "sku"):
+        super().__init__(name)
+        self.field = field
+        self.key = key
+        self.fields = (field, key)
+        self.threshold = threshold
+        self.matches = []
+
+    def add(self, fields: dict) -> None:
+        if (_value(fields, self.field) or 0) < self.threshold:
+            self.matches.append(_value(fields, self.key))
+
+    def result(self) -> list:
+        return self.matches
+
+class ByDay(Accumulator):
+    # runs a fresh set of accumulators per calendar day of a date field, for daily rollups
+    def __init__(self, name: str, factory: Callable[[], list[Accumulator]], field: str = "created_at"):
+        super().__init__(name)
+        self.factory = factory
+        self.field = field
+        self.fields = (field, *{f for a in factory() for f in a.fields})
+        self.days: dict[str, list[Accumulator]] = {}
+
+    def add(self, fields: dict) -> None:
+        day = (_value(fields, self.field) or "")[:10]
+        if not day:
+            return
+        accumulators = self.days.get(day)
+        if accumulators is None:
+            accumulators = self.days[day] = self.factory()
+        for a in accumulators:
+            a.add(fields)
+
+    def result(self) -> dict:
+        return {day: {a.name: a.result() for a in accumulators} for day, accumulators in self.days.items()}
+
+Plan = dict[str, tuple[str | None, list[Accumulator]]]
+
+# asked for when no accumulator reads a field (plain Counts); every table has it, and an empty fields[] would fetch every column
+COUNT_FIELD = "created_at"
+
+async def _consume(client: AirtableClient, table: str, formula: str | None, accumulators: list[Accumulator],
+                   priority: Priority) -> None:
+    fields = sorted({f for a in accumulators for f in a.fields}) or [COUNT_FIELD]
+    async for page in client.iter_pages(table, formula=formula, fields=fields, priority=priority):
+        for record in page:
+            f = record.get("fields", {})
+            for a in accumulators:
+                a.add(f)
+
+async def aggregate(client: AirtableClient, plan: Plan, priority: Priority = Priority.REPORT) -> dict:
+    # plan maps table -> (filterByFormula, accumulators); every table is paged concurrently and
+    # each page is folded into its accumulators and dropped, so memory stays flat however large the range
+    await asyncio.gather(*(
+        _consume(client, table, formula, accumulators, priority) for table, (formula, accumulators) in plan.items()
+    ))
+    return {a.name: a.result() for _, accumulators in plan.values() for a in accumulators}
@@ -0,0 +1,197 @@
+import importlib.util
+import time
+from typing import AsyncIterator
+from urllib.parse import unquote
+import httpx
+from fastapi import HTTPException, Request
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+from config import (
+    BASE_URL, HEADERS, AIRTABLE_MAX_CONNECTIONS, AIRTABLE_MAX_KEEPALIVE, AIRTABLE_KEEPALIVE_EXPIRY,
+    AIRTABLE_TIMEOUT, AIRTABLE_CONNECT_TIMEOUT, AIRTABLE_HTTP2,
+    AIRTABLE_RATE_LIMIT, AIRTABLE_RATE_WINDOW, AIRTABLE_LOCKOUT, AIRTABLE_MAX_RETRIES, AIRTABLE_RETRY_MAX_WAIT
+)
+from services.scheduler import AirtableScheduler, Priority
+from services.metrics import AIRTABLE_DURATION, AIRTABLE_RETRIES
+from services.profiling import record_airtable
+
+Sort = list[tuple[str, str]]
+Records = list[dict]
+Fields = list[str]
+
+# Airtable accepts at most 10 records per create/update request
+BATCH_SIZE = 10
+
+def chunked(items: list, size: int = BATCH_SIZE) -> list[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def quote(value: str) -> str:
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+def any_of(field: str, values: list) -> str:
+    return "OR(" + ",".join(f"{{{field}}}={quote(v)}" for v in values) + ")"
+
+def any_id(record_ids: list) -> str:
+    return "OR(" + ",".join(f"RECORD_ID()={quote(v)}" for v in record_ids) + ")"
+
+class RetryableResponse(Exception):
+    def __init__(self, resp: httpx.Response):
+        super().__init__(f"Airtable returned {resp.status_code}")
+        self.resp = resp
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    try:
+        return float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def _is_retryable(method: str):
+    def check(exc: BaseException) -> bool:
+        if isinstance(exc, RetryableResponse):
+            return True
+        # only reads are safe to resend once the request may have reached Airtable
+        if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return True
+        return method == "GET" and isinstance(exc, httpx.TransportError)
+    return check
+
+_backoff = wait_exponential_jitter(initial=1, max=AIRTABLE_RETRY_MAX_WAIT)
+
+def _wait(retry_state) -> float:
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, RetryableResponse):
+        hinted = _retry_after(exc.resp)
+        if hinted is not None:
+            return min(hinted, AIRTABLE_RETRY_MAX_WAIT)
+    return _backoff(retry_state)
+
+class AirtableClient:
+    def __init__(self, base_url: str = BASE_URL, headers: dict = HEADERS, transport: httpx.AsyncBaseTransport | None = None,
+                 scheduler: AirtableScheduler | None = None):
+        # one rate window per base: every request through this client shares it
+        self.scheduler = scheduler or AirtableScheduler(AIRTABLE_RATE_LIMIT, AIRTABLE_RATE_WINDOW)
+        # h2 comes with httpx[http2] from requirements.txt; an install without it falls back to HTTP/1.1 keep-alive
+        http2 = AIRTABLE_HTTP2 and importlib.util.find_spec("h2") is not None
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            http2=http2,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=AIRTABLE_MAX_CONNECTIONS,
+                max_keepalive_connections=AIRTABLE_MAX_KEEPALIVE,
+                keepalive_expiry=AIRTABLE_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(AIRTABLE_TIMEOUT, connect=AIRTABLE_CONNECT_TIMEOUT)
+        )
+
+    async def aclose(self) -> None:
+        await self.scheduler.stop()
+        await self._client.aclose()
+
+    def _count_retry(self, table: str, method: str):
+        def count(retry_state) -> None:
+            self.scheduler.retries += 1
+            AIRTABLE_RETRIES.inc(table, method)
+        return count
+
+    async def request(self, method: str, path: str, params: dict | None = None, json: dict | None = None,
+                      priority: Priority = Priority.INTERACTIVE) -> dict:
+        table = unquote(path.split("/")[1])
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await self._request(method, path, params, json, priority, table)
+            status = 200
+            return result
+        except HTTPException as e:
+            status = e.status_code
+            raise
+        finally:
+            # includes time queued for a rate-limit token and every retry
+            ended = time.perf_counter()
+            AIRTABLE_DURATION.observe(ended - started, table, method, status)
+            record_airtable(started, ended)
+
+    async def _request(self, method: str, path: str, params: dict | None, json: dict | None, priority: Priority,
+                       table: str) -> dict:
+        try:
+            async for attempt in AsyncRetrying(
+                retry=retry_if_exception(_is_retryable(method)),
+                wait=_wait,
+                stop=stop_after_attempt(AIRTABLE_MAX_RETRIES),
+                before_sleep=self._count_retry(table, method),
+                reraise=True
+            ):
+                with attempt:
+                    await self.scheduler.acquire(priority)
+                    try:
+                        resp = await self._client.request(method, path, params=params, json=json)
+                    finally:
+                        self.scheduler.release()
+                    if resp.status_code == 429:
+                        # without a Retry-After, sit out the whole lockout: retrying sooner only extends it
+                        self.scheduler.penalize(_retry_after(resp) or AIRTABLE_LOCKOUT)
+                        raise RetryableResponse(resp)
+                    if resp.status_code >= 500:
+                        raise RetryableResponse(resp)
+        except RetryableResponse as e:
+            resp = e.resp
+        except httpx.TransportError as e:
+            raise HTTPException(status_code=502, detail=f"Airtable unreachable: {e!r}")
+        if resp.status_code != 200:
+            headers = {"Retry-After": resp.headers["Retry-After"]} if "Retry-After" in resp.headers else None
+            raise HTTPException(status_code=resp.status_code, detail=resp.text, headers=headers)
+        return resp.json()
+
+    async def get(self, table: str, record_id: str, priority: Priority = Priority.INTERACTIVE) -> dict:
+        return await self.request("GET", f"/{table}/{record_id}", priority=priority)
+
+    async def list(self, table: str, formula: str | None = None, sort: Sort | None = None,
+                   fields: Fields | None = None, page_size: int | None = None, offset: str | None = None,
+                   priority: Priority = Priority.INTERACTIVE) -> dict:
+        params = {}
+        if formula:
+            params["filterByFormula"] = formula
+        for i, (field, direction) in enumerate(sort or []):
+            params[f"sort[{i}][field]"] = field
+            params[f"sort[{i}][direction]"] = direction
+        if fields:
+            params["fields[]"] = fields
+        if page_size:
+            params["pageSize"] = page_size
+        if offset:
+            params["offset"] = offset
+        return await self.request("GET", f"/{table}", params=params, priority=priority)
+
+    async def iter_pages(self, table: str, formula: str | None = None, sort: Sort | None = None,
+                         fields: Fields | None = None, page_size: int = 100,
+                         priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[Records]:
+        offset = None
+        while True:
+            page = await self.list(table, formula, sort, fields, page_size, offset, priority)
+            yield page.get("records", [])
+            offset = page.get("offset")
+            if not offset:
+                break
+
+    async def list_all(self, table: str, formula: str | None = None, sort: Sort | None = None,
+                       fields: Fields | None = None, priority: Priority = Priority.INTERACTIVE) -> Records:
+        records = []
+        async for page in self.iter_pages(table, formula, sort, fields, priority=priority):
+            records.extend(page)
+        return records
+
+    async def create(self, table: str, fields: dict, typecast: bool = False) -> dict:
+        # typecast lets Airtable add a single-select option the base doesn't have yet instead of answering 422
+        body = {"fields": fields, "typecast": True} if typecast else {"fields": fields}
+        return await self.request("POST", f"/{table}", json=body)
+
+    async def create_batch(self, table: str, rows: Records) -> Records:
+        resp = await self.request("POST", f"/{table}", json={"records": [{"fields": f} for f in rows]})
+        return resp["records"]
+
+    async def patch(self, table: str, record_id: str, fields: dict) -> dict:
+        return await self.request("PATCH", f"/{table}/{record_id}", json={"fields": fields})
+
+def get_airtable(request: Request) -> AirtableClient:
+    return request.app.state.airtable
@@ -0,0 +1,177 @@
+import asyncio
+import copy
+import json
+from functools import reduce
+from typing import AsyncIterator
+from fastapi import HTTPException
+from config import MIRROR_INDEXES, READ_BACKEND_DEFAULT, READ_BACKEND_FIXTURES, READ_BACKENDS
+from services.airtable import AirtableClient, Fields, Records, Sort, any_id, any_of, chunked
+from services.mirror import DynamoMirror, mirror
+from services.scheduler import Priority
+
+PAGE_SIZE = 100
+LOOKUP_CHUNK = 50
+
+def _not_found() -> HTTPException:
+    # same shape as Airtable's 404 body so callers and the frontend handle both alike
+    return HTTPException(404, json.dumps({"error": "NOT_FOUND"}))
+
+def _matches(record: dict, field: str, values: set) -> bool:
+    value = record.get("fields", {}).get(field)
+    if isinstance(value, list):
+        return any(v in values for v in value)
+    return value in values
+
+def _sorted(records: Records, sort: Sort | None) -> Records:
+    for field, direction in reversed(sort or []):
+        records.sort(key=lambda r: (field in r["fields"], r["fields"].get(field)), reverse=direction == "desc")
+    return records
+
+def _project(records: Records, fields: Fields | None) -> Records:
+    if not fields:
+        return records
+    return [{**r, "fields": {k: v for k, v in r["fields"].items() if k in fields}} for r in records]
+
+async def _pages(records: Records) -> AsyncIterator[Records]:
+    for i in range(0, len(records), PAGE_SIZE):
+        yield records[i:i + PAGE_SIZE]
+    if not records:
+        yield []
+
+class ReadBackend:
+    # read-only view of a table; writes always go to Airtable through AirtableClient
+    name = ""
+
+    async def get(self, table: str, record_id: str, priority: Priority = Priority.INTERACTIVE) -> dict:
+        raise NotImplementedError
+
+    async def get_many(self, table: str, ids: list[str], priority: Priority = Priority.INTERACTIVE) -> Records:
+        raise NotImplementedError
+
+    async def find(self, table: str, field: str, values: list, priority: Priority = Priority.INTERACTIVE) -> Records:
+        # records whose field equals, or for linked fields contains, any of the values
+        raise NotImplementedError
+
+    def iter_pages(self, table: str, sort: Sort | None = None, fields: Fields | None = None,
+                   priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[Records]:
+        raise NotImplementedError
+
+    async def list_all(self, table: str, sort: Sort | None = None, fields: Fields | None = None,
+                       priority: Priority = Priority.INTERACTIVE) -> Records:
+        records = []
+        async for page in self.iter_pages(table, sort, fields, priority):
+            records.extend(page)
+        return records
+
+class AirtableBackend(ReadBackend):
+    name = "airtable"
+
+    def __init__(self, client: AirtableClient):
+        self.client = client
+
+    async def get(self, table, record_id, priority=Priority.INTERACTIVE):
+        return await self.client.get(table, record_id, priority=priority)
+
+    async def _chunked(self, table, formulas, priority) -> Records:
+        results = await asyncio.gather(*(self.client.list_all(table, formula=f, priority=priority) for f in formulas))
+        return [r for records in results for r in records]
+
+    async def get_many(self, table, ids, priority=Priority.INTERACTIVE):
+        return await self._chunked(table, [any_id(b) for b in chunked(list(dict.fromkeys(ids)), LOOKUP_CHUNK)], priority)
+
+    async def find(self, table, field, values, priority=Priority.INTERACTIVE):
+        return await self._chunked(table, [any_of(field, b) for b in chunked(list(dict.fromkeys(values)), LOOKUP_CHUNK)], priority)
+
+    def iter_pages(self, table, sort=None, fields=None, priority=Priority.INTERACTIVE):
+        return self.client.iter_pages(table, sort=sort, fields=fields, priority=priority)
+
+class DynamoBackend(ReadBackend):
+    # the RPA-* tables kept by SyncAirtableData; key lookups use GetItem/BatchGetItem,
+    # equality lookups use a GSI when MIRROR_INDEXES names one, otherwise a filtered parallel scan
+    name = "dynamodb"
+
+    def __init__(self, mirror: DynamoMirror, indexes: dict[str, dict[str, str]]):
+        self.mirror = mirror
+        self.indexes = indexes
+
+    async def get(self, table, record_id, priority=Priority.INTERACTIVE):
+        record = await self.mirror.get_item(table, record_id)
+        if record is None:
+            raise _not_found()
+        return record
+
+    async def get_many(self, table, ids, priority=Priority.INTERACTIVE):
+        return await self.mirror.batch_get(table, ids)
+
+    async def find(self, table, field, values, priority=Priority.INTERACTIVE):
+        values = list(dict.fromkeys(values))
+        index = self.indexes.get(table, {}).get(field)
+        if index:
+            results = await asyncio.gather(*(self.mirror.query(table, index, field, v) for v in values))
+            return [r for records in results for r in records]
+        if not values:
+            return []
+        attr = self.mirror.conditions().Attr(field)
+        condition = reduce(lambda a, b: a | b, (attr.eq(v) | attr.contains(v) for v in values))
+        records, wanted = [], set(values)
+        async for page in self.mirror.scan(table, condition):
+            # contains() also matches substrings of string attributes
+            records.extend(r for r in page if _matches(r, field, wanted))
+        return records
+
+    async def iter_pages(self, table, sort=None, fields=None, priority=Priority.INTERACTIVE):
+        records = []
+        async for page in self.mirror.scan(table):
+            records.extend(page)
+        async for page in _pages(_project(_sorted(records, sort), fields)):
+            yield page
+
+class MemoryBackend(ReadBackend):
+    # in-process tables for tests and local development, optionally seeded from READ_BACKEND_FIXTURES
+    name = "memory"
+
+    def __init__(self, tables: dict[str, Records] | None = None, fixtures: str | None = None):
+        self._tables = tables
+        self.fixtures = fixtures
+
+    @property
+    def tables(self) -> dict[str, Records]:
+        if self._tables is None:
+            self._tables = {}
+            if self.fixtures:
+                with open(self.fixtures) as f:
+                    self._tables = json.load(f)
+        return self._tables
+
+    # callers get copies, like every other backend's freshly decoded records, so editing one can't change the table
+    async def get(self, table, record_id, priority=Priority.INTERACTIVE):
+        for record in self.tables.get(table, []):
+            if record["id"] == record_id:
+                return copy.deepcopy(record)
+        raise _not_found()
+
+    async def get_many(self, table, ids, priority=Priority.INTERACTIVE):
+        wanted = set(ids)
+        return copy.deepcopy([r for r in self.tables.get(table, []) if r["id"] in wanted])
+
+    async def find(self, table, field, values, priority=Priority.INTERACTIVE):
+        wanted = set(values)
+        return copy.deepcopy([r for r in self.tables.get(table, []) if _matches(r, field, wanted)])
+
+    async def iter_pages(self, table, sort=None, fields=None, priority=Priority.INTERACTIVE):
+        async for page in _pages(_project(_sorted(copy.deepcopy(self.tables.get(table, [])), sort), fields)):
+            yield page
+
+dynamo_backend = DynamoBackend(mirror, MIRROR_INDEXES)
+memory_backend = MemoryBackend(fixtures=READ_BACKEND_FIXTURES)
+
+def backend_name(table: str) -> str:
+    return READ_BACKENDS.get(table, READ_BACKEND_DEFAULT)
+
+def reader(client: AirtableClient, table: str) -> ReadBackend:
+    name = backend_name(table)
+    if name == "dynamodb":
+        return dynamo_backend
+    if name == "memory":
+        return memory_backend
+    return AirtableBackend(client)
@@ -0,0 +1,386 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable
+from config import CACHE_STALE_WINDOW
+from services.events import events
+from services.shared_cache import shared as shared_store
+
+ALL = "all"
+STATS_LIMIT = 1024
+
+_registry: dict[str, "Cache"] = {}
+
+def caches() -> dict[str, "Cache"]:
+    return _registry
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "fetched_at", "swept_at", "derived")
+
+    def __init__(self, value, fetched_at: float):
+        self.value = value
+        self.stored_at = time.monotonic()
+        # wall-clock start of the fetch that produced this value; the high-water mark for delta refreshes
+        self.fetched_at = fetched_at
+        self.swept_at = fetched_at
+        # serialized forms and query indexes of value, filled on demand by services.streaming
+        self.derived: dict = {}
+
+class _SharedStream:
+    # one upstream page stream fanned out to every request that missed while it was running
+    def __init__(self, source: AsyncIterator[list[dict]], on_done: Callable[[list[dict]], None]):
+        self.pages: list[list[dict]] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self._changed = asyncio.Condition()
+        self._on_done = on_done
+        self.task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for page in source:
+                async with self._changed:
+                    self.pages.append(page)
+                    self._changed.notify_all()
+            self._on_done([record for page in self.pages for record in page])
+        except BaseException as e:
+            self.error = e
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[list[dict]]:
+        i = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: i < len(self.pages) or self.done)
+                if i < len(self.pages):
+                    page = self.pages[i]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            i += 1
+            yield page
+
+def _merge(records: list[dict], changed: list[dict]) -> None:
+    # replace by id, prepend unseen records as newest
+    positions = {r["id"]: i for i, r in enumerate(records)}
+    new = []
+    for record in changed:
+        if record["id"] in positions:
+            records[positions[record["id"]]] = record
+        else:
+            new.append(record)
+    records[:0] = new
+
+async def apply_change(name: str, key: str | None, op: str, payload: dict | None) -> None:
+    # a change another worker published to the shared cache
+    cache = _registry.get(name)
+    if cache is not None:
+        await cache.apply(key, op, payload)
+
+class Cache:
+    def __init__(self, name: str, ttl: float, max_entries: int | None = None, stale_window: float = CACHE_STALE_WINDOW,
+                 on_records: Callable[[list[dict], bool], None] | None = None, table: str | None = None):
+        self.name = name
+        # list caches only: the Airtable table whose changes are pushed to /api/events
+        self.table = table
+        # list caches only: told about every full load (True) and every merged change (False)
+        self.on_records = on_records
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stale_window = stale_window
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._streams: dict[str, _SharedStream] = {}
+        self._generation: dict[str, int] = {}
+        # with SHARED_CACHE_PATH: the workers' common copy, and the shared version each local entry came from
+        self.shared = shared_store
+        self._seq: dict[str, int] = {}
+        # stale-while-revalidate refreshes nobody awaits, kept until they finish
+        self._background: set[asyncio.Task] = set()
+        self.last_refresh_error: str | None = None
+        self._stats: OrderedDict[str, dict] = OrderedDict()
+        self.totals = {"hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0, "refreshes": 0, "refresh_errors": 0, "adopted": 0}
+        _registry[name] = self
+
+    def _count(self, key: str, counter: str) -> None:
+        self.totals[counter] += 1
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = {c: 0 for c in self.totals}
+            if len(self._stats) > STATS_LIMIT:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(key)
+        stats[counter] += 1
+
+    def _age(self, entry: _Entry) -> float:
+        return time.monotonic() - entry.stored_at
+
+    def peek(self, key: str = ALL, allow_stale: bool = False):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        limit = self.ttl + (self.stale_window if allow_stale else 0)
+        return entry.value if self._age(entry) <= limit else None
+
+    def entry(self, key: str = ALL) -> _Entry | None:
+        return self._entries.get(key)
+
+    def set(self, key: str, value, fetched_at: float | None = None) -> None:
+        self._entries[key] = _Entry(value, fetched_at or time.time())
+        self._entries.move_to_end(key)
+        if self.on_records:
+            self.on_records(value["records"], True)
+        while self.max_entries and len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._count(evicted, "evictions")
+
+    def invalidate(self, key: str | None = None, share: bool = True) -> None:
+        if share and self.shared is not None:
+            self.shared.submit(self.shared.publish, self.name, key, "invalidate")
+        keys = set(self._entries) | set(self._inflight) | set(self._streams) if key is None else [key]
+        for k in keys:
+            self._entries.pop(k, None)
+            # results from fetches started before the invalidation must not be stored
+            self._generation[k] = self._generation.get(k, 0) + 1
+            self._inflight.pop(k, None)
+            self._streams.pop(k, None)
+            self._seq.pop(k, None)
+
+    def expire(self, key: str = ALL, share: bool = True) -> None:
+        # like invalidate, but readers keep the old value while the next read refetches it in the background
+        if share and self.shared is not None:
+            self.shared.submit(self.shared.publish, self.name, key, "expire", None, time.time() - self.ttl - 1)
+        entry = self._entries.get(key)
+        self.invalidate(key, share=False)
+        if entry is not None:
+            entry.stored_at = time.monotonic() - self.ttl - 1
+            self._entries[key] = entry
+
+    def merge_records(self, changed: list[dict], key: str = ALL, fetched_at: float | None = None, share: bool = True) -> None:
+        # write-through for list caches ({"records": [...]}): replace by id, prepend unseen records as newest
+        if share and self.shared is not None and (changed or fetched_at is not None):
+            self.shared.submit(self.shared.publish, self.name, key, "merge", {"records": changed, "fetched_at": fetched_at})
+        if self.on_records and changed:
+            self.on_records(changed, False)
+        if self.table and changed:
+            events.publish(self.table, changed)
+        if key in self._inflight or key in self._streams:
+            # a fetch started before this write may not include it
+            self.invalidate(key, share=False)
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        _merge(entry.value["records"], changed)
+        entry.derived.clear()
+        if fetched_at is not None:
+            entry.fetched_at = fetched_at
+            entry.stored_at = time.monotonic()
+
+    def upsert_record(self, record: dict, key: str = ALL) -> None:
+        self.merge_records([record], key)
+
+    async def apply(self, key: str | None, op: str, payload: dict | None) -> None:
+        if op == "set":
+            # keys this worker holds follow the new value; the rest adopt it when first read
+            if key in self._entries:
+                await self._adopt(key, self.ttl + self.stale_window)
+        elif op == "merge":
+            self.merge_records(payload["records"], key, payload["fetched_at"], share=False)
+        elif op == "invalidate":
+            self.invalidate(key, share=False)
+        elif op == "expire":
+            self.expire(key, share=False)
+
+    async def _adopt(self, key: str, max_age: float) -> _Entry | None:
+        # the shared copy of key, with the merges published since it was stored, unless it is older than max_age
+        generation = self._generation.get(key, 0)
+        loaded = await self.shared.call(self.shared.load, self.name, key)
+        if loaded is None or self._generation.get(key, 0) != generation:
+            return None
+        value, fetched_at, stored_at, seq, merges = loaded
+        age = max(0.0, time.time() - stored_at)
+        if age > max_age:
+            return None
+        swept_at = fetched_at
+        for merge in merges:
+            _merge(value["records"], merge["records"])
+            fetched_at = merge["fetched_at"] or fetched_at
+        self.set(key, value, fetched_at)
+        entry = self._entries[key]
+        entry.stored_at = time.monotonic() - age
+        entry.swept_at = swept_at
+        self._seq[key] = seq
+        self._count(key, "adopted")
+        return entry
+
+    async def _elect(self, key: str) -> _Entry | None:
+        # wait until this worker holds the key's lease (None), or adopt what another worker stored meanwhile
+        while True:
+            if await self.shared.call(self.shared.version, self.name, key, time.time() - self.ttl) > self._seq.get(key, 0):
+                entry = await self._adopt(key, self.ttl)
+                if entry is not None:
+                    return entry
+            if await self.shared.call(self.shared.acquire, f"{self.name}:{key}"):
+                return None
+            await asyncio.sleep(self.shared.poll)
+
+    async def _share(self, key: str, generation: int, value, fetched_at: float, since: int) -> None:
+        if self._generation.get(key, 0) == generation:
+            seq = await self.shared.call(self.shared.put, self.name, key, value, fetched_at, since)
+            if seq:
+                self._seq[key] = seq
+
+    def _lookup(self, key: str, refresh: bool) -> tuple[_Entry | None, bool]:
+        entry = self._entries.get(key)
+        if entry is not None and not refresh:
+            age = self._age(entry)
+            if age <= self.ttl:
+                self._entries.move_to_end(key)
+                self._count(key, "hits")
+                return entry, False
+            if age <= self.ttl + self.stale_window:
+                self._count(key, "stale_hits")
+                return entry, True
+        self._count(key, "misses")
+        return None, False
+
+    def _refreshed(self, key: str, task: asyncio.Task, error: Callable[[], BaseException | None]) -> None:
+        self._background.add(task)
+
+        def done(_):
+            self._background.discard(task)
+            exc = None if task.cancelled() else error()
+            if exc is not None:
+                self._count(key, "refresh_errors")
+                self.last_refresh_error = repr(exc)
+
+        task.add_done_callback(done)
+
+    def _store_if_current(self, key: str, generation: int, value, fetched_at: float) -> None:
+        if self._generation.get(key, 0) == generation:
+            self.set(key, value, fetched_at)
+
+    def _load(self, key: str, fetch: Callable[[], Awaitable]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            generation = self._generation.get(key, 0)
+            started = time.time()
+
+            async def run():
+                try:
+                    if self.shared is None:
+                        value = await fetch()
+                    else:
+                        value, fetched = await self._fetch_elected(key, generation, started, fetch)
+                        if not fetched:
+                            return value
+                    self._store_if_current(key, generation, value, started)
+                    return value
+                finally:
+                    if self._inflight.get(key) is task:
+                        del self._inflight[key]
+
+            task = asyncio.create_task(run())
+            self._inflight[key] = task
+        return task
+
+    async def _fetch_elected(self, key: str, generation: int, started: float, fetch: Callable[[], Awaitable]):
+        # (value, True) when this worker fetched it, (value, False) when another worker's was adopted
+        entry = await self._elect(key)
+        if entry is not None:
+            return entry.value, False
+        since = await self.shared.call(self.shared.head)
+        keeper = asyncio.create_task(self.shared.keep(f"{self.name}:{key}"))
+        try:
+            value = await fetch()
+            await self._share(key, generation, value, started, since)
+            return value, True
+        finally:
+            keeper.cancel()
+            self.shared.submit(self.shared.release, f"{self.name}:{key}")
+
+    async def _pages_elected(self, key: str, generation: int, started: float, source: Callable[[], AsyncIterator[list[dict]]],
+                             adopted: list) -> AsyncIterator[list[dict]]:
+        # the upstream pages while this worker holds the key's lease, otherwise the list another worker stored
+        entry = await self._elect(key)
+        if entry is not None:
+            adopted.append(entry)
+            yield entry.value["records"]
+            return
+        since = await self.shared.call(self.shared.head)
+        keeper = asyncio.create_task(self.shared.keep(f"{self.name}:{key}"))
+        try:
+            records = []
+            async for page in source():
+                records.extend(page)
+                yield page
+            await self._share(key, generation, {"records": records}, started, since)
+        finally:
+            keeper.cancel()
+            self.shared.submit(self.shared.release, f"{self.name}:{key}")
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable], refresh: bool = False):
+        entry, stale = self._lookup(key, refresh)
+        if entry is not None:
+            if stale and key not in self._inflight:
+                self._count(key, "refreshes")
+                task = self._load(key, fetch)
+                self._refreshed(key, task, task.exception)
+            return entry.value
+        return await asyncio.shield(self._load(key, fetch))
+
+    def _stream(self, key: str, source: Callable[[], AsyncIterator[list[dict]]]) -> _SharedStream:
+        shared = self._streams.get(key)
+        if shared is None or shared.done:
+            generation = self._generation.get(key, 0)
+            started = time.time()
+            adopted = []
+
+            def on_done(records):
+                if not adopted:
+                    self._store_if_current(key, generation, {"records": records}, started)
+                if self._streams.get(key) is shared:
+                    del self._streams[key]
+
+            pages = source() if self.shared is None else self._pages_elected(key, generation, started, source, adopted)
+            shared = _SharedStream(pages, on_done)
+            self._streams[key] = shared
+        return shared
+
+    def hit(self, key: str, source: Callable[[], AsyncIterator[list[dict]]], refresh: bool = False) -> _Entry | None:
+        # list caches: the usable entry, if any; a stale one also starts a background refetch
+        entry, stale = self._lookup(key, refresh)
+        if entry is not None and stale and key not in self._streams:
+            self._count(key, "refreshes")
+            stream = self._stream(key, source)
+            self._refreshed(key, stream.task, lambda: stream.error)
+        return entry
+
+    def subscribe(self, key: str, source: Callable[[], AsyncIterator[list[dict]]]) -> AsyncIterator[list[dict]]:
+        return self._stream(key, source).subscribe()
+
+    async def get_list(self, key: str, source: Callable[[], AsyncIterator[list[dict]]], refresh: bool = False) -> dict:
+        entry = self.hit(key, source, refresh)
+        if entry is not None:
+            return entry.value
+        records = []
+        async for page in self.subscribe(key, source):
+            records.extend(page)
+        return {"records": records}
+
+    def snapshot(self) -> dict:
+        return {
+            "ttl": self.ttl,
+            "max_entries": self.max_entries,
+            "size": len(self._entries),
+            "inflight": len(self._inflight) + len(self._streams),
+            "last_refresh_error": self.last_refresh_error,
+            **self.totals,
+            "keys": {k: dict(v) for k, v in self._stats.items()},
+        }
@@ -0,0 +1,65 @@
+import asyncio
+from typing import AsyncContextManager, Awaitable, Callable, Hashable
+
+Flush = Callable[[Hashable, list], Awaitable[list]]
+# key -> a lock shared with other workers, held around each flush of that key
+Lock = Callable[[Hashable], AsyncContextManager]
+
+class Coalescer:
+    # per-key mutation queue: submissions for one key within `window` seconds are handed to flush together,
+    # and flushes for the same key never overlap, so each read-modify-write sees the previous one's write.
+    # flush returns one result per item, in order; an Exception result fails only that item's caller.
+    # `lock` extends the no-overlap guarantee to flushes of the same key in other workers.
+    def __init__(self, flush: Flush, window: float, lock: Lock | None = None):
+        self.flush = flush
+        self.window = window
+        self.lock = lock
+        self._pending: dict[Hashable, list[tuple[object, asyncio.Future]]] = {}
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.totals = {"submitted": 0, "flushes": 0, "largest_batch": 0}
+
+    async def submit(self, key: Hashable, item):
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            task = asyncio.create_task(self._run(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        batch.append((item, future))
+        self.totals["submitted"] += 1
+        # shielded: a caller that goes away does not pull its item out of a write already under way
+        return await asyncio.shield(future)
+
+    async def _run(self, key: Hashable) -> None:
+        await asyncio.sleep(self.window)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # submissions keep joining this batch while an earlier flush of the same key holds the lock
+            batch = self._pending.pop(key)
+            self.totals["flushes"] += 1
+            self.totals["largest_batch"] = max(self.totals["largest_batch"], len(batch))
+            results = []
+            try:
+                if self.lock is None:
+                    results = await self.flush(key, [item for item, _ in batch])
+                else:
+                    async with self.lock(key):
+                        results = await self.flush(key, [item for item, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            finally:
+                for i, (_, future) in enumerate(batch):
+                    if future.done():
+                        continue
+                    result = results[i] if i < len(results) else RuntimeError("Coalesced write did not complete")
+                    if isinstance(result, BaseException):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        if key not in self._pending:
+            self._locks.pop(key, None)
+
+    def snapshot(self) -> dict:
+        return {"pending_keys": len(self._pending), "window": self.window, **self.totals}
@@ -0,0 +1,31 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from config import DELTA_OVERLAP, DELTA_FULL_SWEEP_INTERVAL
+from services.airtable import AirtableClient, Sort
+from services.cache import ALL, Cache
+from services.scheduler import Priority
+
+class DeltaSync:
+    def __init__(self, cache: Cache, table: str, sort: Sort):
+        self.cache = cache
+        self.table = table
+        self.sort = sort
+        self._lock = asyncio.Lock()
+
+    def _due_for_sweep(self, entry) -> bool:
+        return time.time() - entry.swept_at > DELTA_FULL_SWEEP_INTERVAL
+
+    async def refresh(self, client: AirtableClient) -> list[dict] | None:
+        # returns the changed records, or None when the caller has to do a full refetch
+        async with self._lock:
+            entry = self.cache.entry(ALL)
+            if entry is None or self._due_for_sweep(entry):
+                return None
+            started = time.time()
+            since = datetime.fromtimestamp(entry.fetched_at - DELTA_OVERLAP, timezone.utc).isoformat()
+            changed = await client.list_all(
+                self.table, formula=f"IS_AFTER(LAST_MODIFIED_TIME(),'{since}')", sort=self.sort, priority=Priority.REFRESH
+            )
+            self.cache.merge_records(changed, fetched_at=started)
+            return changed
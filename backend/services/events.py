@@ -0,0 +1,73 @@
+import asyncio
+import itertools
+import json
+from typing import AsyncIterator
+from config import EVENTS_HEARTBEAT, EVENTS_QUEUE_SIZE
+
+class _Client:
+    __slots__ = ("queue", "tables", "dropped")
+
+    def __init__(self, tables: set[str], size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.tables = tables
+        self.dropped = False
+
+class Broadcaster:
+    # in-process fan-out of record changes to every open /api/events stream; each client gets a
+    # bounded queue and a client that falls a full queue behind is dropped rather than slowing publishers
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE, heartbeat: float = EVENTS_HEARTBEAT):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._clients: set[_Client] = set()
+        self._ids = itertools.count(1)
+        self.totals = {"published": 0, "delivered": 0, "dropped_clients": 0}
+
+    def publish(self, table: str, records: list[dict], op: str = "upsert") -> None:
+        for record in records:
+            event_id = next(self._ids)
+            self.totals["published"] += 1
+            if not self._clients:
+                continue
+            # serialized once, shared by every client
+            data = json.dumps({"table": table, "op": op, "id": record["id"], "record": record})
+            for client in list(self._clients):
+                if client.tables and table not in client.tables:
+                    continue
+                try:
+                    client.queue.put_nowait((event_id, data))
+                    self.totals["delivered"] += 1
+                except asyncio.QueueFull:
+                    self._drop(client)
+
+    def _drop(self, client: _Client) -> None:
+        self._clients.discard(client)
+        client.dropped = True
+        self.totals["dropped_clients"] += 1
+        # the browser reconnects and refetches, so the backlog is worthless; make room for the end marker
+        while not client.queue.empty():
+            client.queue.get_nowait()
+        client.queue.put_nowait(None)
+
+    async def stream(self, tables: list[str] | None = None) -> AsyncIterator[str]:
+        client = _Client(set(tables or ()), self.queue_size)
+        self._clients.add(client)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(client.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if item is None:
+                    yield "event: dropped\ndata: {}\n\n"
+                    return
+                event_id, data = item
+                yield f"id: {event_id}\nevent: change\ndata: {data}\n\n"
+        finally:
+            self._clients.discard(client)
+
+    def snapshot(self) -> dict:
+        return {"clients": len(self._clients), "queue_size": self.queue_size, **self.totals}
+
+events = Broadcaster()
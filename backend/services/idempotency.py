@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from fastapi import HTTPException, Response
+from config import IDEMPOTENCY_MAX_KEYS, IDEMPOTENCY_TTL
+from services.shared_cache import SharedStore, shared
+
+# how often a request re-checks a key whose first call is still running in another worker
+WAIT_POLL = 0.1
+
+def fingerprint(payload) -> str:
+    return hashlib.blake2b(json.dumps(payload, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+class _Record:
+    __slots__ = ("fingerprint", "task", "stored_at")
+
+    def __init__(self, fingerprint: str, task: asyncio.Task):
+        self.fingerprint = fingerprint
+        self.task = task
+        self.stored_at = time.monotonic()
+
+class IdempotencyStore:
+    # Idempotency-Key -> the running or finished call that first used it. Only successes are kept:
+    # a failed call is forgotten so the client's retry runs it again. With a shared store the key is claimed
+    # there too, so a retry that lands on another worker waits for or replays the first call instead of
+    # running it a second time.
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS,
+                 shared: SharedStore | None = shared):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.shared = shared
+        self._records: OrderedDict[str, _Record] = OrderedDict()
+        self.totals = {"executed": 0, "replayed": 0, "conflicts": 0}
+
+    def _expire(self) -> None:
+        # oldest first: drop expired keys, then finished ones while over capacity; calls in flight are kept
+        now = time.monotonic()
+        for key in list(self._records):
+            record = self._records[key]
+            expired = now - record.stored_at > self.ttl
+            if not expired and len(self._records) <= self.max_keys:
+                break
+            if expired or record.task.done():
+                del self._records[key]
+
+    async def _once(self, key: str, digest: str, call: Callable[[], Awaitable]) -> tuple[object, bool]:
+        # returns (result, replayed from another worker)
+        if self.shared is None:
+            self.totals["executed"] += 1
+            return await call(), False
+        while (claim := await self.shared.call(self.shared.claim, key, digest, self.ttl)) is not None:
+            theirs, result, running = claim
+            if theirs != digest:
+                self.totals["conflicts"] += 1
+                raise HTTPException(422, "Idempotency-Key was already used for a different request")
+            if not running:
+                return result, True
+            await asyncio.sleep(WAIT_POLL)
+        self.totals["executed"] += 1
+        keeper = asyncio.create_task(self.shared.keep(f"idempotency:{key}"))
+        try:
+            result = await call()
+        except BaseException:
+            self.shared.submit(self.shared.forget, key)
+            raise
+        finally:
+            keeper.cancel()
+        self.shared.submit(self.shared.finish, key, result)
+        return result, False
+
+    async def run(self, key: str, payload, call: Callable[[], Awaitable]) -> tuple[object, bool]:
+        # returns (result, replayed)
+        self._expire()
+        digest = fingerprint(payload)
+        record = self._records.get(key)
+        if record is not None:
+            if record.fingerprint != digest:
+                self.totals["conflicts"] += 1
+                raise HTTPException(422, "Idempotency-Key was already used for a different request")
+            self.totals["replayed"] += 1
+            result, _ = await asyncio.shield(record.task)
+            return result, True
+
+        task = asyncio.ensure_future(self._once(key, digest, call))
+        self._records[key] = _Record(digest, task)
+
+        def forget_failure(t: asyncio.Task):
+            if (t.cancelled() or t.exception() is not None) and self._records.get(key) is not None \
+                    and self._records[key].task is t:
+                del self._records[key]
+
+        task.add_done_callback(forget_failure)
+        # shielded so a client that disconnects mid-call does not cancel the write its retry will replay
+        result, replayed = await asyncio.shield(task)
+        if replayed:
+            self.totals["replayed"] += 1
+        return result, replayed
+
+    def snapshot(self) -> dict:
+        return {"keys": len(self._records), "ttl": self.ttl, "max_keys": self.max_keys, **self.totals}
+
+idempotency = IdempotencyStore()
+
+async def idempotent(response: Response, scope: str, key: str | None, payload, call: Callable[[], Awaitable]):
+    # runs call once per (scope, Idempotency-Key); without a key it simply runs
+    if not key:
+        return await call()
+    result, replayed = await idempotency.run(f"{scope}:{key}", payload, call)
+    response.headers["Idempotency-Key"] = key
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
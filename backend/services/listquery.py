@@ -0,0 +1,166 @@
+import base64
+import binascii
+import json
+import secrets
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from fastapi import HTTPException, Query
+
+MAX_LIMIT = 1000
+# filtered orders kept per index, so switching between a few status tabs never re-sorts
+RESULTS_KEPT = 32
+
+def _sort_key(value) -> tuple:
+    # one total order over the mixed values Airtable returns; blanks first, then numbers, then text
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if value is None or value == "":
+        return (0, 0)
+    if isinstance(value, (bool, int, float)):
+        return (1, value)
+    return (2, str(value))
+
+def _terms(value) -> list[str]:
+    # equality index terms: every element of a linked/lookup list, compared as text
+    return [v if isinstance(v, str) else json.dumps(v) for v in (value if isinstance(value, list) else [value])]
+
+def _bad_cursor() -> HTTPException:
+    return HTTPException(422, "Invalid cursor")
+
+class ListQuery:
+    # filter/sort/page parameters shared by every cached list endpoint
+    def __init__(
+        self,
+        status: list[str] | None = Query(None, description="Only records with one of these statuses"),
+        priority: list[str] | None = Query(None, description="Only records with one of these priorities"),
+        where: list[str] | None = Query(None, description="Any other equality filter, as field:value"),
+        since: str | None = Query(None, description="Only records created at or after this ISO time"),
+        until: str | None = Query(None, description="Only records created before this ISO time"),
+        sort: str = Query("created_at"),
+        order: str = Query("desc", pattern="^(asc|desc)$"),
+        limit: int | None = Query(None, ge=1, le=MAX_LIMIT),
+        cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    ):
+        self.filters: dict[str, list[str]] = {}
+        for field, values in (("status", status), ("priority", priority)):
+            if values:
+                self.filters[field] = values
+        for term in where or []:
+            field, sep, value = term.partition(":")
+            if not sep or not field:
+                raise HTTPException(422, f"where must be field:value, got {term!r}")
+            self.filters.setdefault(field, []).append(value)
+        self.since = since
+        self.until = until
+        self.sort = sort
+        self.order = order
+        self.limit = limit
+        self.cursor = cursor
+        self.active = bool(self.filters or since or until or sort != "created_at" or order != "desc" or limit or cursor)
+
+    @property
+    def shape(self) -> tuple:
+        return tuple(sorted((f, tuple(sorted(v))) for f, v in self.filters.items())), self.since, self.until, self.sort
+
+    def canonical(self) -> str:
+        return json.dumps([self.shape, self.order, self.limit, self.cursor])
+
+    def encode_cursor(self, key: tuple) -> str:
+        raw = json.dumps([self.sort, self.order, *key[0], key[1]]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self) -> tuple | None:
+        if not self.cursor:
+            return None
+        try:
+            sort, order, rank, value, record_id = json.loads(base64.urlsafe_b64decode(self.cursor + "=" * (-len(self.cursor) % 4)))
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise _bad_cursor()
+        valid_key = (rank == 0 and value == 0) or (rank == 1 and isinstance(value, (int, float))) \
+            or (rank == 2 and isinstance(value, str))
+        if sort != self.sort or order != self.order or not valid_key or not isinstance(record_id, str):
+            raise _bad_cursor()
+        return (rank, value), record_id
+
+class ListIndex:
+    # secondary indexes over one cached record list, built lazily per field and dropped with the
+    # entry's derived data whenever merge_records changes the list
+    def __init__(self, records: list[dict]):
+        self.records = records
+        # random rather than a counter so ETags never repeat across restarts or workers
+        self.version = secrets.token_hex(8)
+        self._terms: dict[str, dict[str, list[int]]] = {}
+        self._orders: dict[str, tuple[list[tuple], list[int], list[int]]] = {}
+        self._results: OrderedDict[tuple, list[int]] = OrderedDict()
+
+    def _positions(self, field: str, values: list[str]) -> set[int]:
+        terms = self._terms.get(field)
+        if terms is None:
+            terms = self._terms[field] = {}
+            for i, record in enumerate(self.records):
+                for term in _terms(record["fields"].get(field)):
+                    terms.setdefault(term, []).append(i)
+        return {i for v in values for i in terms.get(v, ())}
+
+    def _order(self, field: str) -> tuple[list[tuple], list[int], list[int]]:
+        # (sort key, id) ascending, the record position at each rank, and the rank of each position
+        if field not in self._orders:
+            ranked = sorted((_sort_key(r["fields"].get(field)), r["id"], i) for i, r in enumerate(self.records))
+            keys = [(k, rid) for k, rid, _ in ranked]
+            positions = [i for *_, i in ranked]
+            ranks = [0] * len(positions)
+            for rank, i in enumerate(positions):
+                ranks[i] = rank
+            self._orders[field] = keys, positions, ranks
+        return self._orders[field]
+
+    def _created_between(self, since: str | None, until: str | None) -> set[int]:
+        keys, positions, _ = self._order("created_at")
+        lo = bisect_left(keys, ((2, since or ""),))
+        hi = bisect_left(keys, ((2, until),)) if until else len(keys)
+        return set(positions[lo:hi])
+
+    def _matching(self, query: ListQuery):
+        # ranks (into the sort field's order) of every matching record, ascending
+        shape = query.shape
+        ranks = self._results.get(shape)
+        if ranks is not None:
+            self._results.move_to_end(shape)
+            return ranks
+        _, positions, by_position = self._order(query.sort)
+        sets = [self._positions(f, v) for f, v in query.filters.items()]
+        if query.since or query.until:
+            sets.append(self._created_between(query.since, query.until))
+        if not sets:
+            return range(len(positions))
+        matched = set.intersection(*sorted(sets, key=len))
+        ranks = sorted(by_position[i] for i in matched)
+        self._results[shape] = ranks
+        if len(self._results) > RESULTS_KEPT:
+            self._results.popitem(last=False)
+        return ranks
+
+    def page(self, query: ListQuery) -> dict:
+        keys, positions, _ = self._order(query.sort)
+        ranks = self._matching(query)
+        after = query.decode_cursor()
+        if query.order == "asc":
+            start = bisect_left(ranks, bisect_right(keys, after)) if after else 0
+            chosen = ranks[start:start + query.limit] if query.limit else ranks[start:]
+            more = start + len(chosen) < len(ranks)
+        else:
+            end = bisect_left(ranks, bisect_left(keys, after)) if after else len(ranks)
+            start = max(0, end - query.limit) if query.limit else 0
+            chosen = ranks[start:end][::-1]
+            more = start > 0
+        return {
+            "records": [self.records[positions[r]] for r in chosen],
+            "total": len(ranks),
+            "next_cursor": query.encode_cursor(keys[chosen[-1]]) if more and chosen else None,
+        }
+
+def index_for(entry) -> ListIndex:
+    index = entry.derived.get("index")
+    if index is None:
+        index = entry.derived["index"] = ListIndex(entry.value["records"])
+    return index
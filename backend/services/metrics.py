@@ -0,0 +1,206 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+from services.cache import ALL, caches
+
+# seconds; wide enough for a cached hit (~1ms) and a long paged Airtable fetch
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+Sample = tuple[dict, float]
+Collected = Iterable[tuple[str, str, str, list[Sample]]]
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels: dict) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}" if labels else ""
+
+def _header(name: str, kind: str, help: str) -> list[str]:
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        return _header(self.name, "counter", self.help) + [
+            f"{self.name}{_labels(dict(zip(self.labels, k)))} {v}" for k, v in self.values.items()
+        ]
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def quantile(self, labels: tuple, q: float) -> float:
+        # linear interpolation inside the bucket holding the q-th observation, as histogram_quantile() does
+        counts, _, total = self.series[labels]
+        rank, seen = q * total, 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return 0.0
+
+    def render(self) -> list[str]:
+        lines = _header(self.name, "histogram", self.help)
+        for key, (counts, total, count) in self.series.items():
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Counter | Histogram] = []
+        # values read at scrape time: callables yielding (name, type, help, samples)
+        self.collectors: list[Callable[[], Collected]] = []
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], Collected]) -> None:
+        self.collectors.append(fn)
+
+    def render(self) -> str:
+        lines = [line for metric in self.metrics for line in metric.render()]
+        for fn in self.collectors:
+            for name, kind, help, samples in fn():
+                lines += _header(name, kind, help)
+                lines += [f"{name}{_labels(labels)} {value}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+HTTP_DURATION = registry.histogram(
+    "rpa_http_request_duration_seconds", "Time from request to last response byte, by route template",
+    ("method", "route", "status"),
+)
+AIRTABLE_DURATION = registry.histogram(
+    "rpa_airtable_request_duration_seconds", "Airtable calls including queueing and retries, by table and verb",
+    ("table", "method", "status"),
+)
+AIRTABLE_RETRIES = registry.counter("rpa_airtable_retries_total", "Airtable attempts that were retried", ("table", "method"))
+QUEUE_WAIT = registry.histogram(
+    "rpa_airtable_queue_wait_seconds", "Time an Airtable call waited for a rate-limit token", ("priority",),
+)
+
+def cache_metrics() -> Collected:
+    snapshots = {name: cache.snapshot() for name, cache in caches().items()}
+    records = {name: len(e.value["records"]) for name, cache in caches().items()
+               if (e := cache.entry(ALL)) is not None and isinstance(e.value, dict) and "records" in e.value}
+    yield "rpa_cache_lookups_total", "counter", "Cache lookups by result", [
+        ({"cache": name, "result": result}, snap[key])
+        for name, snap in snapshots.items() for result, key in (("hit", "hits"), ("stale_hit", "stale_hits"), ("miss", "misses"))
+    ]
+    yield "rpa_cache_evictions_total", "counter", "Entries evicted to stay under max_entries", [
+        ({"cache": name}, snap["evictions"]) for name, snap in snapshots.items()
+    ]
+    yield "rpa_cache_refresh_errors_total", "counter", "Background stale-while-revalidate refreshes that failed", [
+        ({"cache": name}, snap["refresh_errors"]) for name, snap in snapshots.items()
+    ]
+    yield "rpa_cache_entries", "gauge", "Entries held", [({"cache": name}, snap["size"]) for name, snap in snapshots.items()]
+    yield "rpa_cache_inflight", "gauge", "Upstream loads in progress", [({"cache": name}, snap["inflight"]) for name, snap in snapshots.items()]
+    yield "rpa_cache_records", "gauge", "Records in a list cache's full list", [({"cache": name}, n) for name, n in records.items()]
+
+def scheduler_metrics(scheduler) -> Collected:
+    snap = scheduler.snapshot()
+    yield "rpa_airtable_queue_depth", "gauge", "Airtable calls waiting for a rate-limit token", [
+        ({"priority": lane}, stats["queue_depth"]) for lane, stats in snap["lanes"].items()
+    ]
+    yield "rpa_airtable_throttled_total", "counter", "429 responses from Airtable", [({}, snap["throttled"])]
+
+def _hit_ratio(snap: dict) -> float | None:
+    lookups = snap["hits"] + snap["stale_hits"] + snap["misses"]
+    return round((snap["hits"] + snap["stale_hits"]) / lookups, 3) if lookups else None
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+def _summarize(histogram: Histogram, limit: int | None = None) -> list[dict]:
+    rows = []
+    for key, (_, total, count) in histogram.series.items():
+        rows.append({
+            **dict(zip(histogram.labels, key)),
+            "count": count,
+            "avg_ms": _ms(total / count),
+            "p50_ms": _ms(histogram.quantile(key, 0.5)),
+            "p95_ms": _ms(histogram.quantile(key, 0.95)),
+            "p99_ms": _ms(histogram.quantile(key, 0.99)),
+        })
+    rows.sort(key=lambda r: r["p99_ms"], reverse=True)
+    return rows[:limit] if limit else rows
+
+def summary(scheduler, limit: int = 20) -> dict:
+    # the slowest series first, so p99 offenders are at the top
+    snap = scheduler.snapshot()
+    return {
+        "routes": _summarize(HTTP_DURATION, limit),
+        "airtable": _summarize(AIRTABLE_DURATION, limit),
+        "airtable_retries": [{"table": t, "method": m, "retries": int(n)} for (t, m), n in AIRTABLE_RETRIES.values.items()],
+        "queue_wait": _summarize(QUEUE_WAIT),
+        "queue_depth": {lane: stats["queue_depth"] for lane, stats in snap["lanes"].items()},
+        "throttled": snap["throttled"],
+        "caches": {
+            name: {"hit_ratio": _hit_ratio(c), "entries": c["size"], "inflight": c["inflight"]}
+            for name, c in ((name, cache.snapshot()) for name, cache in caches().items())
+        },
+    }
+
+class MetricsMiddleware:
+    # plain ASGI rather than BaseHTTPMiddleware so streamed bodies are timed to their last chunk
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        response = {"status": 500, "stream": False}
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["stream"] = any(k == b"content-type" and v.startswith(b"text/event-stream")
+                                         for k, v in message.get("headers", []))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            # event streams stay open for as long as the tab does; their duration says nothing about latency
+            if not response["stream"]:
+                route = scope.get("route")
+                HTTP_DURATION.observe(time.perf_counter() - started, scope["method"],
+                                      route.path if route is not None else "unmatched", response["status"])
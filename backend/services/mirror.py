@@ -0,0 +1,169 @@
+import asyncio
+import importlib.util
+from decimal import Decimal
+from typing import AsyncIterator
+from fastapi import HTTPException
+from config import AWS_REGION, MIRROR_ENDPOINT_URL, MIRROR_SCAN_SEGMENTS, MIRROR_TABLE_PREFIX
+from services.airtable import chunked
+
+# Airtable tables copied by the SyncAirtableData lambda -> DynamoDB table name (without the prefix)
+MIRROR_TABLES = {
+    "Orders": "Orders",
+    "Stocks": "Stocks",
+    "Order_Items": "Order_Items",
+    "Picklists": "Picklists",
+    "AuditLogs": "AuditLogs",
+    "Stock_Transfers": "Stock_Transfers",
+    "Exceptions": "Exceptions",
+    "Notifications": "Notifications",
+    "Backorders": "Backorders",
+}
+
+BATCH_GET_SIZE = 100
+
+def partition_key(table: str) -> str:
+    # same naming as the CDK stack and the sync lambda: Order_Items -> orderItemsId
+    parts = table.split("_")
+    return parts[0][0].lower() + parts[0][1:] + "".join(p.capitalize() for p in parts[1:]) + "Id"
+
+def _to_dynamo(value):
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamo(v) for v in value]
+    return value
+
+def from_dynamo(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: from_dynamo(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [from_dynamo(v) for v in value]
+    return value
+
+def to_record(table: str, item: dict) -> dict:
+    pk = partition_key(table)
+    fields = {k: from_dynamo(v) for k, v in item.items() if k != pk}
+    return {"id": item[pk], "fields": fields}
+
+def to_item(table: str, record: dict) -> dict:
+    return _to_dynamo({partition_key(table): record["id"], **record.get("fields", {})})
+
+class DynamoMirror:
+    def __init__(self, prefix: str = MIRROR_TABLE_PREFIX, region: str = AWS_REGION, segments: int = MIRROR_SCAN_SEGMENTS,
+                 endpoint_url: str | None = MIRROR_ENDPOINT_URL):
+        self.prefix = prefix
+        self.region = region
+        # set for DynamoDB Local
+        self.endpoint_url = endpoint_url
+        self.segments = segments
+        self._resource = None
+
+    @property
+    def available(self) -> bool:
+        return importlib.util.find_spec("boto3") is not None
+
+    @property
+    def resource(self):
+        if self._resource is None:
+            if not self.available:
+                raise HTTPException(503, "DynamoDB mirror needs boto3 installed")
+            self._resource = importlib.import_module("boto3").resource(
+                "dynamodb", region_name=self.region, endpoint_url=self.endpoint_url
+            )
+        return self._resource
+
+    def _table(self, table: str):
+        if table not in MIRROR_TABLES:
+            raise HTTPException(404, f"{table} is not mirrored to DynamoDB")
+        return self.resource.Table(f"{self.prefix}{MIRROR_TABLES[table]}")
+
+    def conditions(self):
+        return importlib.import_module("boto3.dynamodb.conditions")
+
+    async def get_item(self, table: str, record_id: str) -> dict | None:
+        resp = await asyncio.to_thread(self._table(table).get_item, Key={partition_key(table): record_id})
+        item = resp.get("Item")
+        return to_record(table, item) if item else None
+
+    async def query(self, table: str, index: str, field: str, value) -> list[dict]:
+        ddb = self._table(table)
+        kwargs = {"IndexName": index, "KeyConditionExpression": self.conditions().Key(field).eq(value)}
+        items = []
+        while True:
+            resp = await asyncio.to_thread(ddb.query, **kwargs)
+            items.extend(resp.get("Items", []))
+            if "LastEvaluatedKey" not in resp:
+                return [to_record(table, item) for item in items]
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    async def scan(self, table: str, filter_expression=None) -> AsyncIterator[list[dict]]:
+        # parallel segmented scan; pages from all segments are yielded as they arrive
+        ddb = self._table(table)
+        pages: asyncio.Queue = asyncio.Queue(maxsize=self.segments * 2)
+
+        async def segment(n: int):
+            kwargs = {"Segment": n, "TotalSegments": self.segments}
+            if filter_expression is not None:
+                kwargs["FilterExpression"] = filter_expression
+            try:
+                while True:
+                    resp = await asyncio.to_thread(ddb.scan, **kwargs)
+                    await pages.put([to_record(table, item) for item in resp.get("Items", [])])
+                    if "LastEvaluatedKey" not in resp:
+                        break
+                    kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+            except Exception as e:
+                await pages.put(e)
+                return
+            await pages.put(None)
+
+        tasks = [asyncio.create_task(segment(n)) for n in range(self.segments)]
+        try:
+            remaining = self.segments
+            while remaining:
+                page = await pages.get()
+                if page is None:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield page
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def batch_get(self, table: str, ids: list[str]) -> list[dict]:
+        name = self._table(table).name
+        pk = partition_key(table)
+
+        def fetch(batch: list[str]) -> list[dict]:
+            items, request = [], {name: {"Keys": [{pk: i} for i in batch]}}
+            while request:
+                resp = self.resource.batch_get_item(RequestItems=request)
+                items.extend(resp.get("Responses", {}).get(name, []))
+                request = resp.get("UnprocessedKeys") or None
+            return items
+
+        results = await asyncio.gather(*(
+            asyncio.to_thread(fetch, batch) for batch in chunked(list(dict.fromkeys(ids)), BATCH_GET_SIZE)
+        ))
+        return [to_record(table, item) for items in results for item in items]
+
+    async def write(self, table: str, records: list[dict], delete_ids: list[str] = ()) -> None:
+        ddb = self._table(table)
+        pk = partition_key(table)
+
+        def run():
+            with ddb.batch_writer(overwrite_by_pkeys=[pk]) as batch:
+                for record in records:
+                    batch.put_item(Item=to_item(table, record))
+                for record_id in delete_ids:
+                    batch.delete_item(Key={pk: record_id})
+
+        await asyncio.to_thread(run)
+
+mirror = DynamoMirror()
@@ -0,0 +1,222 @@
+import asyncio
+import itertools
+import sys
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+from fastapi import Header, HTTPException, Query
+from config import PROFILE_BUFFER, PROFILE_INTERVAL, PROFILING_ENABLED, PROFILING_TOKEN
+
+_current: ContextVar["Profile | None"] = ContextVar("profile", default=None)
+_ids = itertools.count(1)
+# the running task per event loop, readable from the sampler thread
+_current_tasks = getattr(asyncio.tasks, "_current_tasks", {})
+
+def _module(frame) -> str:
+    return frame.f_globals.get("__name__", "?")
+
+def _stack(frame) -> tuple[str, ...]:
+    # root-to-leaf frame names for the running task, starting above the event loop's Handle._run
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    start = 0
+    for i, f in enumerate(frames):
+        if _module(f) == "asyncio.events" and f.f_code.co_name == "_run":
+            start = i + 1
+    while start < len(frames) and _module(frames[start]) == "asyncio.tasks":
+        start += 1
+    return tuple(f"{_module(f)}.{f.f_code.co_qualname}" for f in frames[start:])
+
+class Profile:
+    def __init__(self, method: str, path: str):
+        self.id = str(next(_ids))
+        self.method = method
+        self.path = path
+        self.route = path
+        self.status: int | None = None
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.ended: float | None = None
+        # the request's own task and every task created while it was current
+        self.tasks: weakref.WeakSet = weakref.WeakSet()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.cpu = 0.0
+        self.json = 0.0
+        self.airtable: list[tuple[float, float]] = []
+
+    def add_sample(self, stack: tuple[str, ...], seconds: float, in_json: bool) -> None:
+        self.stacks[stack] += 1
+        self.samples += 1
+        self.cpu += seconds
+        if in_json:
+            self.json += seconds
+
+    def airtable_seconds(self) -> float:
+        # concurrent calls overlap, so this is the union of their intervals rather than the sum
+        total, end = 0.0, None
+        for start, stop in sorted(self.airtable):
+            if end is None or start > end:
+                total += stop - start
+                end = stop
+            elif stop > end:
+                total += stop - end
+                end = stop
+        return total
+
+    def summary(self) -> dict:
+        wall = (self.ended or time.perf_counter()) - self.started
+        airtable = self.airtable_seconds()
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "started_at": self.started_at,
+            "samples": self.samples,
+            "wall_ms": round(wall * 1000, 1),
+            "airtable_wait_ms": round(airtable * 1000, 1),
+            "json_ms": round(self.json * 1000, 1),
+            "python_cpu_ms": round((self.cpu - self.json) * 1000, 1),
+            # event loop busy with other requests, or awaits that are not Airtable calls
+            "other_ms": round(max(0.0, wall - airtable - self.cpu) * 1000, 1),
+            "airtable_calls": len(self.airtable),
+        }
+
+    def collapsed(self, interval: float) -> str:
+        # Brendan Gregg's collapsed format; waits are added as synthetic frames weighted in sample intervals
+        root = f"{self.method}:{self.route}".replace(" ", "_")
+        lines = [f"{root};{';'.join(stack)} {n}" for stack, n in self.stacks.most_common()]
+        summary = self.summary()
+        for name, ms in (("[awaiting airtable]", summary["airtable_wait_ms"]), ("[other]", summary["other_ms"])):
+            weight = round(ms / 1000 / interval)
+            if weight:
+                lines.append(f"{root};{name} {weight}")
+        return "\n".join(lines) + "\n"
+
+class Sampler:
+    # one daemon thread samples the event loop thread's stack while any profile is active; a sample counts
+    # towards a profile only when the task running at that moment belongs to its request
+    def __init__(self, interval: float = PROFILE_INTERVAL, keep: int = PROFILE_BUFFER):
+        self.interval = interval
+        self.active: set[Profile] = set()
+        self.recent: deque[Profile] = deque(maxlen=keep)
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+
+    def _install(self, loop: asyncio.AbstractEventLoop) -> None:
+        previous = loop.get_task_factory()
+
+        def factory(loop, coro, **kwargs):
+            task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+            profile = _current.get()
+            if profile is not None and profile.ended is None:
+                profile.tasks.add(task)
+            return task
+
+        loop.set_task_factory(factory)
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+
+    def start(self, profile: Profile) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._install(loop)
+        profile.tasks.add(asyncio.current_task())
+        self.active.add(profile)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def stop(self, profile: Profile) -> None:
+        profile.ended = time.perf_counter()
+        self.active.discard(profile)
+        self.recent.append(profile)
+
+    def get(self, profile_id: str) -> Profile:
+        for profile in self.recent:
+            if profile.id == profile_id:
+                return profile
+        raise HTTPException(404, "Profile not found")
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while True:
+            if not self.active:
+                self._wake.clear()
+                if not self.active:
+                    self._wake.wait()
+                last = time.perf_counter()
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            task = _current_tasks.get(self._loop)
+            owners = [p for p in list(self.active) if task is not None and task in p.tasks]
+            if not owners:
+                continue
+            stack = _stack(sys._current_frames().get(self._loop_thread))
+            in_json = any(name.startswith("json.") for name in stack)
+            for profile in owners:
+                profile.add_sample(stack, elapsed, in_json)
+
+sampler = Sampler()
+
+def record_airtable(started: float, ended: float) -> None:
+    # called by AirtableClient for every call; a no-op unless the calling request is being profiled
+    profile = _current.get()
+    if profile is not None:
+        profile.airtable.append((started, ended))
+
+def _allowed(value: str | None) -> bool:
+    if not PROFILING_ENABLED or not value:
+        return False
+    return value == PROFILING_TOKEN if PROFILING_TOKEN else value.lower() in ("1", "true")
+
+def _requested(scope) -> bool:
+    header = next((v.decode() for k, v in scope["headers"] if k == b"x-profile"), None)
+    query = parse_qs(scope.get("query_string", b"").decode()).get("profile", [None])[0]
+    return _allowed(header or query)
+
+def debug_access(token: str | None = Query(None), x_profile: str | None = Header(None)) -> None:
+    # the debug endpoints only exist when profiling is enabled, and then need the same token as a profiled request
+    if not PROFILING_ENABLED:
+        raise HTTPException(404, "Not Found")
+    if PROFILING_TOKEN and PROFILING_TOKEN not in (token, x_profile):
+        raise HTTPException(403, "Profiling token required")
+
+class ProfilingMiddleware:
+    # X-Profile: 1 (or ?profile=1) runs the request under the sampler; with PROFILING_TOKEN set the value must be the token
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            return await self.app(scope, receive, send)
+        profile = Profile(scope["method"], scope["path"])
+        reset = _current.set(profile)
+        sampler.start(profile)
+
+        async def tagged_send(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, tagged_send)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                profile.route = route.path
+            sampler.stop(profile)
+            _current.reset(reset)
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import AsyncIterator
+from services.airtable import AirtableClient, any_id, chunked
+from services.backends import backend_name
+from services.cache import ALL, caches
+from services.mirror import DynamoMirror, from_dynamo
+from services.scheduler import Priority
+
+LEAVES = 256
+DETAIL_LIMIT = 100
+FETCH_CHUNK = 50
+
+# Airtable tables whose full list is already held by a router cache; it only stands in for Airtable while
+# the table is read from Airtable, since a cache filled from the mirror would compare the mirror with itself
+CACHED_TABLES = {
+    "Orders": "orders",
+    "Stocks": "stocks",
+    "Picklists": "picklists",
+    "Stock_Transfers": "transfers",
+    "Exceptions": "exceptions",
+    "AuditLogs": "audit_logs",
+    "Backorders": "backorders",
+    "Notifications": "notifications",
+}
+
+def _h(data: str) -> str:
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+def digest(fields: dict) -> str:
+    # both sides are normalised the same way so a DynamoDB Decimal and an Airtable number hash alike
+    return _h(json.dumps(from_dynamo(fields), sort_keys=True, separators=(",", ":"), default=str))
+
+def leaf_of(record_id: str) -> int:
+    return int(_h(record_id)[:8], 16) % LEAVES
+
+class MerkleTree:
+    # leaves are fixed key ranges (record id hash buckets); each level above hashes pairs of children
+    def __init__(self):
+        self.leaves: list[dict[str, str]] = [{} for _ in range(LEAVES)]
+        self.count = 0
+
+    def add(self, record: dict) -> None:
+        self.leaves[leaf_of(record["id"])][record["id"]] = digest(record.get("fields", {}))
+        self.count += 1
+
+    def levels(self) -> list[list[str]]:
+        level = [_h("".join(f"{k}:{v}" for k, v in sorted(leaf.items()))) for leaf in self.leaves]
+        levels = [level]
+        while len(level) > 1:
+            level = [_h(level[i] + level[i + 1]) for i in range(0, len(level), 2)]
+            levels.append(level)
+        return levels[::-1]
+
+    @property
+    def root(self) -> str:
+        return self.levels()[0][0]
+
+def differing_leaves(a: MerkleTree, b: MerkleTree) -> list[int]:
+    # walk down from the root, only descending into subtrees whose hashes differ
+    la, lb = a.levels(), b.levels()
+    nodes = [0] if la[0][0] != lb[0][0] else []
+    for depth in range(1, len(la)):
+        nodes = [c for n in nodes for c in (2 * n, 2 * n + 1) if la[depth][c] != lb[depth][c]]
+    return nodes
+
+async def _airtable_pages(client: AirtableClient, table: str, max_age: float) -> AsyncIterator[list[dict]]:
+    cache = caches().get(CACHED_TABLES.get(table, "")) if backend_name(table) == "airtable" else None
+    entry = cache.entry(ALL) if cache else None
+    if entry is not None and time.time() - entry.fetched_at <= max_age:
+        yield entry.value["records"]
+        return
+    async for page in client.iter_pages(table, priority=Priority.REPORT):
+        yield page
+
+async def _fill(tree: MerkleTree, pages: AsyncIterator[list[dict]]) -> None:
+    async for page in pages:
+        for record in page:
+            tree.add(record)
+
+def _changed_fields(a: dict, b: dict) -> list[str]:
+    a, b = from_dynamo(a), from_dynamo(b)
+    return sorted(k for k in a.keys() | b.keys() if a.get(k) != b.get(k))
+
+async def _airtable_records(client: AirtableClient, table: str, ids: list[str]) -> list[dict]:
+    results = await asyncio.gather(*(
+        client.list_all(table, formula=any_id(batch), priority=Priority.REPORT) for batch in chunked(ids, FETCH_CHUNK)
+    ))
+    return [r for records in results for r in records]
+
+async def reconcile_table(client: AirtableClient, mirror: DynamoMirror, table: str, max_age: float,
+                          resync: bool = False) -> dict:
+    started = time.monotonic()
+    source, replica = MerkleTree(), MerkleTree()
+    await asyncio.gather(_fill(source, _airtable_pages(client, table, max_age)), _fill(replica, mirror.scan(table)))
+
+    missing, extra, mismatched = [], [], []
+    ranges = differing_leaves(source, replica)
+    for leaf in ranges:
+        src, dst = source.leaves[leaf], replica.leaves[leaf]
+        missing += [i for i in src if i not in dst]
+        extra += [i for i in dst if i not in src]
+        mismatched += [i for i in src if i in dst and src[i] != dst[i]]
+
+    # only the records in differing ranges are fetched in full, to name the fields that drifted
+    detail_ids = mismatched[:DETAIL_LIMIT]
+    fresh, stale = await asyncio.gather(
+        _airtable_records(client, table, missing + mismatched if resync else detail_ids),
+        mirror.batch_get(table, detail_ids),
+    )
+    fresh_by_id, stale_by_id = {r["id"]: r for r in fresh}, {r["id"]: r for r in stale}
+    details = [
+        {"id": i, "fields": _changed_fields(fresh_by_id[i]["fields"], stale_by_id[i]["fields"])}
+        for i in detail_ids if i in fresh_by_id and i in stale_by_id
+    ]
+
+    resynced = None
+    if resync and (fresh or extra):
+        await mirror.write(table, fresh, extra)
+        resynced = {"written": len(fresh), "deleted": len(extra)}
+
+    return {
+        "table": table,
+        "in_sync": not ranges,
+        "airtable_records": source.count,
+        "mirror_records": replica.count,
+        "ranges_compared": len(ranges),
+        "ranges_total": LEAVES,
+        "missing_count": len(missing),
+        "extra_count": len(extra),
+        "mismatched_count": len(mismatched),
+        "missing": missing[:DETAIL_LIMIT],
+        "extra": extra[:DETAIL_LIMIT],
+        "mismatched": details,
+        "resynced": resynced,
+        "elapsed_ms": round((time.monotonic() - started) * 1000),
+    }
@@ -0,0 +1,149 @@
+import asyncio
+import random
+import sqlite3
+import time
+from typing import Awaitable, Callable
+from config import (
+    REFRESH_ENABLED, REFRESH_INTERVAL_DEFAULT, REFRESH_INTERVALS, REFRESH_JITTER, REFRESH_RETRY, WARMUP_ENABLED, WARMUP_TIMEOUT
+)
+from services.cache import Cache
+from services.shared_cache import shared
+
+Refresh = Callable[[object], Awaitable]
+
+# scheduled refreshes land this far ahead of a cache's TTL at the latest
+AHEAD_OF_EXPIRY = 0.9
+
+class _Job:
+    def __init__(self, name: str, cache: Cache, refresh: Refresh, interval: float):
+        self.name = name
+        self.cache = cache
+        self.refresh = refresh
+        self.interval = interval
+        self.runs = 0
+        self.failures = 0
+        self.last_run: float | None = None
+        self.last_seconds: float | None = None
+        self.last_error: str | None = None
+        # with a shared cache: whether this worker won the job's last election
+        self.leader: bool | None = None
+
+def delta_refresh(delta, full: Refresh) -> Refresh:
+    # a LAST_MODIFIED_TIME delta merged into the warm entry; the full refetch only when DeltaSync asks for one
+    async def refresh(client):
+        if await delta.refresh(client) is None:
+            await full(client)
+    return refresh
+
+class Refresher:
+    # routers register one job per cache; the lifespan warms them all concurrently, then each refreshes
+    # on its own jittered interval. Upstream calls go through the client's scheduler at REFRESH priority,
+    # so interactive requests keep first claim on the rate budget.
+    def __init__(self, intervals: dict[str, float] = REFRESH_INTERVALS, default: float = REFRESH_INTERVAL_DEFAULT,
+                 jitter: float = REFRESH_JITTER, retry: float = REFRESH_RETRY):
+        self.intervals = intervals
+        self.default = default
+        self.jitter = jitter
+        self.retry = retry
+        self.jobs: dict[str, _Job] = {}
+        self.ready = False
+        self.warmup_seconds: float | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def register(self, name: str, cache: Cache, refresh: Refresh) -> None:
+        interval = min(self.intervals.get(name, self.default), cache.ttl * AHEAD_OF_EXPIRY)
+        self.jobs[name] = _Job(name, cache, refresh, interval)
+
+    async def _run(self, job: _Job, client) -> None:
+        started = time.monotonic()
+        try:
+            await job.refresh(client)
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = repr(e)
+        finally:
+            job.runs += 1
+            job.last_run = time.time()
+            job.last_seconds = round(time.monotonic() - started, 3)
+
+    def _delay(self, job: _Job) -> float:
+        # jitter spreads jobs with the same interval so they never hit the rate budget together
+        base = job.interval if job.last_error is None else min(job.interval, self.retry)
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def _elect(self, job: _Job) -> bool:
+        # one worker runs each job and keeps it while it stays alive; the others get its results through
+        # the shared cache. A store too busy to answer skips this round rather than ending the loop.
+        try:
+            job.leader = await shared.call(shared.acquire, f"refresh:{job.name}", job.interval * 2)
+        except sqlite3.Error as e:
+            job.leader = False
+            job.last_error = repr(e)
+        return job.leader
+
+    async def _loop(self, job: _Job, client) -> None:
+        while True:
+            await asyncio.sleep(self._delay(job))
+            if shared is not None and not await self._elect(job):
+                continue
+            await self._run(job, client)
+            if shared is not None:
+                # a run can outlast the lease; held from its end, it covers the wait for the next one
+                await self._elect(job)
+
+    async def warm_up(self, client, timeout: float = WARMUP_TIMEOUT) -> bool:
+        # True once every cache is loaded; on timeout the rest finish in the background
+        started = time.monotonic()
+        tasks = [asyncio.create_task(self._run(job, client)) for job in self.jobs.values()]
+        self._tasks += tasks
+
+        def finished(_=None):
+            if all(t.done() for t in tasks):
+                self.ready = True
+                self.warmup_seconds = round(time.monotonic() - started, 3)
+
+        for task in tasks:
+            task.add_done_callback(finished)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        else:
+            finished()
+        return self.ready
+
+    def start(self, client) -> None:
+        self._tasks += [asyncio.create_task(self._loop(job, client)) for job in self.jobs.values()]
+
+    async def startup(self, client) -> None:
+        if WARMUP_ENABLED:
+            await self.warm_up(client)
+        else:
+            self.ready = True
+        if REFRESH_ENABLED:
+            self.start(client)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready,
+            "warmup_seconds": self.warmup_seconds,
+            "jobs": {
+                name: {
+                    "interval": job.interval,
+                    "runs": job.runs,
+                    "failures": job.failures,
+                    "last_run": job.last_run,
+                    "last_seconds": job.last_seconds,
+                    "last_error": job.last_error,
+                    "leader": job.leader,
+                }
+                for name, job in self.jobs.items()
+            },
+        }
+
+refresher = Refresher()
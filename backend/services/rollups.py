@@ -0,0 +1,167 @@
+import asyncio
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Awaitable, Callable
+from config import ROLLUP_CHECK_INTERVAL, ROLLUP_DB
+from services.aggregation import ByDay, Count, CountBy, Sum, aggregate
+from services.airtable import AirtableClient
+from services.scheduler import Priority
+
+# table -> accumulators for one day's bucket; every table is bucketed on created_at
+METRICS = {
+    "Orders": lambda: [Count("total_orders"), CountBy("by_status", "status"), CountBy("by_priority", "priority")],
+    "Picklists": lambda: [Count("picklists_generated")],
+    "Good_Receipts": lambda: [Count("goods_receipts"), Sum("total_stock_received", "quantity")],
+    "Exceptions": lambda: [Count("exceptions_raised")],
+    "Backorders": lambda: [Count("backorders_created")],
+}
+
+def empty_bucket() -> dict:
+    return {a.name: a.result() for factory in METRICS.values() for a in factory()}
+
+def merge(buckets) -> dict:
+    # counters add up, nested counters merge key by key
+    out = {}
+    for bucket in buckets:
+        for k, v in bucket.items():
+            if isinstance(v, dict):
+                out[k] = merge([out.get(k, {}), v])
+            else:
+                out[k] = out.get(k, 0) + v
+    return out
+
+def days_between(start: date, end: date) -> list[str]:
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+class RollupStore:
+    # the methods below touch the file; async code awaits them through call() so they run on the store's
+    # own thread, never on the event loop
+    def __init__(self, path: str):
+        self.path = path
+        self._db: sqlite3.Connection | None = None
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rollups")
+
+    def call(self, fn: Callable, *args) -> Awaitable:
+        return asyncio.wrap_future(self._thread.submit(fn, *args))
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS daily_rollups (day TEXT PRIMARY KEY, data TEXT NOT NULL, computed_at REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS rollup_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            )
+        return self._db
+
+    def get(self, days: list[str]) -> dict[str, dict]:
+        rows = self.db.execute(
+            f"SELECT day, data FROM daily_rollups WHERE day IN ({','.join('?' * len(days))})", days
+        ).fetchall()
+        return {day: json.loads(data) for day, data in rows}
+
+    def put(self, buckets: dict[str, dict]) -> None:
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO daily_rollups (day, data, computed_at) VALUES (?, ?, ?)",
+                [(day, json.dumps(bucket), now) for day, bucket in buckets.items()],
+            )
+
+    def discard(self, days) -> None:
+        with self.db:
+            self.db.executemany("DELETE FROM daily_rollups WHERE day = ?", [(d,) for d in days])
+
+    def meta(self, key: str) -> str | None:
+        row = self.db.execute("SELECT value FROM rollup_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO rollup_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def snapshot(self) -> dict:
+        count, first, last = self.db.execute("SELECT COUNT(*), MIN(day), MAX(day) FROM daily_rollups").fetchone()
+        return {"path": self.path, "days": count, "first": first, "last": last, "checked_at": self.meta("checked_at")}
+
+class DailyRollups:
+    def __init__(self, store: RollupStore, check_interval: float = ROLLUP_CHECK_INTERVAL):
+        self.store = store
+        self.check_interval = check_interval
+        self._checked = 0.0
+        self._checking = asyncio.Lock()
+        # held only around store reads and writes, never across an upstream scan
+        self._lock = asyncio.Lock()
+        self._discards = 0
+
+    async def _discard_late(self, client: AirtableClient) -> None:
+        # anything created or edited upstream since the last check invalidates the day it was created on.
+        # One scan per interval: summaries arriving while it runs read the store as it stands.
+        if time.monotonic() - self._checked < self.check_interval or self._checking.locked():
+            return
+        async with self._checking:
+            started = datetime.now(timezone.utc)
+            checked_at = await self.store.call(self.store.meta, "checked_at")
+            touched = {}
+            if checked_at:
+                since = (datetime.fromisoformat(checked_at) - timedelta(seconds=60)).isoformat()
+                touched = await aggregate(client, {
+                    table: (f"IS_AFTER(LAST_MODIFIED_TIME(),'{since}')", [ByDay(table, lambda: [])]) for table in METRICS
+                }, priority=Priority.REFRESH)
+            async with self._lock:
+                await self.store.call(self.store.discard, {day for days in touched.values() for day in days})
+                await self.store.call(self.store.set_meta, "checked_at", started.isoformat())
+                self._discards += 1
+            self._checked = time.monotonic()
+
+    async def _compute_run(self, client: AirtableClient, days: list[str]) -> dict[str, dict]:
+        # one query per table spanning the run, bucketed by created_at as pages stream in
+        end = (date.fromisoformat(days[-1]) + timedelta(days=1)).isoformat()
+        formula = f"AND(NOT(IS_BEFORE({{created_at}},'{days[0]}')),IS_BEFORE({{created_at}},'{end}'))"
+        per_table = await aggregate(client, {table: (formula, [ByDay(table, factory)]) for table, factory in METRICS.items()})
+        return {day: merge([empty_bucket(), *(t.get(day, {}) for t in per_table.values())]) for day in days}
+
+    async def _compute(self, client: AirtableClient, days: list[str]) -> dict[str, dict]:
+        # contiguous runs of missing days are fetched separately so a stale day mid-month does not rescan the month
+        runs = []
+        for day in days:
+            if runs and date.fromisoformat(day) - date.fromisoformat(runs[-1][-1]) == timedelta(days=1):
+                runs[-1].append(day)
+            else:
+                runs.append([day])
+        results = await asyncio.gather(*(self._compute_run(client, run) for run in runs))
+        return {day: bucket for result in results for day, bucket in result.items()}
+
+    async def buckets(self, client: AirtableClient, start: date, end: date, recompute: bool = False) -> dict[str, dict]:
+        days = days_between(start, end)
+        await self._discard_late(client)
+        async with self._lock:
+            stored = {} if recompute else await self.store.call(self.store.get, days)
+            discards = self._discards
+        missing = [d for d in days if d not in stored]
+        if missing:
+            computed = await self._compute(client, missing)
+            async with self._lock:
+                # a check that ran meanwhile may have discarded days this read before a late edit;
+                # today is still filling up, so it is recomputed on every call rather than stored
+                if discards == self._discards:
+                    await self.store.call(self.store.put, {d: b for d, b in computed.items() if d < _today()})
+            stored.update(computed)
+        return {d: stored[d] for d in days}
+
+    def total(self, buckets: dict[str, dict]) -> dict:
+        total = merge([empty_bucket(), *buckets.values()])
+        fulfilled = total["by_status"].get("Fulfilled", 0)
+        total["fulfillment_rate"] = round(fulfilled / total["total_orders"] * 100, 1) if total["total_orders"] else 0
+        return total
+
+    async def summary(self, client: AirtableClient, start: date, end: date, recompute: bool = False) -> dict:
+        return self.total(await self.buckets(client, start, end, recompute))
+
+rollups = DailyRollups(RollupStore(ROLLUP_DB))
@@ -0,0 +1,99 @@
+import json
+from functools import lru_cache
+from config import WAREHOUSE_LAYOUT_FILE
+
+# Rectangular layout: each rack sits in a vertical aisle (x) at a depth along it (y).
+# Aisles are joined by cross aisles at fixed y positions; the depot sits on the front one.
+DEFAULT_LAYOUT = {
+    "depot": [0, 0],
+    "cross_aisles": [0, 30],
+    "zones": {
+        "Zone-A": {"x": 10},
+        "Zone-B": {"x": 30},
+        "Zone-C": {"x": 50},
+    },
+    "racks": {
+        "Rack-1": {"x": 0, "y": 5},
+        "Rack-2": {"x": 0, "y": 15},
+        "Rack-3": {"x": 0, "y": 25},
+    },
+}
+
+def load_layout() -> dict:
+    if not WAREHOUSE_LAYOUT_FILE:
+        return DEFAULT_LAYOUT
+    with open(WAREHOUSE_LAYOUT_FILE) as f:
+        return json.load(f)
+
+class Layout:
+    def __init__(self, spec: dict):
+        self.depot = tuple(spec["depot"])
+        self.cross_aisles = spec["cross_aisles"]
+        self.zones = spec["zones"]
+        self.racks = spec["racks"]
+
+    def position(self, location: str, rack: str) -> tuple[float, float] | None:
+        zone, slot = self.zones.get(location), self.racks.get(rack)
+        if zone is None or slot is None:
+            return None
+        return zone["x"] + slot["x"], zone.get("y", 0) + slot["y"]
+
+    def distance(self, a: tuple[float, float], b: tuple[float, float]) -> float:
+        (ax, ay), (bx, by) = a, b
+        if ax == bx:
+            return abs(ay - by)
+        # changing aisle means walking to a cross aisle, along it, and back down
+        return abs(ax - bx) + min(abs(ay - c) + abs(by - c) for c in self.cross_aisles)
+
+@lru_cache(maxsize=1)
+def get_layout() -> Layout:
+    return Layout(load_layout())
+
+def _tour_length(tour: list[int], dist: list[list[float]]) -> float:
+    return sum(dist[tour[i]][tour[i + 1]] for i in range(len(tour) - 1))
+
+def _nearest_neighbour(dist: list[list[float]]) -> list[int]:
+    n = len(dist)
+    tour, left = [0], set(range(1, n))
+    while left:
+        here = tour[-1]
+        nxt = min(left, key=lambda j: dist[here][j])
+        tour.append(nxt)
+        left.remove(nxt)
+    return tour + [0]
+
+def _two_opt(tour: list[int], dist: list[list[float]], max_passes: int = 50) -> list[int]:
+    improved, passes = True, 0
+    while improved and passes < max_passes:
+        improved, passes = False, passes + 1
+        for i in range(1, len(tour) - 2):
+            for j in range(i + 1, len(tour) - 1):
+                a, b, c, d = tour[i - 1], tour[i], tour[j], tour[j + 1]
+                if dist[a][c] + dist[b][d] < dist[a][b] + dist[c][d] - 1e-9:
+                    tour[i:j + 1] = reversed(tour[i:j + 1])
+                    improved = True
+    return tour
+
+def plan_route(stops: list[dict], layout: Layout | None = None) -> dict:
+    # stops need "location" and "rack"; returns them in walking order with leg distances
+    layout = layout or get_layout()
+    mapped = [s for s in stops if layout.position(s["location"], s["rack"]) is not None]
+    unmapped = [s for s in stops if layout.position(s["location"], s["rack"]) is None]
+
+    points = [layout.depot] + [layout.position(s["location"], s["rack"]) for s in mapped]
+    dist = [[layout.distance(p, q) for q in points] for p in points]
+    tour = _two_opt(_nearest_neighbour(dist), dist) if mapped else [0, 0]
+
+    route = []
+    for seq, (prev, idx) in enumerate(zip(tour, tour[1:-1]), start=1):
+        route.append({**mapped[idx - 1], "sequence": seq, "leg_distance": dist[prev][idx]})
+    # stops the layout does not know are appended so nothing is dropped from the pick
+    for s in unmapped:
+        route.append({**s, "sequence": len(route) + 1, "leg_distance": None, "unmapped": True})
+
+    naive = sorted(range(1, len(points)), key=lambda i: (mapped[i - 1]["location"], mapped[i - 1]["rack"]))
+    return {
+        "total_distance": _tour_length(tour, dist),
+        "naive_distance": _tour_length([0] + naive + [0], dist),
+        "route": route,
+    }
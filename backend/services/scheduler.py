@@ -0,0 +1,149 @@
+import asyncio
+import time
+from collections import deque
+from enum import IntEnum
+from services.metrics import QUEUE_WAIT
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    REPORT = 1
+    REFRESH = 2
+
+class RateWindow:
+    # at most `limit` requests in any `window` seconds, the way Airtable counts them on arrival. A request
+    # holds its slot from dispatch until `window` seconds after its response, so no matter how long each one
+    # takes to reach Airtable, `limit + 1` of them can never land inside the same window.
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.in_flight = 0
+        self.released: deque[float] = deque()
+        self.paused_until = 0.0
+
+    def take(self) -> float | None:
+        # 0 when a slot was taken, the seconds until one frees up, or None while every slot is in flight
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        while self.released and now - self.released[0] >= self.window:
+            self.released.popleft()
+        if self.in_flight + len(self.released) < self.limit:
+            self.in_flight += 1
+            return 0.0
+        return self.window - (now - self.released[0]) if self.released else None
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self.released.append(time.monotonic())
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class LaneStats:
+    def __init__(self):
+        self.enqueued = 0
+        self.dispatched = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent_waits = deque(maxlen=500)
+
+    def record(self, waited: float) -> None:
+        self.dispatched += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.recent_waits.append(waited)
+
+class AirtableScheduler:
+    def __init__(self, limit: int, window: float):
+        self.rate = RateWindow(limit, window)
+        self._lanes = {p: deque() for p in Priority}
+        self._stats = {p: LaneStats() for p in Priority}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.throttled = 0
+        self.retries = 0
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._dispatch())
+        fut = asyncio.get_running_loop().create_future()
+        self._lanes[priority].append((fut, time.monotonic()))
+        self._stats[priority].enqueued += 1
+        self._wakeup.set()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # dispatched just as the caller went away
+            raise
+
+    def release(self) -> None:
+        # every acquire is paired with one release once its response (or error) is back
+        self.rate.release()
+        self._wakeup.set()
+
+    def penalize(self, seconds: float) -> None:
+        # a 429 means the whole base is over budget, so every lane backs off
+        self.throttled += 1
+        self.rate.pause(seconds)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _next_lane(self) -> Priority | None:
+        for priority in Priority:
+            lane = self._lanes[priority]
+            while lane and lane[0][0].done():
+                lane.popleft()  # caller was cancelled while queued
+            if lane:
+                return priority
+        return None
+
+    async def _dispatch(self) -> None:
+        while True:
+            priority = self._next_lane()
+            if priority is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self.rate.take()
+            if delay is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            fut, queued_at = self._lanes[priority].popleft()
+            waited = time.monotonic() - queued_at
+            self._stats[priority].record(waited)
+            QUEUE_WAIT.observe(waited, priority.name.lower())
+            fut.set_result(None)
+
+    def snapshot(self) -> dict:
+        lanes = {}
+        for priority in Priority:
+            stats = self._stats[priority]
+            waits = sorted(stats.recent_waits)
+            lanes[priority.name.lower()] = {
+                "queue_depth": len(self._lanes[priority]),
+                "enqueued": stats.enqueued,
+                "dispatched": stats.dispatched,
+                "avg_wait_ms": round(stats.wait_total / stats.dispatched * 1000, 1) if stats.dispatched else 0,
+                "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0,
+                "max_wait_ms": round(stats.wait_max * 1000, 1),
+            }
+        return {
+            "limit": self.rate.limit,
+            "window": self.rate.window,
+            "in_flight": self.rate.in_flight,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "lanes": lanes,
+        }
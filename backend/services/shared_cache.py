@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from secrets import token_hex
+from typing import Awaitable, Callable
+from config import SHARED_CACHE_LEASE, SHARED_CACHE_PATH, SHARED_CACHE_POLL, SHARED_CACHE_RETENTION
+
+logger = logging.getLogger(__name__)
+
+# (cache, key, op, payload) for every change another worker published; key None means every key of the cache
+Apply = Callable[[str, str | None, str, dict | None], Awaitable[None]]
+
+# how often the follower drops changes and entries older than the retention
+PRUNE_EVERY = 300
+# how often a worker waiting on lock() retries; locks guard single writes, so waits are short
+LOCK_POLL = 0.02
+
+class SharedStore:
+    # the workers' common copy of every cache. Values live in `entries`; `changes` is an append-only log of
+    # what each worker did to them ("set", "merge", "invalidate", "expire") that the others replay into their
+    # own in-process caches; `leases` elect the one worker that fetches or refreshes a key, and serialize
+    # writes through lock(); `idempotency` holds each Idempotency-Key's request fingerprint and result.
+    # The methods that touch the file run on the store's own thread, never on the event loop: async code
+    # awaits them through call(), or queues them with submit() when it doesn't need the answer. Another
+    # worker holding the write lock, or a large value being decoded, then only delays that one caller.
+    def __init__(self, path: str, lease: float = SHARED_CACHE_LEASE, poll: float = SHARED_CACHE_POLL,
+                 retention: float = SHARED_CACHE_RETENTION):
+        self.path = path
+        self.lease = lease
+        self.poll = poll
+        self.retention = retention
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{token_hex(3)}"
+        self.seq = 0
+        self._db: sqlite3.Connection | None = None
+        # one thread, so calls run in the order they were made and share one connection
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-cache")
+        self.last_error: str | None = None
+        self.totals = {"published": 0, "applied": 0, "stored": 0, "discarded": 0, "leases_won": 0, "leases_lost": 0, "errors": 0}
+
+    def call(self, fn: Callable, *args) -> Awaitable:
+        return asyncio.wrap_future(self._thread.submit(fn, *args))
+
+    def submit(self, fn: Callable, *args) -> None:
+        self._thread.submit(fn, *args).add_done_callback(self._failed)
+
+    def _failed(self, future: Future) -> None:
+        if future.exception() is not None:
+            self._error(future.exception())
+
+    def _error(self, e: BaseException) -> None:
+        self.totals["errors"] += 1
+        self.last_error = repr(e)
+
+    async def keep(self, name: str) -> None:
+        # renews a lease this worker holds until cancelled
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await self.call(self.acquire, name)
+
+    @asynccontextmanager
+    async def lock(self, name: str):
+        # a lease held for the block, across every worker; waits while another worker holds it
+        while not await self.call(self.acquire, name):
+            await asyncio.sleep(LOCK_POLL)
+        keeper = asyncio.create_task(self.keep(name))
+        try:
+            yield
+        finally:
+            keeper.cancel()
+            self.submit(self.release, name)
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            db.executescript(
+                "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;"
+                "CREATE TABLE IF NOT EXISTS entries (cache TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL, stored_at REAL NOT NULL, seq INTEGER NOT NULL, PRIMARY KEY (cache, key));"
+                "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, cache TEXT NOT NULL, key TEXT,"
+                " op TEXT NOT NULL, payload TEXT, origin TEXT NOT NULL, created REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS changes_by_key ON changes (cache, key, seq);"
+                "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS idempotency (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, result TEXT,"
+                " stored_at REAL NOT NULL);"
+            )
+        return self._db
+
+    @contextmanager
+    def _transaction(self):
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _log(self, db: sqlite3.Connection, cache: str, key: str | None, op: str, payload: dict | None = None) -> int:
+        cur = db.execute(
+            "INSERT INTO changes (cache, key, op, payload, origin, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (cache, key, op, None if payload is None else json.dumps(payload, default=str), self.owner, time.time()),
+        )
+        return cur.lastrowid
+
+    def head(self) -> int:
+        return self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def acquire(self, name: str, ttl: float | None = None) -> bool:
+        # take the lease if it is free or expired, or extend it if this worker already holds it
+        now = time.time()
+        self.db.execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) ON CONFLICT (name) DO UPDATE SET"
+            " owner = excluded.owner, expires_at = excluded.expires_at WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+            (name, self.owner, now + (ttl or self.lease), now),
+        )
+        won = self.holder(name) == self.owner
+        self.totals["leases_won" if won else "leases_lost"] += 1
+        return won
+
+    def holder(self, name: str) -> str | None:
+        row = self.db.execute("SELECT owner FROM leases WHERE name = ? AND expires_at >= ?", (name, time.time())).fetchone()
+        return row[0] if row else None
+
+    def release(self, name: str) -> None:
+        self.db.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
+
+    def version(self, cache: str, key: str, stored_since: float = 0) -> int:
+        # the seq of the stored value, 0 if there is none stored since stored_since
+        row = self.db.execute(
+            "SELECT seq FROM entries WHERE cache = ? AND key = ? AND stored_at >= ?", (cache, key, stored_since)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def load(self, cache: str, key: str) -> tuple | None:
+        # (value, fetched_at, stored_at, seq, merges published since it was stored), or None
+        row = self.db.execute(
+            "SELECT value, fetched_at, stored_at, seq FROM entries WHERE cache = ? AND key = ?", (cache, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value, fetched_at, stored_at, seq = row
+        merges = self.db.execute(
+            "SELECT payload FROM changes WHERE cache = ? AND key = ? AND seq > ? AND op = 'merge' ORDER BY seq", (cache, key, seq)
+        ).fetchall()
+        return json.loads(value), fetched_at, stored_at, seq, [json.loads(payload) for payload, in merges]
+
+    def put(self, cache: str, key: str, value, fetched_at: float, since: int) -> int:
+        # store a fetched value and return its seq, or 0 when a write published after `since` (the fetch's
+        # start) may be missing from it
+        data = json.dumps(value, default=str)
+        with self._transaction() as db:
+            if db.execute(
+                "SELECT 1 FROM changes WHERE cache = ? AND (key = ? OR key IS NULL) AND seq > ? AND op != 'set' LIMIT 1",
+                (cache, key, since),
+            ).fetchone():
+                self.totals["discarded"] += 1
+                return 0
+            seq = self._log(db, cache, key, "set")
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", (cache, key, data, fetched_at, time.time(), seq))
+            # merges before the fetch started are part of the value now
+            db.execute("DELETE FROM changes WHERE cache = ? AND key = ? AND seq < ?", (cache, key, seq))
+        self.totals["stored"] += 1
+        return seq
+
+    def publish(self, cache: str, key: str | None, op: str, payload: dict | None = None, stored_at: float | None = None) -> None:
+        with self._transaction() as db:
+            self._log(db, cache, key, op, payload)
+            match = "cache = ?" + ("" if key is None else " AND key = ?")
+            args = (cache,) if key is None else (cache, key)
+            if op == "invalidate":
+                db.execute(f"DELETE FROM entries WHERE {match}", args)
+            elif op == "expire":
+                db.execute(f"UPDATE entries SET stored_at = ? WHERE {match}", (stored_at, *args))
+            elif op == "merge" and payload["fetched_at"] is not None:
+                # a delta refresh: the stored value plus its merges are current again
+                db.execute(f"UPDATE entries SET stored_at = ? WHERE {match}", (time.time(), *args))
+        self.totals["published"] += 1
+
+    def claim(self, key: str, fingerprint: str, ttl: float) -> tuple | None:
+        # None once this worker owns the key and runs its call; otherwise (fingerprint, result, running) of
+        # the worker that does. A running claim whose owner stopped renewing its lease is taken over.
+        now = time.time()
+        lease = f"idempotency:{key}"
+        with self._transaction() as db:
+            row = db.execute("SELECT fingerprint, result, stored_at FROM idempotency WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                theirs, result, stored_at = row
+                abandoned = result is None and db.execute(
+                    "SELECT 1 FROM leases WHERE name = ? AND expires_at >= ?", (lease, now)
+                ).fetchone() is None
+                if stored_at >= now - ttl and not abandoned:
+                    return theirs, None if result is None else json.loads(result), result is None
+            db.execute("INSERT OR REPLACE INTO idempotency VALUES (?, ?, NULL, ?)", (key, fingerprint, now))
+            db.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)", (lease, self.owner, now + self.lease))
+        return None
+
+    def finish(self, key: str, result) -> None:
+        with self._transaction() as db:
+            db.execute("UPDATE idempotency SET result = ?, stored_at = ? WHERE key = ?", (json.dumps(result, default=str), time.time(), key))
+            db.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (f"idempotency:{key}", self.owner))
+
+    def forget(self, key: str) -> None:
+        # a failed call: the client's retry, on any worker, runs it again
+        with self._transaction() as db:
+            db.execute("DELETE FROM idempotency WHERE key = ?", (key,))
+            db.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (f"idempotency:{key}", self.owner))
+
+    def changes(self) -> list[tuple]:
+        # payloads stay encoded: the follower decodes each one on its own, so one bad change is all it skips
+        rows = self.db.execute(
+            "SELECT seq, cache, key, op, payload, origin FROM changes WHERE seq > ? ORDER BY seq", (self.seq,)
+        ).fetchall()
+        if rows:
+            self.seq = rows[-1][0]
+        return [(cache, key, op, payload) for _, cache, key, op, payload, origin in rows if origin != self.owner]
+
+    def prune(self) -> None:
+        cutoff = time.time() - self.retention
+        with self._transaction() as db:
+            db.execute("DELETE FROM changes WHERE created < ?", (cutoff,))
+            db.execute("DELETE FROM entries WHERE stored_at < ?", (cutoff,))
+            db.execute("DELETE FROM idempotency WHERE stored_at < ? AND result IS NOT NULL", (cutoff,))
+            db.execute("DELETE FROM leases WHERE expires_at < ?", (time.time(),))
+
+    async def follow(self, apply: Apply) -> None:
+        # replays the other workers' changes every `poll` seconds for as long as the app runs
+        self.seq = await self.call(self.head)
+        pruned = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll)
+            try:
+                changes = await self.call(self.changes)
+            except sqlite3.Error as e:
+                # the read failed before `seq` moved, so the same changes are read on the next poll
+                self._error(e)
+                continue
+            for cache, key, op, payload in changes:
+                try:
+                    await apply(cache, key, op, None if payload is None else json.loads(payload))
+                    self.totals["applied"] += 1
+                except Exception as e:
+                    # `seq` is already past this change: it is skipped, the rest of the batch still applies
+                    self._error(e)
+                    logger.exception("could not apply shared cache change %s %s %s", op, cache, key)
+            if time.monotonic() - pruned > PRUNE_EVERY:
+                pruned = time.monotonic()
+                try:
+                    await self.call(self.prune)
+                except sqlite3.Error as e:
+                    # old rows simply wait for the next prune
+                    self._error(e)
+
+    def snapshot(self) -> dict:
+        return {"path": self.path, "owner": self.owner, "seq": self.seq, "last_error": self.last_error, **self.totals}
+
+shared = SharedStore(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None
@@ -0,0 +1,57 @@
+import time
+
+def _entry(record: dict) -> dict:
+    f = record.get("fields", {})
+    return {
+        "id": record["id"],
+        "sku": f.get("sku"),
+        "location": f.get("location"),
+        "rack": f.get("rack"),
+        "available": f.get("available", 0),
+        "quantity": f.get("quantity", 0),
+    }
+
+class SkuIndex:
+    def __init__(self):
+        self.by_sku: dict[str, dict] = {}
+        self.by_id: dict[str, dict] = {}
+        self.built_at: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    def rebuild(self, records: list[dict]) -> None:
+        by_id = {r["id"]: _entry(r) for r in records}
+        self.by_id = by_id
+        self.by_sku = {e["sku"]: e for e in by_id.values() if e["sku"]}
+        self.built_at = time.time()
+
+    def upsert(self, records: list[dict]) -> None:
+        for record in records:
+            entry = _entry(record)
+            previous = self.by_id.get(entry["id"])
+            if previous and previous["sku"] != entry["sku"] and self.by_sku.get(previous["sku"]) is previous:
+                del self.by_sku[previous["sku"]]
+            self.by_id[entry["id"]] = entry
+            if entry["sku"]:
+                self.by_sku[entry["sku"]] = entry
+
+    def apply(self, records: list[dict], full: bool) -> None:
+        # Cache listener: full loads replace the index, write-throughs and deltas patch it
+        if full:
+            self.rebuild(records)
+        else:
+            self.upsert(records)
+
+    def get(self, sku: str) -> dict | None:
+        return self.by_sku.get(sku)
+
+    def sku_for(self, record_id: str) -> str:
+        entry = self.by_id.get(record_id)
+        return entry["sku"] if entry and entry["sku"] else record_id
+
+    def snapshot(self) -> dict:
+        return {"ready": self.ready, "skus": len(self.by_sku), "records": len(self.by_id), "built_at": self.built_at}
+
+sku_index = SkuIndex()
@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import importlib
+import importlib.util
+import json
+from typing import AsyncIterator, Callable
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from services.cache import Cache
+from services.listquery import ListIndex, ListQuery, index_for
+
+NDJSON = "application/x-ndjson"
+
+# brotli is optional; without it clients that accept br get gzip
+brotli = importlib.import_module("brotli") if importlib.util.find_spec("brotli") else None
+ENCODERS = {
+    **({"br": lambda body: brotli.compress(body, quality=5)} if brotli else {}),
+    "gzip": lambda body: gzip.compress(body, compresslevel=6),
+}
+MIN_COMPRESS = 1024
+
+def wants_ndjson(request: Request) -> bool:
+    return request.query_params.get("format") == "ndjson" or NDJSON in request.headers.get("accept", "")
+
+async def _chunks(first: list[dict], pages: AsyncIterator[list[dict]], ndjson: bool):
+    if not ndjson:
+        yield '{"records":['
+    sep = ""
+    page = first
+    while page is not None:
+        if page:
+            if ndjson:
+                yield "".join(json.dumps(r) + "\n" for r in page)
+            else:
+                yield sep + ",".join(json.dumps(r) for r in page)
+                sep = ","
+        page = await anext(pages, None)
+    if not ndjson:
+        yield "]}"
+
+async def stream_pages(pages: AsyncIterator[list[dict]], ndjson: bool = False) -> StreamingResponse:
+    # pull the first page before sending headers so upstream errors still map to a proper status code
+    first = await anext(pages, [])
+    return StreamingResponse(_chunks(first, pages, ndjson), media_type=NDJSON if ndjson else "application/json")
+
+def _accepted(request: Request) -> list[str]:
+    accepted = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()[2:] if params.strip().startswith("q=") else "1"
+        try:
+            accepted[name.strip().lower()] = float(q)
+        except ValueError:
+            continue
+    return [e for e in ENCODERS if accepted.get(e, accepted.get("*", 0)) > 0]
+
+def _render(entry, ndjson: bool) -> tuple[bytes, str]:
+    # serialized once per cache entry version; merge_records clears entry.derived when records change
+    fmt = "ndjson" if ndjson else "json"
+    if fmt not in entry.derived:
+        records = entry.value["records"]
+        if ndjson:
+            body = "".join(json.dumps(r) + "\n" for r in records).encode()
+        else:
+            body = b'{"records":[' + ",".join(json.dumps(r) for r in records).encode() + b"]}"
+        entry.derived[fmt] = body
+        entry.derived[fmt, "etag"] = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    return entry.derived[fmt], entry.derived[fmt, "etag"]
+
+def _encoded(entry, ndjson: bool, encoding: str) -> bytes:
+    key = ("ndjson" if ndjson else "json", encoding)
+    if key not in entry.derived:
+        entry.derived[key] = ENCODERS[encoding](_render(entry, ndjson)[0])
+    return entry.derived[key]
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def _respond(request: Request, body: bytes, etag: str, ndjson: bool, encoded: Callable[[str], bytes],
+             extra: dict | None = None) -> Response:
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache", **(extra or {})}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    encodings = _accepted(request) if len(body) >= MIN_COMPRESS else []
+    if encodings:
+        headers["Content-Encoding"] = encodings[0]
+        body = encoded(encodings[0])
+    return Response(body, media_type=NDJSON if ndjson else "application/json", headers=headers)
+
+async def _query(request: Request, cache: Cache, key: str, source: Callable[[], AsyncIterator[list[dict]]],
+                 refresh: bool, query: ListQuery) -> Response:
+    # filtered/sorted/paged views are answered from the entry's secondary indexes; a miss loads the list first
+    ndjson = wants_ndjson(request)
+    entry = cache.hit(key, source, refresh)
+    if entry is None:
+        records = [r async for page in cache.subscribe(key, source) for r in page]
+        entry = cache.entry(key)
+        index = index_for(entry) if entry is not None else ListIndex(records)
+    else:
+        index = index_for(entry)
+
+    etag = f'W/"{hashlib.blake2b((index.version + query.canonical()).encode(), digest_size=16).hexdigest()}"'
+    result = index.page(query)
+    # ndjson carries only records, so the paging fields also go out as headers
+    headers = {"X-Total-Count": str(result["total"])}
+    if result["next_cursor"]:
+        headers["X-Next-Cursor"] = result["next_cursor"]
+    if ndjson:
+        body = "".join(json.dumps(r) + "\n" for r in result["records"]).encode()
+    else:
+        body = json.dumps(result).encode()
+    return _respond(request, body, etag, ndjson, lambda encoding: ENCODERS[encoding](body), headers)
+
+async def cached_list(request: Request, cache: Cache, key: str, source: Callable[[], AsyncIterator[list[dict]]],
+                      refresh: bool = False, query: ListQuery | None = None):
+    # cache hits are answered from pre-rendered (and pre-compressed) bytes with an ETag; misses stream
+    if query is not None and query.active:
+        return await _query(request, cache, key, source, refresh, query)
+    ndjson = wants_ndjson(request)
+    entry = cache.hit(key, source, refresh)
+    if entry is None:
+        return await stream_pages(cache.subscribe(key, source), ndjson)
+
+    body, etag = _render(entry, ndjson)
+    return _respond(request, body, etag, ndjson, lambda encoding: _encoded(entry, ndjson, encoding))
@@ -0,0 +1,95 @@
+from services.routing import Layout, get_layout, plan_route
+
+# lower rank is picked first; anything unknown goes after Normal
+PRIORITY_RANK = {"Urgent": 0, "High": 1, "Normal": 2, "Low": 3}
+
+def priority_of(picklist: dict) -> str:
+    # Picklists.priority is a lookup from the linked order, so Airtable returns it as a list
+    value = picklist.get("fields", {}).get("priority")
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value or "Normal"
+
+def _rank(priority: str) -> int:
+    return PRIORITY_RANK.get(priority, len(PRIORITY_RANK))
+
+def _overlap(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+def _candidate(picklist: dict, stops: list[dict]) -> dict:
+    priority = priority_of(picklist)
+    return {
+        "picklist": picklist,
+        "priority": priority,
+        "rank": _rank(priority),
+        "created_at": picklist.get("fields", {}).get("created_at", ""),
+        "stops": stops,
+        "zones": {s["location"] for s in stops},
+        "orders": len(picklist["fields"].get("order_id", [])),
+        "units": sum(s["qty"] for s in stops),
+    }
+
+def _fits(wave: list[dict], c: dict, max_orders: int, max_units: int) -> bool:
+    orders = sum(w["orders"] for w in wave) + c["orders"]
+    units = sum(w["units"] for w in wave) + c["units"]
+    return orders <= max_orders and units <= max_units
+
+def _cluster(candidates: list[dict], max_orders: int, max_units: int) -> list[list[dict]]:
+    # greedy: seed with the most urgent, oldest picklist, then keep adding the most urgent
+    # picklist that shares the most zones with the cart until it is full
+    pending = sorted(candidates, key=lambda c: (c["rank"], c["created_at"]))
+    waves = []
+    while pending:
+        wave = [pending.pop(0)]
+        zones = set(wave[0]["zones"])
+        while True:
+            fitting = [c for c in pending if _fits(wave, c, max_orders, max_units)]
+            if not fitting:
+                break
+            best = min(fitting, key=lambda c: (c["rank"], -_overlap(zones, c["zones"]), c["created_at"]))
+            pending.remove(best)
+            wave.append(best)
+            zones |= best["zones"]
+        waves.append(wave)
+    return waves
+
+def plan_waves(picklists: list[dict], stops_by_order: dict[str, list[dict]], max_orders: int, max_units: int,
+               layout: Layout | None = None) -> dict:
+    layout = layout or get_layout()
+    candidates, skipped = [], []
+    for picklist in picklists:
+        order_ids = picklist.get("fields", {}).get("order_id", [])
+        stops = [s for order_id in order_ids for s in stops_by_order.get(order_id, [])]
+        if stops:
+            candidates.append(_candidate(picklist, stops))
+        else:
+            skipped.append({"picklist_id": picklist["id"], "reason": "No pickable order items"})
+
+    waves = []
+    for number, wave in enumerate(_cluster(candidates, max_orders, max_units), start=1):
+        # one put-wall slot per order; slots follow pick priority so urgent orders get the first ones
+        slots, stops = [], []
+        for c in wave:
+            for order_id in c["picklist"]["fields"].get("order_id", []):
+                slot = len(slots) + 1
+                slots.append({"slot": slot, "order_id": order_id, "picklist_id": c["picklist"]["id"], "priority": c["priority"]})
+                stops.extend({**s, "picklist_id": c["picklist"]["id"], "slot": slot}
+                             for s in stops_by_order.get(order_id, []))
+        plan = plan_route(stops, layout)
+        units = sum(c["units"] for c in wave)
+        waves.append({
+            "wave": number,
+            "priority": min((c["priority"] for c in wave), key=_rank),
+            "picklist_ids": [c["picklist"]["id"] for c in wave],
+            "zones": sorted(set().union(*(c["zones"] for c in wave))),
+            "orders": len(slots),
+            "units": units,
+            # a single picklist bigger than the cart still gets its own wave
+            "over_capacity": units > max_units or len(slots) > max_orders,
+            "slots": slots,
+            "total_distance": plan["total_distance"],
+            # what the same picks cost walked one picklist at a time
+            "separate_distance": sum(plan_route(c["stops"], layout)["total_distance"] for c in wave),
+            "route": plan["route"],
+        })
+    return {"waves": waves, "skipped": skipped}
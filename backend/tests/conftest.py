@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the backend imports its modules from backend/ (`from services...`), as uvicorn runs it
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,55 @@
+import asyncio
+import httpx
+import pytest
+from services import backends, cache as cache_module
+from services.airtable import AirtableClient
+from services.cache import ALL, Cache
+from services.reconcile import reconcile_table
+
+AIRTABLE = [{"id": "rec1", "fields": {"status": "Fulfilled"}}, {"id": "rec2", "fields": {"status": "Pending"}}]
+MIRROR = [{"id": "rec1", "fields": {"status": "Pending"}}, {"id": "rec2", "fields": {"status": "Pending"}}]
+
+class FakeMirror:
+    async def scan(self, table):
+        yield [dict(r) for r in MIRROR]
+
+    async def batch_get(self, table, ids):
+        return [r for r in MIRROR if r["id"] in ids]
+
+    async def write(self, table, records, delete_ids=()):
+        raise AssertionError("not resyncing")
+
+@pytest.fixture
+def airtable():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"records": AIRTABLE})
+
+    client = AirtableClient("https://airtable.test/v0/appTest", {}, transport=httpx.MockTransport(handler))
+    yield client, calls
+    asyncio.run(client.aclose())
+
+@pytest.fixture
+def orders_cache(monkeypatch):
+    # the router cache holds whatever the Orders read backend returned: here, the mirror's copy
+    monkeypatch.setattr(cache_module, "_registry", {})
+    cache = Cache("orders", 300)
+    cache.set(ALL, {"records": [dict(r) for r in MIRROR]})
+    return cache
+
+def test_cache_filled_from_another_backend_is_not_the_airtable_side(monkeypatch, airtable, orders_cache):
+    client, calls = airtable
+    monkeypatch.setitem(backends.READ_BACKENDS, "Orders", "memory")
+    report = asyncio.run(reconcile_table(client, FakeMirror(), "Orders", max_age=300))
+    assert not report["in_sync"]
+    assert report["mismatched"] == [{"id": "rec1", "fields": ["status"]}]
+    assert calls
+
+def test_cache_filled_from_airtable_stands_in_for_it(monkeypatch, airtable, orders_cache):
+    client, calls = airtable
+    monkeypatch.setitem(backends.READ_BACKENDS, "Orders", "airtable")
+    report = asyncio.run(reconcile_table(client, FakeMirror(), "Orders", max_age=300))
+    assert report["in_sync"]
+    assert calls == []
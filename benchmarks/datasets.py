@@ -0,0 +1,150 @@
+import random
+from datetime import datetime, timedelta
+from typing import Callable
+
+# seeded bases shaped after docs/airtable-schema.txt; `rows` is the Orders count and the other
+# tables scale with it the way they do in production (about two lines per order, one stock row per 20)
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+ORDER_STATUSES = ["Pending", "Validated", "Checking Stock", "Picking", "Ready", "Shipped", "Failed",
+                  "Stock Confirmed", "Reserved", "Expired", "Cancelled"]
+PRIORITIES = ["Normal", "Normal", "Normal", "High", "Urgent"]
+ZONES = ["Zone-A", "Zone-B", "Zone-C"]
+RACKS = ["Rack-1", "Rack-2", "Rack-3"]
+# orders in these states have a picklist
+PICKED = {"Picking", "Ready", "Shipped", "Reserved"}
+
+Lookup = Callable[[str, str], dict | None]
+
+# formula, rollup and lookup fields: Airtable rejects writes to them and recomputes them itself
+COMPUTED = {
+    "Orders": {"order_id", "stock_validation", "all_item_avb"},
+    "Stocks": {"stock_id", "quantity", "reserved", "available", "minus_stock", "stock_percentage"},
+    "Order_Items": {"item_id", "lookup_sku", "item_sku", "avb_qty", "order_status", "stock_sufficient"},
+    "Picklists": {"picklist_id", "priority"},
+    "AuditLogs": {"log_id"},
+    "Stock_Transfers": {"transfer_id"},
+    "Exceptions": {"exception_id"},
+    "Notifications": {"notification_id", "customer_email"},
+    "Backorders": {"backorder_id", "sku"},
+    "Good_Receipts": {"receipt_id", "sku"},
+    "Reports": {"report_id"},
+}
+
+def parse_size(value: str) -> int:
+    return SIZES.get(value) or int(value)
+
+def record_id(prefix: str, i: int) -> str:
+    # Airtable ids are "rec" + 14 characters
+    return f"rec{prefix}{i:0{14 - len(prefix)}d}"
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else None
+
+def derive(table: str, fields: dict, lookup: Lookup) -> dict:
+    # recomputes the computed fields the backend reads after a write
+    if table == "Stocks":
+        quantity = fields.get("def_quantity", 0) + fields.get("add_stock", 0) - fields.get("minus_stock", 0)
+        available = quantity - fields.get("reserved", 0)
+        fields.update(quantity=quantity, available=available,
+                      stock_percentage=round(available / quantity * 100, 1) if quantity else 0)
+    elif table == "Order_Items":
+        stock = lookup("Stocks", _first(fields.get("sku"))) or {}
+        order = lookup("Orders", _first(fields.get("order_id"))) or {}
+        fields.update(lookup_sku=[stock.get("sku")] if stock else [], item_sku=stock.get("sku", ""),
+                      avb_qty=[stock.get("available", 0)] if stock else [],
+                      order_status=[order.get("status")] if order else [],
+                      stock_sufficient=fields.get("qty", 0) <= stock.get("available", 0))
+    elif table in ("Good_Receipts", "Backorders"):
+        stock = lookup("Stocks", _first(fields.get("link_sku"))) or {}
+        fields["sku"] = [stock["sku"]] if stock else []
+    elif table == "Picklists":
+        order = lookup("Orders", _first(fields.get("order_id"))) or {}
+        fields["priority"] = [order["priority"]] if order.get("priority") else []
+    return fields
+
+def build(rows: int, seed: int = 7, now: datetime | None = None) -> dict[str, list[dict]]:
+    # created_at spreads over the 90 days before `now`, so daily/weekly/monthly reports find data
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+
+    def stamp() -> str:
+        return (now - timedelta(seconds=rng.randrange(90 * 86400))).isoformat(timespec="seconds")
+
+    def record(prefix: str, i: int, created: str, **fields) -> dict:
+        return {"id": record_id(prefix, i), "createdTime": created + ".000Z",
+                "fields": {"created_at": created, "created_by": "System", "updated_at": created, "updated_by": "System", **fields}}
+
+    tables: dict[str, list[dict]] = {name: [] for name in COMPUTED}
+
+    stocks = tables["Stocks"]
+    for i in range(max(50, rows // 20)):
+        def_quantity, add_stock, reserved, minus_stock = rng.randint(0, 500), rng.randint(0, 100), rng.randint(0, 40), rng.randint(0, 40)
+        stock = record("STK", i, stamp(), sku=f"SKU-{i:05d}", def_quantity=def_quantity, add_stock=add_stock,
+                       reserved=reserved, minus_stock=minus_stock, location=rng.choice(ZONES), rack=rng.choice(RACKS),
+                       Order_Items=[], Stock_Transfers=[], Notifications=[], Good_Receipts=[])
+        derive("Stocks", stock["fields"], lambda *_: None)
+        stocks.append(stock)
+
+    item_no = 0
+    for i in range(rows):
+        created = stamp()
+        status = rng.choice(ORDER_STATUSES)
+        order = record("ORD", i, created, customer_email=f"customer{i % 5000}@example.com", customer_id=f"CUST-{i % 5000:05d}",
+                       priority=rng.choice(PRIORITIES), status=status, validation_errors="", Order_Items=[], Picklists=[])
+        order["fields"]["order_id"] = order["id"]
+        tables["Orders"].append(order)
+        for _ in range(rng.randint(1, 3)):
+            stock = rng.choice(stocks)
+            item = record("ITM", item_no, created, order_id=[order["id"]], sku=[stock["id"]], qty=rng.randint(1, 10),
+                          order_cancelled=status in ("Cancelled", "Expired"), order_picked=status in ("Ready", "Shipped"),
+                          lookup_sku=[stock["fields"]["sku"]], item_sku=stock["fields"]["sku"],
+                          avb_qty=[stock["fields"]["available"]], order_status=[status])
+            item["fields"]["stock_sufficient"] = item["fields"]["qty"] <= stock["fields"]["available"]
+            order["fields"]["Order_Items"].append(item["id"])
+            tables["Order_Items"].append(item)
+            item_no += 1
+        if status in PICKED:
+            picklist = record("PKL", len(tables["Picklists"]), created, order_id=[order["id"]],
+                              priority=[order["fields"]["priority"]], customer_email=order["fields"]["customer_email"],
+                              status="Completed" if status in ("Ready", "Shipped") else rng.choice(["Created", "In Progress"]))
+            order["fields"]["Picklists"].append(picklist["id"])
+            tables["Picklists"].append(picklist)
+
+    orders = tables["Orders"]
+    for i in range(rows // 2):
+        order = rng.choice(orders)
+        tables["AuditLogs"].append(record("LOG", i, stamp(), general_id=order["id"],
+                                          step=rng.choice(["Order Validator", "Stock Checker", "Picklist Generator"]),
+                                          status=rng.choice(["Success", "Success", "Success", "Failed"])))
+    for i in range(rows // 4):
+        order = rng.choice(orders)
+        tables["Notifications"].append(record("NTF", i, stamp(), order_id=[order["id"]], type="Email",
+                                              customer_email=[order["fields"]["customer_email"]],
+                                              recipient=order["fields"]["customer_email"]))
+    for i in range(rows // 20):
+        stock = rng.choice(stocks)["fields"]
+        tables["Stock_Transfers"].append(record("TRF", i, stamp(), from_location=stock["location"], to_location=rng.choice(ZONES),
+                                                from_rack=stock["rack"], to_rack=rng.choice(RACKS), sku=stock["sku"],
+                                                quantity=rng.randint(1, 60), status=rng.choice(["Pending", "Completed", "Failed"]),
+                                                requested_by="System", approved_by=""))
+        tables["Exceptions"].append(record("EXC", i, stamp(), related_id=rng.choice(orders)["id"],
+                                           error_type=rng.choice(["Validation Error", "Stock Unavailable", "Partial Stock",
+                                                                  "Stock Shortage", "System Error"]),
+                                           error_message="Seeded exception", severity=rng.choice(["Low", "Medium", "High", "Critical"]),
+                                           status=rng.choice(["Open", "Resolved"]), assigned_to=rng.choice(["Ops Team", "Stock Team"])))
+        stock_record = rng.choice(stocks)
+        tables["Backorders"].append(record("BKO", i, stamp(), original_order_id=[rng.choice(orders)["id"]], items="[]",
+                                           status=rng.choice(["Pending", "Fulfilled", "Cancelled"]), link_sku=[stock_record["id"]],
+                                           sku=[stock_record["fields"]["sku"]], qty_needed=rng.randint(1, 20)))
+    for i in range(rows // 10):
+        stock_record = rng.choice(stocks)
+        stock = stock_record["fields"]
+        tables["Good_Receipts"].append(record("GRC", i, stamp(), link_sku=[stock_record["id"]], sku=[stock["sku"]],
+                                              quantity=rng.randint(1, 50), location=stock["location"], rack=stock["rack"],
+                                              received_by="System", status="Completed", notes=""))
+    for i in range(60):
+        created = (now - timedelta(days=i)).isoformat(timespec="seconds")
+        tables["Reports"].append(record("RPT", i, created, report_type="Daily Summary", report_data="{}",
+                                        generated_by="System", status="Generated"))
+    return tables
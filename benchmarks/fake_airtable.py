@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import itertools
+import random
+import socket
+import string
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timezone
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from benchmarks.datasets import COMPUTED, build, derive, parse_size
+from benchmarks.formula import FormulaError, compile_formula
+
+MAX_PAGE_SIZE = 100
+MAX_BATCH = 10
+# list iterators (offset tokens) kept for paging; Airtable's expire too
+ITERATORS_KEPT = 1000
+
+def _error(status: int, kind: str, message: str | None = None) -> JSONResponse:
+    return JSONResponse({"error": {"type": kind, "message": message or kind}}, status_code=status)
+
+def _sort_key(value):
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if value is None or value == "":
+        return (0, 0)
+    if isinstance(value, (bool, int, float)):
+        return (1, value)
+    return (2, str(value))
+
+class FakeAirtable:
+    # the REST surface the backend and lambdas use: list with offset paging, filterByFormula, sort and
+    # fields[], get, single and batch create/patch, per-request latency and a per-base rate limit that
+    # answers 429 once more than `rate` requests arrive within a second
+    def __init__(self, tables: dict[str, list[dict]], latency: float = 0.2, jitter: float = 0.05,
+                 rate: float = 5, penalty: float = 0, seed: int = 7):
+        self.tables: dict[str, OrderedDict[str, dict]] = {
+            name: OrderedDict((r["id"], {**r, "modified": time.time()}) for r in records) for name, records in tables.items()
+        }
+        self.latency = latency
+        self.jitter = jitter
+        self.rate = rate
+        self.penalty = penalty
+        self._rng = random.Random(seed)
+        self._window: deque[float] = deque()
+        self._locked_until = 0.0
+        self._iterators: OrderedDict[str, tuple[str, list[str]]] = OrderedDict()
+        self._iterator_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.throttled = 0
+
+    def _new_id(self) -> str:
+        return "rec" + "".join(self._rng.choices(string.ascii_letters + string.digits, k=14))
+
+    def _lookup(self, table: str, record_id: str | None) -> dict | None:
+        record = self.tables.get(table, {}).get(record_id) if record_id else None
+        return record["fields"] if record else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_method = Counter()
+            for (method, _), n in self.calls.items():
+                by_method[method] += n
+            return {
+                "calls": sum(self.calls.values()),
+                "by_method": dict(by_method),
+                "by_table": {f"{m} {t}": n for (m, t), n in sorted(self.calls.items())},
+                "throttled": self.throttled,
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.throttled = 0
+
+    def _admit(self) -> bool:
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            while self._window and now - self._window[0] >= 1:
+                self._window.popleft()
+            if now < self._locked_until or len(self._window) >= self.rate:
+                self.throttled += 1
+                if self.penalty and now >= self._locked_until:
+                    self._locked_until = now + self.penalty
+                return False
+            self._window.append(now)
+            return True
+
+    def _public(self, record: dict, fields: list[str] | None = None) -> dict:
+        values = record["fields"] if not fields else {k: v for k, v in record["fields"].items() if k in fields}
+        return {"id": record["id"], "createdTime": record["createdTime"], "fields": values}
+
+    def _readonly(self, table: str, fields: dict) -> str | None:
+        return next((name for name in fields if name in COMPUTED.get(table, ())), None)
+
+    def list(self, table: str, params) -> JSONResponse:
+        records = self.tables[table]
+        offset = params.get("offset")
+        if offset:
+            iterator, _, position = offset.partition("/")
+            if iterator not in self._iterators or not position.isdigit():
+                return _error(422, "LIST_RECORDS_ITERATOR_NOT_AVAILABLE")
+            _, ids = self._iterators[iterator]
+            start = int(position)
+        else:
+            formula = params.get("filterByFormula")
+            try:
+                match = compile_formula(formula) if formula else None
+            except FormulaError as e:
+                return _error(422, "INVALID_FILTER_BY_FORMULA", str(e))
+            rows = [r for r in records.values() if match is None or match(r)]
+            for i in reversed(range(10)):
+                field = params.get(f"sort[{i}][field]")
+                if field:
+                    rows.sort(key=lambda r: _sort_key(r["fields"].get(field)), reverse=params.get(f"sort[{i}][direction]") == "desc")
+            max_records = int(params.get("maxRecords") or 0)
+            ids = [r["id"] for r in (rows[:max_records] if max_records else rows)]
+            iterator = f"itr{next(self._iterator_ids)}"
+            start = 0
+            self._iterators[iterator] = (table, ids)
+            if len(self._iterators) > ITERATORS_KEPT:
+                self._iterators.popitem(last=False)
+        size = min(int(params.get("pageSize") or MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+        fields = params.getlist("fields[]") or None
+        page = [self._public(records[rid], fields) for rid in ids[start:start + size] if rid in records]
+        body = {"records": page}
+        if start + size < len(ids):
+            body["offset"] = f"{iterator}/{start + size}"
+        return JSONResponse(body)
+
+    def get(self, table: str, record_id: str) -> JSONResponse:
+        record = self.tables[table].get(record_id)
+        if record is None:
+            return JSONResponse({"error": "NOT_FOUND"}, status_code=404)
+        return JSONResponse(self._public(record))
+
+    def create(self, table: str, body: dict) -> JSONResponse:
+        rows = body["records"] if "records" in body else [{"fields": body.get("fields", {})}]
+        if len(rows) > MAX_BATCH:
+            return _error(422, "INVALID_RECORDS", f"At most {MAX_BATCH} records per request")
+        for row in rows:
+            field = self._readonly(table, row.get("fields", {}))
+            if field:
+                return _error(422, "INVALID_VALUE_FOR_COLUMN", f"Field \"{field}\" cannot accept a value because the field is computed")
+        created = []
+        for row in rows:
+            now = time.time()
+            record = {"id": self._new_id(), "modified": now,
+                      "createdTime": datetime.fromtimestamp(now, timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+                      "fields": derive(table, dict(row.get("fields", {})), self._lookup)}
+            self.tables[table][record["id"]] = record
+            created.append(self._public(record))
+        return JSONResponse({"records": created} if "records" in body else created[0])
+
+    def update(self, table: str, body: dict, record_id: str | None = None) -> JSONResponse:
+        rows = body["records"] if record_id is None else [{"id": record_id, "fields": body.get("fields", {})}]
+        if len(rows) > MAX_BATCH:
+            return _error(422, "INVALID_RECORDS", f"At most {MAX_BATCH} records per request")
+        for row in rows:
+            if row.get("id") not in self.tables[table]:
+                return JSONResponse({"error": "NOT_FOUND"}, status_code=404)
+            field = self._readonly(table, row.get("fields", {}))
+            if field:
+                return _error(422, "INVALID_VALUE_FOR_COLUMN", f"Field \"{field}\" cannot accept a value because the field is computed")
+        updated = []
+        for row in rows:
+            record = self.tables[table][row["id"]]
+            record["fields"] = derive(table, {**record["fields"], **row.get("fields", {})}, self._lookup)
+            record["modified"] = time.time()
+            updated.append(self._public(record))
+        return JSONResponse({"records": updated} if record_id is None else updated[0])
+
+    def app(self) -> FastAPI:
+        app = FastAPI(title="Fake Airtable")
+
+        @app.middleware("http")
+        async def upstream(request: Request, call_next):
+            if request.url.path.startswith("/_fake"):
+                return await call_next(request)
+            parts = request.url.path.split("/")
+            with self._lock:
+                self.calls[(request.method, parts[3] if len(parts) > 3 else "")] += 1
+            delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not self._admit():
+                headers = {"Retry-After": str(self.penalty)} if self.penalty else None
+                return JSONResponse({"errors": [{"error": "RATE_LIMIT_REACHED", "message": "Rate limit exceeded. Please try again later"}]},
+                                    status_code=429, headers=headers)
+            return await call_next(request)
+
+        def table_or_404(table: str):
+            return None if table in self.tables else _error(404, "TABLE_NOT_FOUND", f"Could not find table {table}")
+
+        @app.get("/v0/{base}/{table}")
+        async def list_records(base: str, table: str, request: Request):
+            return table_or_404(table) or self.list(table, request.query_params)
+
+        @app.get("/v0/{base}/{table}/{record_id}")
+        async def get_record(base: str, table: str, record_id: str):
+            return table_or_404(table) or self.get(table, record_id)
+
+        @app.post("/v0/{base}/{table}")
+        async def create_records(base: str, table: str, request: Request):
+            return table_or_404(table) or self.create(table, await request.json())
+
+        @app.patch("/v0/{base}/{table}")
+        async def update_records(base: str, table: str, request: Request):
+            return table_or_404(table) or self.update(table, await request.json())
+
+        @app.patch("/v0/{base}/{table}/{record_id}")
+        async def update_record(base: str, table: str, record_id: str, request: Request):
+            return table_or_404(table) or self.update(table, await request.json(), record_id)
+
+        @app.get("/_fake/stats")
+        async def get_stats():
+            return self.stats()
+
+        @app.post("/_fake/stats/reset")
+        async def reset():
+            self.reset_stats()
+            return self.stats()
+
+        return app
+
+class FakeServer:
+    # runs the fake in a background thread with its own event loop, so the code under test talks to it
+    # over real sockets and the fake's own work stays off the loop being measured
+    def __init__(self, fake: FakeAirtable, host: str = "127.0.0.1", port: int = 0):
+        self.fake = fake
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        host, port = self._socket.getsockname()
+        self.url = f"http://{host}:{port}/v0"
+        self._server = uvicorn.Server(uvicorn.Config(fake.app(), log_level="warning", lifespan="off", access_log=False))
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [self._socket]}, daemon=True)
+
+    def __enter__(self) -> "FakeServer":
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("Fake Airtable server failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a seeded fake Airtable base on localhost")
+    parser.add_argument("--rows", default="1k", help="1k, 10k, 100k or an Orders count")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--rate", type=float, default=5, help="Requests per second before 429s; 0 disables")
+    parser.add_argument("--penalty", type=float, default=0, help="Seconds every request gets 429 after a throttle (Airtable: 30)")
+    args = parser.parse_args()
+    fake = FakeAirtable(build(parse_size(args.rows), args.seed), args.latency, args.jitter, args.rate, args.penalty, args.seed)
+    print(f"Fake Airtable on http://{args.host}:{args.port}/v0 - set AIRTABLE_API_URL to that")
+    uvicorn.run(fake.app(), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable
+
+# the subset of Airtable's formula language the backend and lambdas send as filterByFormula:
+# field refs, string/number literals, comparisons, &, arithmetic, and the functions below
+
+class FormulaError(ValueError):
+    pass
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+      (?P<number>\d+(?:\.\d+)?)
+    | (?P<string>'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*")
+    | (?P<field>\{[^}]*\})
+    | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<op><=|>=|!=|<>|[=<>&+\-*/(),])
+    )""", re.VERBOSE)
+
+def _tokens(formula: str) -> list[tuple[str, str]]:
+    tokens, pos = [], 0
+    formula = formula.rstrip()
+    while pos < len(formula):
+        match = _TOKEN.match(formula, pos)
+        if match is None or match.end() == pos:
+            raise FormulaError(f"Unexpected input at {pos}: {formula[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+def _unquote(literal: str) -> str:
+    return re.sub(r"\\(.)", r"\1", literal[1:-1])
+
+def _date(value) -> datetime | None:
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def _text(value) -> str:
+    # how Airtable renders a cell inside a formula: linked/lookup lists joined, blanks empty, 5.0 as 5
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ", ".join(_text(v) for v in value)
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _number(value) -> float:
+    if isinstance(value, (bool, int, float)):
+        return float(value)
+    try:
+        return float(_text(value) or 0)
+    except ValueError:
+        return 0.0
+
+def _truthy(value) -> bool:
+    if isinstance(value, list):
+        return bool(value)
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    return bool(_text(value))
+
+def _compare(op: str, left, right) -> bool:
+    if isinstance(left, datetime) or isinstance(right, datetime):
+        left, right = _date(left), _date(right)
+        if left is None or right is None:
+            return False
+    elif isinstance(left, (int, float)) and not isinstance(left, bool) or \
+            isinstance(right, (int, float)) and not isinstance(right, bool):
+        left, right = _number(left), _number(right)
+    else:
+        left, right = _text(left), _text(right)
+    if op == "=":
+        return left == right
+    if op in ("!=", "<>"):
+        return left != right
+    if op == "<":
+        return left < right
+    if op == ">":
+        return left > right
+    if op == "<=":
+        return left <= right
+    return left >= right
+
+Row = dict  # {"id", "createdTime", "fields", "modified"}
+Expr = Callable[[Row], object]
+
+def _is_after(a, b):
+    a, b = _date(a), _date(b)
+    return a is not None and b is not None and a > b
+
+def _is_before(a, b):
+    a, b = _date(a), _date(b)
+    return a is not None and b is not None and a < b
+
+FUNCTIONS: dict[str, Callable] = {
+    "AND": lambda *args: all(_truthy(a) for a in args),
+    "OR": lambda *args: any(_truthy(a) for a in args),
+    "NOT": lambda a: not _truthy(a),
+    "IF": lambda cond, then, otherwise="": then if _truthy(cond) else otherwise,
+    "TRUE": lambda: True,
+    "FALSE": lambda: False,
+    "BLANK": lambda: None,
+    "IS_AFTER": _is_after,
+    "IS_BEFORE": _is_before,
+    "IS_SAME": lambda a, b, unit="": _date(a) == _date(b),
+    "DATETIME_PARSE": lambda a, fmt="": _date(a),
+    "FIND": lambda needle, haystack, start=0: _text(haystack).find(_text(needle), max(int(_number(start)) - 1, 0)) + 1,
+    "SEARCH": lambda needle, haystack, start=0: _text(haystack).lower().find(_text(needle).lower(), max(int(_number(start)) - 1, 0)) + 1,
+    "LOWER": lambda a: _text(a).lower(),
+    "UPPER": lambda a: _text(a).upper(),
+    "LEN": lambda a: len(_text(a)),
+    "ARRAYJOIN": lambda a, sep=", ": sep.join(_text(v) for v in (a if isinstance(a, list) else [a])),
+}
+# functions that read the record rather than their arguments
+ROW_FUNCTIONS: dict[str, Callable[[Row], object]] = {
+    "RECORD_ID": lambda row: row["id"],
+    "CREATED_TIME": lambda row: _date(row["createdTime"]),
+    "LAST_MODIFIED_TIME": lambda row: datetime.fromtimestamp(row["modified"], timezone.utc),
+}
+
+class _Parser:
+    def __init__(self, formula: str):
+        self.tokens = _tokens(formula)
+        self.pos = 0
+
+    def peek(self) -> tuple[str, str] | None:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self, value: str | None = None) -> tuple[str, str]:
+        token = self.peek()
+        if token is None or (value is not None and token[1] != value):
+            raise FormulaError(f"Expected {value or 'a value'}, got {token[1] if token else 'end of formula'}")
+        self.pos += 1
+        return token
+
+    def parse(self) -> Expr:
+        expr = self.comparison()
+        if self.peek() is not None:
+            raise FormulaError(f"Unexpected {self.peek()[1]!r}")
+        return expr
+
+    def comparison(self) -> Expr:
+        left = self.concat()
+        token = self.peek()
+        if token and token[0] == "op" and token[1] in ("=", "!=", "<>", "<", ">", "<=", ">="):
+            op = self.take()[1]
+            right = self.concat()
+            return lambda row: _compare(op, left(row), right(row))
+        return left
+
+    def concat(self) -> Expr:
+        parts = [self.additive()]
+        while self.peek() == ("op", "&"):
+            self.take()
+            parts.append(self.additive())
+        if len(parts) == 1:
+            return parts[0]
+        return lambda row: "".join(_text(p(row)) for p in parts)
+
+    def additive(self) -> Expr:
+        expr = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            op, right, left = self.take()[1], self.term(), expr
+            expr = (lambda l, r: lambda row: _number(l(row)) + _number(r(row)))(left, right) if op == "+" else \
+                   (lambda l, r: lambda row: _number(l(row)) - _number(r(row)))(left, right)
+        return expr
+
+    def term(self) -> Expr:
+        expr = self.unary()
+        while self.peek() in (("op", "*"), ("op", "/")):
+            op, right, left = self.take()[1], self.unary(), expr
+            expr = (lambda l, r: lambda row: _number(l(row)) * _number(r(row)))(left, right) if op == "*" else \
+                   (lambda l, r: lambda row: _number(l(row)) / (_number(r(row)) or float("nan")))(left, right)
+        return expr
+
+    def unary(self) -> Expr:
+        if self.peek() == ("op", "-"):
+            self.take()
+            operand = self.unary()
+            return lambda row: -_number(operand(row))
+        return self.primary()
+
+    def primary(self) -> Expr:
+        kind, value = self.take()
+        if kind == "number":
+            number = float(value) if "." in value else int(value)
+            return lambda row: number
+        if kind == "string":
+            text = _unquote(value)
+            return lambda row: text
+        if kind == "field":
+            name = value[1:-1]
+            return lambda row: row["fields"].get(name)
+        if kind == "op" and value == "(":
+            expr = self.comparison()
+            self.take(")")
+            return expr
+        if kind == "name":
+            return self.call(value.upper())
+        raise FormulaError(f"Unexpected {value!r}")
+
+    def call(self, name: str) -> Expr:
+        self.take("(")
+        args: list[Expr] = []
+        if self.peek() != ("op", ")"):
+            args.append(self.comparison())
+            while self.peek() == ("op", ","):
+                self.take()
+                args.append(self.comparison())
+        self.take(")")
+        if name in ROW_FUNCTIONS:
+            return ROW_FUNCTIONS[name]
+        fn = FUNCTIONS.get(name)
+        if fn is None:
+            raise FormulaError(f"Unknown function {name}")
+        return lambda row: fn(*(a(row) for a in args))
+
+@lru_cache(maxsize=256)
+def compile_formula(formula: str) -> Callable[[Row], bool]:
+    expr = _Parser(formula).parse()
+    return lambda row: _truthy(expr(row))
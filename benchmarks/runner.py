@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+import httpx
+from benchmarks.datasets import build, parse_size
+from benchmarks.fake_airtable import FakeAirtable, FakeServer
+from benchmarks.scenarios import SCENARIOS, Run
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+BASE_ID = "appBenchmark"
+
+def _backend_app():
+    # the backend reads its settings at import, so the environment is set before the first import
+    os.environ.update(READ_BACKEND_DEFAULT="airtable", READ_BACKENDS="")
+    os.environ.setdefault("ROLLUP_DB", os.path.join(tempfile.mkdtemp(prefix="rpa-bench-"), "rollups.db"))
+    sys.path.insert(0, str(BACKEND_DIR))
+    from main import app
+    from services.airtable import AirtableClient
+    from services.cache import caches
+    app.state.airtable = AirtableClient()
+    return app, caches
+
+async def _run(args, fake: FakeAirtable, server: FakeServer, data: dict) -> list[dict]:
+    # read by both the in-process backend and the SyncAirtableData lambda
+    os.environ.update(AIRTABLE_API_URL=server.url, AIRTABLE_BASE_ID=BASE_ID, AIRTABLE_TOKEN="benchmark")
+    app = caches = None
+    if args.backend_url:
+        http = httpx.AsyncClient(base_url=args.backend_url, timeout=args.timeout)
+    else:
+        app, caches = _backend_app()
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://backend", timeout=args.timeout)
+
+    results = []
+    async with http:
+        for name in args.scenario:
+            if caches is not None and not args.warm:
+                for cache in caches().values():
+                    cache.invalidate()
+            fake.reset_stats()
+            run = Run(http, data, args.users, args.rounds, args.interval, args.seed)
+            started = time.perf_counter()
+            await SCENARIOS[name](run)
+            seconds = time.perf_counter() - started
+            # refreshes and background tasks the scenario started still count towards its upstream calls
+            await asyncio.sleep(args.settle)
+            summary = run.summary(seconds)
+            upstream = fake.stats()
+            summary.update(
+                scenario=name,
+                upstream=upstream,
+                upstream_per_request=round(upstream["calls"] / summary["requests"], 2) if summary["requests"] else 0,
+            )
+            results.append(summary)
+            _print_row(summary, args.baseline.get(name) if args.baseline else None)
+    if app is not None:
+        await app.state.airtable.aclose()
+    return results
+
+HEADER = f"{'scenario':<20}{'reqs':>7}{'err':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'upstream':>10}{'429s':>6}{'up/req':>8}"
+
+def _delta(now: float, before: float | None) -> str:
+    if not before:
+        return ""
+    return f" ({(now - before) / before * 100:+.0f}%)"
+
+def _print_row(s: dict, baseline: dict | None) -> None:
+    if s["skipped"]:
+        print(f"{s['scenario']:<20}skipped: {s['skipped']}")
+        return
+    print(f"{s['scenario']:<20}{s['requests']:>7}{s['errors']:>6}{s['throughput_rps']:>9}{s['p50_ms']:>10}{s['p95_ms']:>10}"
+          f"{s['p99_ms']:>10}{s['max_ms']:>10}{s['upstream']['calls']:>10}{s['upstream']['throttled']:>6}{s['upstream_per_request']:>8}")
+    if baseline:
+        print(f"{'':<20}vs baseline: p95{_delta(s['p95_ms'], baseline.get('p95_ms'))}, "
+              f"upstream{_delta(s['upstream']['calls'], baseline.get('upstream', {}).get('calls'))}")
+    for label, r in s["by_request"].items():
+        print(f"  {label:<38}{r['requests']:>7}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+    for kind, n in s["error_kinds"].items():
+        print(f"  ! {kind} x{n}")
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Offline load scenarios against a local fake Airtable")
+    parser.add_argument("--rows", default="1k", help="Dataset size: 1k, 10k, 100k or an Orders count")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Repeatable; defaults to all")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent callers per scenario")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between dashboard polls")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake Airtable seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--rate", type=float, default=5, help="Fake Airtable requests per second before 429s; 0 disables")
+    parser.add_argument("--penalty", type=float, default=0, help="Seconds of 429s after a throttle (Airtable's is 30)")
+    parser.add_argument("--warm", action="store_true", help="Keep backend caches between scenarios")
+    parser.add_argument("--settle", type=float, default=0.5, help="Seconds to wait for background work after a scenario")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--backend-url", help="Benchmark a running backend instead; start it with AIRTABLE_API_URL set to the fake")
+    parser.add_argument("--fake-port", type=int, default=0, help="Fake Airtable port, for --backend-url")
+    parser.add_argument("--json", help="Write the results here")
+    parser.add_argument("--baseline", help="Earlier --json output to compare against")
+    args = parser.parse_args(argv)
+    args.scenario = args.scenario or list(SCENARIOS)
+    args.baseline = {r["scenario"]: r for r in json.loads(Path(args.baseline).read_text())["results"]} if args.baseline else None
+
+    started = time.perf_counter()
+    data = build(parse_size(args.rows), args.seed)
+    print(f"Seeded {sum(len(v) for v in data.values())} records ({args.rows} orders) in {time.perf_counter() - started:.1f}s")
+    fake = FakeAirtable(data, args.latency, args.jitter, args.rate, args.penalty, args.seed)
+    with FakeServer(fake, port=args.fake_port) as server:
+        print(f"Fake Airtable at {server.url}: latency {args.latency}s, {args.rate or 'unlimited'} req/s\n")
+        print(HEADER)
+        results = asyncio.run(_run(args, fake, server, data))
+    if args.json:
+        settings = {k: v for k, v in vars(args).items() if k not in ("baseline", "json")}
+        Path(args.json).write_text(json.dumps({"settings": settings, "results": results}, indent=2))
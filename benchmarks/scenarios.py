@@ -0,0 +1,223 @@
+import asyncio
+import importlib.util
+import math
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable
+import httpx
+
+SYNC_LAMBDA = Path(__file__).resolve().parent.parent / "lambda_functions" / "SyncAirtableData" / "lambda_function.py"
+
+def percentile(values: list[float], q: float) -> float:
+    # nearest rank
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)] if ordered else 0.0
+
+class Run:
+    # one scenario's measurements; `users` callers act concurrently for `rounds` rounds
+    def __init__(self, http: httpx.AsyncClient, data: dict[str, list[dict]], users: int, rounds: int,
+                 interval: float, seed: int = 7):
+        self.http = http
+        self.data = data
+        self.users = users
+        self.rounds = rounds
+        self.interval = interval
+        self.rng = random.Random(seed)
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.skipped: str | None = None
+
+    async def timed(self, label: str, work: Awaitable, ok: Callable[[object], bool] = lambda _: True):
+        started = time.perf_counter()
+        try:
+            result = await work
+        except Exception as e:
+            self.latencies[label].append(time.perf_counter() - started)
+            self.errors[f"{label}: {type(e).__name__}"] += 1
+            return None
+        self.latencies[label].append(time.perf_counter() - started)
+        if not ok(result):
+            self.errors[f"{label}: failed"] += 1
+        return result
+
+    async def call(self, label: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        resp = await self.timed(label, self.http.request(method, url, **kwargs))
+        if resp is not None and resp.status_code >= 400:
+            self.errors[f"{label}: {resp.status_code}"] += 1
+        return resp
+
+    async def each_user(self, act: Callable[[int], Awaitable]) -> None:
+        await asyncio.gather(*(act(user) for user in range(self.users)))
+
+    def summary(self, seconds: float) -> dict:
+        every = [v for values in self.latencies.values() for v in values]
+
+        def stats(values: list[float]) -> dict:
+            return {
+                "requests": len(values),
+                "p50_ms": round(percentile(values, 0.5) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                "max_ms": round(max(values, default=0) * 1000, 1),
+            }
+
+        return {
+            **stats(every),
+            "seconds": round(seconds, 2),
+            "throughput_rps": round(len(every) / seconds, 2) if seconds else 0,
+            "errors": sum(self.errors.values()),
+            "error_kinds": dict(self.errors),
+            "by_request": {label: stats(values) for label, values in sorted(self.latencies.items())},
+            "skipped": self.skipped,
+        }
+
+def _skus(run: Run) -> list[dict]:
+    return [s["fields"] | {"id": s["id"]} for s in run.data["Stocks"]]
+
+def _new_order(run: Run, skus: list[dict], n: int) -> dict:
+    return {
+        "customer_email": f"bench{n}@example.com",
+        "customer_id": f"BENCH-{n:05d}",
+        "priority": run.rng.choice(["Normal", "High", "Urgent"]),
+        "items": [{"sku": run.rng.choice(skus)["sku"], "qty": run.rng.randint(1, 5)} for _ in range(run.rng.randint(1, 3))],
+    }
+
+async def order_entry(run: Run) -> None:
+    # a burst of storefront orders per round, each followed by a status change and an items read,
+    # plus one CSV-sized bulk upload
+    skus = _skus(run)
+    for r in range(run.rounds):
+        async def enter(user: int):
+            resp = await run.call("POST /orders", "POST", "/orders", json=_new_order(run, skus, r * run.users + user))
+            if resp is None or resp.status_code != 200:
+                return
+            order_id = resp.json()["order_id"]
+            await run.call("PATCH /orders/{id}/status", "PATCH", f"/orders/{order_id}/status", json={"status": "Validated"})
+            await run.call("GET /orders/{id}/items", "GET", f"/orders/{order_id}/items")
+
+        await asyncio.gather(
+            run.each_user(enter),
+            run.call("POST /orders/bulk", "POST", "/orders/bulk",
+                     json={"orders": [_new_order(run, skus, 100_000 + r * 50 + i) for i in range(50)]}),
+        )
+
+async def stock_movements(run: Run) -> None:
+    # goods receipts piling onto a few hot SKUs, and transfers of distinct SKUs
+    skus = _skus(run)
+    hot = skus[:3]
+    for r in range(run.rounds):
+        async def move(user: int):
+            stock = hot[user % len(hot)]
+            await run.call("POST /stocks/goods-receipt", "POST", "/stocks/goods-receipt", params={
+                "sku": stock["sku"], "quantity": run.rng.randint(1, 20), "location": stock["location"], "rack": stock["rack"],
+            })
+            stock = skus[len(hot) + (r * run.users + user) % (len(skus) - len(hot))]
+            racks = [rack for rack in ("Rack-1", "Rack-2", "Rack-3") if rack != stock["rack"]]
+            to_rack = run.rng.choice(racks)
+            resp = await run.call("POST /stock-transfers", "POST", "/stock-transfers", params={
+                "from_location": stock["location"], "to_location": stock["location"], "from_rack": stock["rack"],
+                "to_rack": to_rack, "sku": stock["sku"], "requested_by": f"bench{user}",
+            })
+            if resp is not None and resp.status_code == 200:
+                stock["rack"] = to_rack
+
+        await run.each_user(move)
+    await run.call("GET /stocks/goods-receipts", "GET", "/stocks/goods-receipts")
+
+DASHBOARD = [
+    ("GET /orders?status&limit", "/orders", {"status": "Pending", "limit": 100}),
+    ("GET /stocks", "/stocks", None),
+    ("GET /picklists", "/picklists", None),
+    ("GET /stock-transfers", "/stock-transfers", None),
+    ("GET /metrics/dashboard", "/metrics/dashboard", None),
+    ("GET /exceptions", "/exceptions", {"limit": 100}),
+]
+
+async def dashboard_polling(run: Run) -> None:
+    # every open tab re-reads the dashboard lists every `interval` seconds
+    for _ in range(run.rounds):
+        started = time.perf_counter()
+
+        async def poll(user: int):
+            await asyncio.gather(*(run.call(label, "GET", url, params=params) for label, url, params in DASHBOARD))
+
+        await run.each_user(poll)
+        await asyncio.sleep(max(0.0, run.interval - (time.perf_counter() - started)))
+
+async def monitoring(run: Run) -> None:
+    for _ in range(run.rounds):
+        async def browse(user: int):
+            for name in ("audit-logs", "backorders", "notifications", "exceptions"):
+                await run.call(f"GET /{name}", "GET", f"/{name}", params={"limit": 100})
+
+        await run.each_user(browse)
+
+async def picking(run: Run) -> None:
+    picklists = [p["id"] for p in run.data["Picklists"]]
+    for _ in range(run.rounds):
+        async def pick(user: int):
+            picklist = run.rng.choice(picklists)
+            await run.call("GET /picklists/waves", "GET", "/picklists/waves")
+            await run.call("GET /picklists/{id}/route", "GET", f"/picklists/{picklist}/route")
+            await run.call("PATCH /picklists/{id}/status", "PATCH", f"/picklists/{picklist}/status", json={"status": "In Progress"})
+
+        await run.each_user(pick)
+
+async def reports(run: Run) -> None:
+    today = date.today()
+    for _ in range(run.rounds):
+        async def report(user: int):
+            await run.call("POST /reports/daily", "POST", "/reports/daily")
+            await run.call("GET /reports/summary", "GET", "/reports/summary",
+                           params={"start": str(today - timedelta(days=29)), "end": str(today)})
+            await run.call("GET /reports/reconciliation", "GET", "/reports/reconciliation")
+            await run.call("GET /reports", "GET", "/reports")
+
+        await asyncio.gather(
+            run.each_user(report),
+            run.call("POST /reports/weekly", "POST", "/reports/weekly"),
+            run.call("POST /reports/monthly", "POST", "/reports/monthly"),
+        )
+
+class _LambdaContext:
+    function_name = "SyncAirtableData-benchmark"
+
+def _load_sync_lambda():
+    os.environ.setdefault("HISTORY_TABLE_NAME", "RPA-SyncHistory")
+    os.environ.setdefault("TABLE_PREFIX", "RPA-")
+    os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "true")
+    spec = importlib.util.spec_from_file_location("sync_airtable_data", SYNC_LAMBDA)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+async def sync_airtable_data(run: Run) -> None:
+    # the whole handler when a DynamoDB endpoint is configured (e.g. DynamoDB Local), otherwise just
+    # its Airtable side: fetchAllRecords for every synced table
+    try:
+        module = await asyncio.to_thread(_load_sync_lambda)
+    except ImportError as e:
+        run.skipped = f"SyncAirtableData needs {e.name}"
+        return
+    full = bool(os.getenv("AWS_ENDPOINT_URL_DYNAMODB") or os.getenv("AWS_ENDPOINT_URL"))
+    for _ in range(run.rounds):
+        if full:
+            await run.timed("lambda_handler", asyncio.to_thread(module.lambda_handler, {}, _LambdaContext()),
+                            ok=lambda result: result.get("status") is True)
+            continue
+        for table in module.AIRTABLE_TABLES:
+            await run.timed(f"fetchAllRecords {table}", asyncio.to_thread(module.fetchAllRecords, table))
+
+SCENARIOS: dict[str, Callable[[Run], Awaitable[None]]] = {
+    "order_entry": order_entry,
+    "stock_movements": stock_movements,
+    "dashboard_polling": dashboard_polling,
+    "monitoring": monitoring,
+    "picking": picking,
+    "reports": reports,
+    "sync_airtable_data": sync_airtable_data,
+}
@@ -14,3 +14,65 @@ function showToast(message, type = 'success', duration = 3000) {
     container.appendChild(toast);
     setTimeout(() => toast.remove(), duration);
 }
+
+// Live changes from /api/events: one EventSource per page shared by every table the page watches.
+// Resync callbacks run after a reconnect, since events sent while disconnected are not replayed.
+const liveHandlers = {};
+const liveResyncs = [];
+let liveSource = null;
+
+function onRecordChange(table, handler, resync) {
+    (liveHandlers[table] = liveHandlers[table] || []).push(handler);
+    if (resync) liveResyncs.push(resync);
+    if (!liveSource) setTimeout(connectLiveEvents);
+}
+
+function connectLiveEvents() {
+    if (liveSource || !window.EventSource) return;
+    const params = new URLSearchParams();
+    Object.keys(liveHandlers).forEach(table => params.append('tables', table));
+    let opened = false;
+    liveSource = new EventSource(`${API_URL}/api/events?${params}`);
+    liveSource.onopen = () => {
+        if (opened) liveResyncs.forEach(fn => fn());
+        opened = true;
+    };
+    liveSource.addEventListener('change', e => {
+        const event = JSON.parse(e.data);
+        (liveHandlers[event.table] || []).forEach(fn => fn(event.record, event));
+    });
+}
+
+// Replaces a record's row (tr[data-id]) in a rendered list, or prepends it as the newest; removes it when keep() says so
+function patchRow(resultId, record, render, keep = () => true) {
+    const tbody = document.querySelector(`#${resultId} tbody`);
+    if (!tbody) return;
+    const existing = tbody.querySelector(`tr[data-id="${record.id}"]`);
+    if (!keep(record)) {
+        if (existing) existing.remove();
+        return;
+    }
+    const rows = document.createElement('tbody');
+    rows.innerHTML = render(record);
+    if (existing) {
+        existing.replaceWith(rows.querySelector(`tr[data-id="${record.id}"]`));
+    } else {
+        tbody.prepend(...rows.children);
+    }
+}
+
+// One Idempotency-Key per distinct submission: sending the same form again after an error or timeout reuses it,
+// so the server replays the first result instead of writing twice. Settle it once the write is confirmed.
+const pendingSubmissions = {};
+
+function pendingSubmission(scope, payload) {
+    const body = JSON.stringify(payload);
+    if (!pendingSubmissions[scope] || pendingSubmissions[scope].body !== body) {
+        pendingSubmissions[scope] = { body, key: crypto.randomUUID(), startedAt: Date.now() };
+    }
+    return pendingSubmissions[scope];
+}
+
+function settleSubmission(scope) {
+    delete pendingSubmissions[scope];
+}
@@ -47,9 +47,10 @@ async function createOrder() {
     if (itemError) { showToast('Each item must have both SKU and Quantity > 0', 'warning'); return; }
     if (items.length === 0) { showToast('Please add at least one item', 'warning'); return; }
 
+    const submission = pendingSubmission('order', { customer_email: customerEmail.value, priority: priority.value, items });
     const data = {
         customer_email: customerEmail.value,
-        customer_id: `CUST-${Date.now()}`,
+        customer_id: `CUST-${submission.startedAt}`,
         priority: priority.value,
         items
     };
@@ -61,7 +62,7 @@ async function createOrder() {
     try {
         const result = await fetch(`${API_URL}/orders`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: { 'Content-Type': 'application/json', 'Idempotency-Key': submission.key },
             body: JSON.stringify(data)
         });
         
@@ -71,6 +72,7 @@ async function createOrder() {
         }
         
         const json = await result.json();
+        settleSubmission('order');
         showToast('Order created successfully', 'success');
         resultDiv.textContent = `Order ${json.order_id} has been created successfully. Validation is now in progress.`;
         resultDiv.style.color = 'green';
@@ -82,32 +84,46 @@ async function createOrder() {
     }
 }
 
-async function listOrders(forceRefresh = false) {
+const ORDERS_PAGE_SIZE = 100;
+let ordersCursor = null;
+
+function orderRow(record) {
+    const fields = record.fields;
+    return `<tr data-id="${record.id}" style="cursor:pointer" onclick="toggleOrderItems('${record.id}', this)">
+        <td><i class="bi bi-chevron-right" id="icon-${record.id}"></i></td>
+        <td>${record.id}</td>
+        <td>${fields.customer_email || 'N/A'}</td>
+        <td>${fields.priority || 'N/A'}</td>
+        <td>${fields.status || 'N/A'}</td>
+        <td>${fields.created_at ? new Date(fields.created_at).toLocaleString() : 'N/A'}</td>
+    </tr>
+    <tr id="items-${record.id}" style="display:none"><td colspan="6" style="padding:0"></td></tr>`;
+}
+
+async function listOrders(forceRefresh = false, more = false) {
     const resultDiv = document.getElementById('ordersResult');
+    const moreButton = document.getElementById('ordersMore');
     resultDiv.style.display = 'block';
-    resultDiv.textContent = 'Loading orders...';
+    if (!more) resultDiv.textContent = 'Loading orders...';
 
     try {
-        const url = forceRefresh ? `${API_URL}/orders?refresh=true` : `${API_URL}/orders`;
-        const result = await fetch(url);
+        // filtering and paging happen server-side; each page is a small slice of the cached list
+        const params = new URLSearchParams({ limit: ORDERS_PAGE_SIZE });
+        const status = document.getElementById('ordersStatus')?.value;
+        if (status) params.set('status', status);
+        if (forceRefresh) params.set('refresh', 'true');
+        if (more && ordersCursor) params.set('cursor', ordersCursor);
+        const result = await fetch(`${API_URL}/orders?${params}`);
         const json = await result.json();
-        
-        if (json.records && json.records.length > 0) {
-            let table = '<table><thead><tr><th></th><th>Order ID</th><th>Customer Email</th><th>Priority</th><th>Status</th><th>Created</th></tr></thead><tbody>';
-            json.records.forEach(record => {
-                const fields = record.fields;
-                table += `<tr style="cursor:pointer" onclick="toggleOrderItems('${record.id}', this)">
-                    <td><i class="bi bi-chevron-right" id="icon-${record.id}"></i></td>
-                    <td>${record.id}</td>
-                    <td>${fields.customer_email || 'N/A'}</td>
-                    <td>${fields.priority || 'N/A'}</td>
-                    <td>${fields.status || 'N/A'}</td>
-                    <td>${fields.created_at ? new Date(fields.created_at).toLocaleString() : 'N/A'}</td>
-                </tr>
-                <tr id="items-${record.id}" style="display:none"><td colspan="6" style="padding:0"></td></tr>`;
-            });
-            table += '</tbody></table>';
-            resultDiv.innerHTML = table;
+        if (!result.ok) throw new Error(json.detail || `HTTP ${result.status}`);
+
+        ordersCursor = json.next_cursor;
+        if (moreButton) moreButton.style.display = ordersCursor ? '' : 'none';
+        if (more) {
+            resultDiv.querySelector('tbody').insertAdjacentHTML('beforeend', json.records.map(orderRow).join(''));
+        } else if (json.records && json.records.length > 0) {
+            resultDiv.innerHTML = `<p>${json.total} orders</p><table><thead><tr><th></th><th>Order ID</th><th>Customer Email</th><th>Priority</th><th>Status</th><th>Created</th></tr></thead><tbody>`
+                + json.records.map(orderRow).join('') + '</tbody></table>';
         } else {
             resultDiv.textContent = 'No orders found';
         }
@@ -147,7 +163,13 @@ async function toggleOrderItems(orderId, row) {
 }
 
 document.addEventListener('DOMContentLoaded', () => {
-    if (document.getElementById('ordersResult')) listOrders();
+    if (document.getElementById('ordersResult')) {
+        listOrders();
+        onRecordChange('Orders', record => {
+            const status = document.getElementById('ordersStatus')?.value;
+            patchRow('ordersResult', record, orderRow, r => !status || r.fields.status === status);
+        }, () => listOrders());
+    }
 });
 
 function clearUpdateForm() {
@@ -1,3 +1,16 @@
+function picklistRow(record) {
+    const fields = record.fields;
+    const orderIds = Array.isArray(fields.order_id) ? fields.order_id.join(', ') : (fields.order_id || 'N/A');
+    return `<tr data-id="${record.id}">
+        <td>${record.id}</td>
+        <td>${orderIds}</td>
+        <td>${fields.priority || 'N/A'}</td>
+        <td>${fields.status || 'N/A'}</td>
+        <td>${fields.customer_email || 'N/A'}</td>
+        <td>${fields.created_at ? new Date(fields.created_at).toLocaleString() : 'N/A'}</td>
+    </tr>`;
+}
+
 async function listPicklists(forceRefresh = false) {
     const resultDiv = document.getElementById('picklistsResult');
     resultDiv.style.display = 'block';
@@ -10,18 +23,7 @@ async function listPicklists(forceRefresh = false) {
         
         if (json.records && json.records.length > 0) {
             let table = '<table><thead><tr><th>Picklist ID</th><th>Order ID</th><th>Priority</th><th>Status</th><th>Customer Email</th><th>Created</th></tr></thead><tbody>';
-            json.records.forEach(record => {
-                const fields = record.fields;
-                const orderIds = Array.isArray(fields.order_id) ? fields.order_id.join(', ') : (fields.order_id || 'N/A');
-                table += `<tr>
-                    <td>${record.id}</td>
-                    <td>${orderIds}</td>
-                    <td>${fields.priority || 'N/A'}</td>
-                    <td>${fields.status || 'N/A'}</td>
-                    <td>${fields.customer_email || 'N/A'}</td>
-                    <td>${fields.created_at ? new Date(fields.created_at).toLocaleString() : 'N/A'}</td>
-                </tr>`;
-            });
+            table += json.records.map(picklistRow).join('');
             table += '</tbody></table>';
             resultDiv.innerHTML = table;
         } else {
@@ -33,7 +35,10 @@ async function listPicklists(forceRefresh = false) {
 }
 
 document.addEventListener('DOMContentLoaded', () => {
-    if (document.getElementById('picklistsResult')) listPicklists();
+    if (document.getElementById('picklistsResult')) {
+        listPicklists();
+        onRecordChange('Picklists', record => patchRow('picklistsResult', record, picklistRow), () => listPicklists());
+    }
 });
 
 function clearPicklistForm() {
@@ -101,7 +106,7 @@ async function optimizeRoute() {
             resultDiv.textContent = 'No stops found for this picklist.';
             return;
         }
-        let table = `<p style="color:green">Optimized route for Picklist ${json.picklist_id} — ${stops.length} stop(s)</p>`;
+        let table = `<p style="color:green">Optimized route for Picklist ${json.picklist_id} — ${stops.length} stop(s), ${json.total_distance} m walk (was ${json.naive_distance} m)</p>`;
         table += '<table><thead><tr><th>#</th><th>SKU</th><th>Qty</th><th>Location</th><th>Rack</th></tr></thead><tbody>';
         stops.forEach((stop, i) => {
             table += `<tr><td>${i + 1}</td><td>${stop.sku}</td><td>${stop.qty}</td><td>${stop.location}</td><td>${stop.rack}</td></tr>`;
@@ -112,4 +117,45 @@ async function optimizeRoute() {
         showToast('Failed to optimize route', 'error');
         resultDiv.textContent = 'Error: ' + error.message;
     }
-}
\ No newline at end of file
+}
+
+async function planWaves() {
+    const maxOrders = document.getElementById('waveMaxOrders').value;
+    const maxUnits = document.getElementById('waveMaxUnits').value;
+    const params = new URLSearchParams();
+    if (maxOrders) params.set('max_orders', maxOrders);
+    if (maxUnits) params.set('max_units', maxUnits);
+
+    const resultDiv = document.getElementById('wavesResult');
+    resultDiv.style.display = 'block';
+    resultDiv.textContent = 'Planning waves...';
+
+    try {
+        const result = await fetch(`${API_URL}/picklists/waves?${params}`);
+        const json = await result.json();
+        if (!result.ok) {
+            showToast('Failed to plan waves', 'error');
+            resultDiv.style.color = 'red';
+            resultDiv.textContent = json.detail || 'Failed to plan waves.';
+            return;
+        }
+        showToast('Waves planned', 'success');
+        let html = `<p style="color:green">${json.picklists} open picklist(s) in ${json.waves.length} wave(s)</p>`;
+        json.waves.forEach(wave => {
+            html += `<h3>Wave ${wave.wave} — ${wave.priority}, ${wave.orders} order(s), ${wave.units} unit(s), ${wave.total_distance} m walk (${wave.separate_distance} m picked separately)</h3>`;
+            html += `<p>Put wall: ${wave.slots.map(s => `#${s.slot} ${s.order_id}`).join(', ')}</p>`;
+            html += '<table><thead><tr><th>#</th><th>SKU</th><th>Qty</th><th>Location</th><th>Rack</th><th>Slot</th></tr></thead><tbody>';
+            wave.route.forEach(stop => {
+                html += `<tr><td>${stop.sequence}</td><td>${stop.sku}</td><td>${stop.qty}</td><td>${stop.location}</td><td>${stop.rack}</td><td>${stop.slot}</td></tr>`;
+            });
+            html += '</tbody></table>';
+        });
+        if (json.skipped.length) {
+            html += `<p style="color:orange">Skipped: ${json.skipped.map(s => s.picklist_id).join(', ')}</p>`;
+        }
+        resultDiv.innerHTML = html;
+    } catch (error) {
+        showToast('Failed to plan waves', 'error');
+        resultDiv.textContent = 'Error: ' + error.message;
+    }
+}
@@ -31,6 +31,27 @@ async function generateWeeklySummary() {
     }
 }
 
+async function generateMonthlySummary() {
+    const month = document.getElementById('monthlyMonth').value;
+    const resultDiv = document.getElementById('monthlyResult');
+    resultDiv.style.display = 'block';
+    resultDiv.textContent = 'Generating monthly summary...';
+    try {
+        const result = await fetch(`${API_URL}/reports/monthly${month ? `?month=${month}` : ''}`, { method: 'POST' });
+        const json = await result.json();
+        if (!result.ok) {
+            resultDiv.textContent = 'Error: ' + (json.detail || 'Failed to generate monthly summary');
+            return;
+        }
+        const r = json.report;
+        const byStatus = Object.entries(r.by_status || {}).map(([k, v]) => `<tr><td>${k}</td><td>${v}</td></tr>`).join('');
+        const byPriority = Object.entries(r.by_priority || {}).map(([k, v]) => `<tr><td>${k}</td><td>${v}</td></tr>`).join('');
+        resultDiv.innerHTML = `<div><strong>Report ID:</strong> ${json.report_id}</div><div><strong>Month:</strong> ${r.month} (through ${r.through})</div><div><strong>Total Orders:</strong> ${r.total_orders} &nbsp;|&nbsp; <strong>Fulfillment Rate:</strong> ${r.fulfillment_rate}%</div><div><strong>Picklists:</strong> ${r.picklists_generated} &nbsp;|&nbsp; <strong>Goods Receipts:</strong> ${r.goods_receipts} &nbsp;|&nbsp; <strong>Stock Received:</strong> ${r.total_stock_received}</div><div><strong>Exceptions:</strong> ${r.exceptions_raised} &nbsp;|&nbsp; <strong>Backorders:</strong> ${r.backorders_created}</div><div><strong>By Status:</strong></div><table><thead><tr><th>Status</th><th>Count</th></tr></thead><tbody>${byStatus}</tbody></table><div><strong>By Priority:</strong></div><table><thead><tr><th>Priority</th><th>Count</th></tr></thead><tbody>${byPriority}</tbody></table>`;
+    } catch (error) {
+        resultDiv.textContent = 'Error: ' + error.message;
+    }
+}
+
 
 async function generateReconciliation() {
     const resultDiv = document.getElementById('reconciliationResult');
@@ -135,6 +156,20 @@ function downloadReport(id, type, dataStr) {
             <h3>Orders by Status</h3>${tableFrom(d.by_status || {}, 'Status', 'Count')}
             <h3>Orders by Priority</h3>${tableFrom(d.by_priority || {}, 'Priority', 'Count')}
             <h3>Low Stock SKUs</h3>${lowStock}`;
+    } else if (type === 'Monthly Summary') {
+        sections = `
+            <div class="cards">
+                ${metricCard('Month', d.month)}
+                ${metricCard('Total Orders', d.total_orders)}
+                ${metricCard('Fulfillment Rate', (d.fulfillment_rate ?? '-') + '%')}
+                ${metricCard('Picklists Generated', d.picklists_generated ?? '-')}
+                ${metricCard('Goods Receipts', d.goods_receipts ?? '-')}
+                ${metricCard('Stock Received', d.total_stock_received ?? '-')}
+                ${metricCard('Exceptions Raised', d.exceptions_raised ?? '-')}
+                ${metricCard('Backorders Created', d.backorders_created ?? '-')}
+            </div>
+            <h3>Orders by Status</h3>${tableFrom(d.by_status || {}, 'Status', 'Count')}
+            <h3>Orders by Priority</h3>${tableFrom(d.by_priority || {}, 'Priority', 'Count')}`;
     } else if (type === 'Stock Reconciliation') {
         const headers = ['sku', 'quantity', 'available', 'reserved'];
         sections = `<table><thead><tr>${headers.map(h => `<th>${h}</th>`).join('')}</tr></thead><tbody>${
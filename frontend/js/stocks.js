@@ -1,3 +1,15 @@
+function stockRow(record) {
+    const fields = record.fields;
+    return `<tr data-id="${record.id}">
+        <td>${fields.sku || 'N/A'}</td>
+        <td>${fields.quantity || 0}</td>
+        <td>${fields.reserved || 0}</td>
+        <td>${fields.available || 0}</td>
+        <td>${fields.location || 'N/A'}</td>
+        <td>${fields.rack || 'N/A'}</td>
+    </tr>`;
+}
+
 async function listStocks(forceRefresh = false) {
     const resultDiv = document.getElementById('stocksResult');
     resultDiv.style.display = 'block';
@@ -10,17 +22,7 @@ async function listStocks(forceRefresh = false) {
         
         if (json.records && json.records.length > 0) {
             let table = '<table><thead><tr><th>SKU</th><th>Quantity</th><th>Reserved</th><th>Available</th><th>Location</th><th>Rack</th></tr></thead><tbody>';
-            json.records.forEach(record => {
-                const fields = record.fields;
-                table += `<tr>
-                    <td>${fields.sku || 'N/A'}</td>
-                    <td>${fields.quantity || 0}</td>
-                    <td>${fields.reserved || 0}</td>
-                    <td>${fields.available || 0}</td>
-                    <td>${fields.location || 'N/A'}</td>
-                    <td>${fields.rack || 'N/A'}</td>
-                </tr>`;
-            });
+            table += json.records.map(stockRow).join('');
             table += '</tbody></table>';
             resultDiv.innerHTML = table;
         } else {
@@ -32,7 +34,10 @@ async function listStocks(forceRefresh = false) {
 }
 
 document.addEventListener('DOMContentLoaded', () => {
-    if (document.getElementById('stocksResult')) listStocks();
+    if (document.getElementById('stocksResult')) {
+        listStocks();
+        onRecordChange('Stocks', record => patchRow('stocksResult', record, stockRow), () => listStocks());
+    }
     if (document.getElementById('receiptsResult')) listGoodsReceipts();
 });
 
@@ -75,7 +80,11 @@ async function receiveGoods() {
     resultDiv.textContent = 'Processing goods receipt...';
 
     try {
-        const result = await fetch(`${API_URL}/stocks/goods-receipt?${params}`, { method: 'POST' });
+        const submission = pendingSubmission('goodsReceipt', params.toString());
+        const result = await fetch(`${API_URL}/stocks/goods-receipt?${params}`, {
+            method: 'POST',
+            headers: { 'Idempotency-Key': submission.key }
+        });
         
         if (!result.ok) {
             const json = await result.json();
@@ -87,6 +96,7 @@ async function receiveGoods() {
         }
         
         const json = await result.json();
+        settleSubmission('goodsReceipt');
         showToast('Goods received successfully', 'success');
         resultDiv.textContent = `${json.quantity} unit(s) of "${json.sku}" received at ${json.location} / ${json.rack}. Receipt ID: ${json.receipt_id}.`;
         resultDiv.style.color = 'green';
@@ -46,6 +46,19 @@ async function createTransfer() {
     }
 }
 
+function transferRow(record) {
+    const fields = record.fields;
+    return `<tr data-id="${record.id}">
+        <td>${record.id}</td>
+        <td>${fields.sku || 'N/A'}</td>
+        <td>${fields.from_location || 'N/A'}/${fields.from_rack || 'N/A'}</td>
+        <td>${fields.to_location || 'N/A'}/${fields.to_rack || 'N/A'}</td>
+        <td>${fields.status || 'N/A'}</td>
+        <td>${fields.requested_by || 'N/A'}</td>
+        <td>${fields.created_at ? new Date(fields.created_at).toLocaleString() : 'N/A'}</td>
+    </tr>`;
+}
+
 async function listTransfers(forceRefresh = false) {
     const resultDiv = document.getElementById('transfersResult');
     resultDiv.style.display = 'block';
@@ -58,18 +71,7 @@ async function listTransfers(forceRefresh = false) {
         
         if (json.records && json.records.length > 0) {
             let table = '<table><thead><tr><th>Transfer ID</th><th>SKU</th><th>From</th><th>To</th><th>Status</th><th>Requested By</th><th>Created</th></tr></thead><tbody>';
-            json.records.forEach(record => {
-                const fields = record.fields;
-                table += `<tr>
-                    <td>${record.id}</td>
-                    <td>${fields.sku || 'N/A'}</td>
-                    <td>${fields.from_location || 'N/A'}/${fields.from_rack || 'N/A'}</td>
-                    <td>${fields.to_location || 'N/A'}/${fields.to_rack || 'N/A'}</td>
-                    <td>${fields.status || 'N/A'}</td>
-                    <td>${fields.requested_by || 'N/A'}</td>
-                    <td>${fields.created_at ? new Date(fields.created_at).toLocaleString() : 'N/A'}</td>
-                </tr>`;
-            });
+            table += json.records.map(transferRow).join('');
             table += '</tbody></table>';
             resultDiv.innerHTML = table;
         } else {
@@ -81,5 +83,8 @@ async function listTransfers(forceRefresh = false) {
 }
 
 document.addEventListener('DOMContentLoaded', () => {
-    if (document.getElementById('transfersResult')) listTransfers();
+    if (document.getElementById('transfersResult')) {
+        listTransfers();
+        onRecordChange('Stock_Transfers', record => patchRow('transfersResult', record, transferRow), () => listTransfers());
+    }
 });
@@ -1,5 +1,6 @@
 import os
 import csv
+import time
 import boto3
 import httpx
 from datetime import datetime
@@ -12,6 +13,22 @@ logger = Logger()
 tracer = Tracer()
 
 FASTAPI_URL = os.environ.get('FASTAPI_URL')
+# a chunk costs roughly one Airtable call per order plus its item batches; at Airtable's 5 req/s, 100 orders
+# take ~25s, well inside REQUEST_TIMEOUT and the 300s Lambda timeout
+BULK_ORDERS = int(os.environ.get('BULK_ORDERS', '100'))
+REQUEST_TIMEOUT = float(os.environ.get('REQUEST_TIMEOUT', '90'))
+RETRIES = int(os.environ.get('RETRIES', '3'))
+
+def post_with_retries(client, url, payload, idempotency_key):
+    for attempt in range(RETRIES + 1):
+        try:
+            resp = client.post(url, json=payload, headers={'Idempotency-Key': idempotency_key}, follow_redirects=False)
+            if resp.status_code < 500 and resp.status_code != 429 or attempt == RETRIES:
+                return resp
+        except httpx.TransportError:
+            if attempt == RETRIES:
+                raise
+        time.sleep(2 ** attempt)
 
 @tracer.capture_lambda_handler
 def lambda_handler(event, context: LambdaContext):
@@ -24,6 +41,7 @@ def lambda_handler(event, context: LambdaContext):
             key = record['s3']['object']['key']
 
             obj = s3.get_object(Bucket=bucket, Key=key)
+            etag = obj.get('ETag', '').strip('"')
             content = obj['Body'].read().decode('utf-8')
             reader = csv.DictReader(StringIO(content))
 
@@ -34,16 +52,26 @@ def lambda_handler(event, context: LambdaContext):
                     orders[order_key] = []
                 orders[order_key].append({'sku': row['sku'], 'qty': int(row['qty'])})
 
-            with httpx.Client(timeout=30) as client:
-                for (customer_email, customer_id, priority), items in orders.items():
-                    payload = {
-                        'customer_email': customer_email,
-                        'customer_id': customer_id,
-                        'priority': priority,
-                        'items': items
-                    }
-                    resp = client.post(f"{FASTAPI_URL}/orders", json=payload, follow_redirects=False)
-                    results.append({'order': customer_id, 'status': resp.status_code, 'response': resp.json() if resp.headers.get('content-type', '').startswith('application/json') else resp.text})
+            payloads = [{
+                'customer_email': customer_email,
+                'customer_id': customer_id,
+                'priority': priority,
+                'items': items
+            } for (customer_email, customer_id, priority), items in orders.items()]
+
+            # one bulk request per BULK_ORDERS orders; the API resolves SKUs once and batches the creates
+            with httpx.Client(timeout=REQUEST_TIMEOUT) as client:
+                for i in range(0, len(payloads), BULK_ORDERS):
+                    chunk = payloads[i:i + BULK_ORDERS]
+                    # the key is stable for this file and chunk, so a retry (or a redelivered S3 event) replays instead of duplicating
+                    idempotency_key = f"{bucket}/{key}/{etag}/{i}"
+                    resp = post_with_retries(client, f"{FASTAPI_URL}/orders/bulk", {'orders': chunk}, idempotency_key)
+                    if resp.status_code == 200:
+                        for result in resp.json()['results']:
+                            results.append({'order': result['customer_id'], 'status': result['status'], 'response': result})
+                    else:
+                        body = resp.json() if resp.headers.get('content-type', '').startswith('application/json') else resp.text
+                        results += [{'order': p['customer_id'], 'status': resp.status_code, 'response': body} for p in chunk]
 
             processed_key = key.replace('orders/', f'processed/{today}/', 1)
             s3.copy_object(Bucket=bucket, CopySource={'Bucket': bucket, 'Key': key}, Key=processed_key)
@@ -16,7 +16,8 @@ HISTORY_TABLE = dynamodb.Table(HISTORY_TABLE_NAME)
 
 AIRTABLE_TOKEN = os.environ['AIRTABLE_TOKEN']
 AIRTABLE_BASE_ID = os.environ['AIRTABLE_BASE_ID']
-AIRTABLE_BASE_URL = f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}"
+AIRTABLE_API_URL = os.environ.get('AIRTABLE_API_URL', 'https://api.airtable.com/v0')
+AIRTABLE_BASE_URL = f"{AIRTABLE_API_URL}/{AIRTABLE_BASE_ID}"
 
 AIRTABLE_TABLES = [
     'Orders',